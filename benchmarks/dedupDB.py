@@ -0,0 +1,39 @@
+from time import perf_counter
+from hashlib import blake2b
+from os.path import getsize, join
+from numpy import arange, ndarray
+from numpy.random import uniform
+
+from SSD.Core import Database, ArraySpec
+from SSD.Core.Storage.ExtendedFields import encode_array, DIGEST_SIZE
+
+nb_lines = 500
+cells = arange(30000).reshape(-1, 3)
+
+# Cost of hashing an encoded array
+blob = encode_array(cells)
+start = perf_counter()
+for _ in range(nb_lines):
+    blake2b(blob, digest_size=DIGEST_SIZE).digest()
+hash_time = perf_counter() - start
+print(f'Hashing {nb_lines} arrays of {len(blob)} bytes: {hash_time:.4f}s')
+
+# Writing the same static array in each line, with and without deduplication
+for name, field_type in [('inline', ndarray), ('dedup', ArraySpec(dedup=True))]:
+    db = Database(database_dir='my_databases',
+                  database_name=f'benchmark_{name}').new(remove_existing=True)
+    db.create_table(table_name='Topology',
+                    fields=[('cells', field_type), ('positions', ndarray)])
+    start = perf_counter()
+    for _ in range(nb_lines):
+        db.add_data(table_name='Topology',
+                    data={'cells': cells, 'positions': uniform(size=(100, 3))})
+    write_time = perf_counter() - start
+    start = perf_counter()
+    for line in db.get_lines(table_name='Topology'):
+        pass
+    read_time = perf_counter() - start
+    db.close()
+    size = getsize(join('my_databases', f'benchmark_{name}.db')) / 1e6
+    print(f'[{name}] write: {write_time:.4f}s, read: {read_time:.4f}s, file size: {size:.2f}MB')
+    Database(database_dir='my_databases', database_name=f'benchmark_{name}').load().close(erase_file=True)
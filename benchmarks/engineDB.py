@@ -0,0 +1,72 @@
+from time import perf_counter
+from numpy.random import uniform, randint
+
+from SSD.Core import Database, ArraySpec
+from SSD.Core.Storage import EngineDatabase
+
+nb_steps = 2000
+nb_nodes = 1000
+batch_size = 100
+
+
+def benchmark(engine: str):
+
+    results = {}
+    db = Database(database_dir='my_databases',
+                  database_name=f'benchmark_{engine}') if engine == 'sqlite' else \
+        EngineDatabase(database_dir='my_databases',
+                       database_name=f'benchmark_{engine}',
+                       engine=engine)
+    db = db.new(remove_existing=True)
+    db.create_table(table_name='State',
+                    fields=[('time', float), ('positions', ArraySpec(dtype='float64', shape=(nb_nodes, 3)))])
+    positions = uniform(size=(nb_steps, nb_nodes, 3))
+
+    # Record: one line per time step
+    start = perf_counter()
+    for step in range(nb_steps):
+        db.add_data(table_name='State',
+                    data={'time': step * 0.01, 'positions': positions[step]})
+    results['record (line per step)'] = perf_counter() - start
+
+    # Record: batches of time steps
+    start = perf_counter()
+    for step in range(0, nb_steps, batch_size):
+        db.add_batch(table_name='State',
+                     batch={'time': [i * 0.01 for i in range(step, step + batch_size)],
+                            'positions': positions[step:step + batch_size]})
+    results['record (batches)'] = perf_counter() - start
+
+    # Replay: one line per time step
+    start = perf_counter()
+    for step in range(1, nb_steps + 1):
+        db.get_line(table_name='State',
+                    line_id=step)['positions'].sum()
+    results['replay (line per step)'] = perf_counter() - start
+
+    # Replay: all the time steps at once
+    start = perf_counter()
+    db.get_lines(table_name='State',
+                 fields='positions',
+                 batched=True)['positions'].sum()
+    results['replay (whole Table)'] = perf_counter() - start
+
+    # Random access to the time steps
+    start = perf_counter()
+    for _ in range(100):
+        db.get_lines(table_name='State',
+                     lines_id=sorted(set(randint(1, 2 * nb_steps, size=32).tolist())),
+                     batched=True)
+    results['random mini-batches'] = perf_counter() - start
+
+    results['size (MB)'] = db.memory_size / 1e6
+    db.close(erase_file=True)
+    return results
+
+
+if __name__ == '__main__':
+
+    sqlite, columnar = benchmark('sqlite'), benchmark('columnar')
+    print(f'{"":<25}{"sqlite":>12}{"columnar":>12}')
+    for name in sqlite:
+        print(f'{name:<25}{sqlite[name]:>12.4f}{columnar[name]:>12.4f}')
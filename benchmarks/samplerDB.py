@@ -0,0 +1,42 @@
+from time import perf_counter, sleep
+from numpy import ndarray, float32, sort
+from numpy.random import uniform, default_rng
+
+from SSD.Core.Storage import Database, Sampler
+
+nb_lines = 20000
+batch_size = 256
+compute_time = 0.005
+
+db = Database(database_dir='my_databases',
+              database_name='benchmark_sampler').new(remove_existing=True, profile='throughput')
+db.create_table(table_name='Samples',
+                fields=[('label', int), ('image', ndarray)])
+for start in range(0, nb_lines, 1000):
+    db.add_batch(table_name='Samples',
+                 batch={'label': list(range(start, start + 1000)),
+                        'image': [uniform(size=(32, 32)).astype(float32) for _ in range(1000)]})
+
+# Random mini-batches read in the training loop (the compute step is simulated)
+lines_id = default_rng(0).permutation(nb_lines) + 1
+start = perf_counter()
+for i in range(0, nb_lines, batch_size):
+    db.get_lines(table_name='Samples',
+                 lines_id=sort(lines_id[i:i + batch_size]),
+                 stacked=True)
+    sleep(compute_time)
+print(f'[get_lines] epoch: {perf_counter() - start:.4f}s')
+
+# Random mini-batches read in advance by the Sampler
+for nb_workers in (1, 2, 4):
+    sampler = Sampler(database=db,
+                      table_name='Samples',
+                      batch_size=batch_size,
+                      nb_workers=nb_workers,
+                      seed=0)
+    start = perf_counter()
+    for batch in sampler:
+        sleep(compute_time)
+    print(f'[Sampler, {nb_workers} workers] epoch: {perf_counter() - start:.4f}s')
+    sampler.close()
+db.close(erase_file=True)
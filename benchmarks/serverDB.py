@@ -0,0 +1,66 @@
+from time import perf_counter
+from multiprocessing import Process
+from numpy import ndarray
+from numpy.random import uniform
+
+from SSD.Core import Database
+from SSD.Core.Storage.DatabaseServer import DatabaseServer
+from SSD.Core.Storage.DatabaseClient import DatabaseClient
+
+nb_processes = 4
+nb_lines = 1000
+
+
+def direct_writer(idx: int):
+    # Each process writes in the Database file with its own connection
+    db = Database(database_dir='my_databases',
+                  database_name='benchmark_server').load()
+    failures = 0
+    for _ in range(nb_lines):
+        try:
+            db.add_data(table_name='Positions',
+                        data={'process': idx, 'positions': uniform(size=(100, 3))})
+        except Exception:
+            failures += 1
+    db.close()
+    if failures > 0:
+        print(f'[direct] process {idx}: {failures} lines could not be written')
+
+
+def client_writer(idx: int):
+    # Each process sends its lines to the server
+    db = DatabaseClient(database_dir='my_databases',
+                        database_name='benchmark_server')
+    for _ in range(nb_lines):
+        db.add_data(table_name='Positions',
+                    data={'process': idx, 'positions': uniform(size=(100, 3))})
+    db.close()
+
+
+if __name__ == '__main__':
+
+    for mode, writer in [('direct', direct_writer), ('server', client_writer)]:
+        db = Database(database_dir='my_databases',
+                      database_name='benchmark_server').new(remove_existing=True)
+        db.create_table(table_name='Positions',
+                        fields=[('process', int), ('positions', ndarray)])
+        server = DatabaseServer(database=db).start() if mode == 'server' else None
+        if server is None:
+            db.close()
+
+        start = perf_counter()
+        processes = [Process(target=writer, args=(idx,)) for idx in range(nb_processes)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = perf_counter() - start
+
+        if server is not None:
+            server.close()
+        db = Database(database_dir='my_databases',
+                      database_name='benchmark_server').load()
+        written = db.nb_lines(table_name='Positions')
+        db.close(erase_file=True)
+        print(f'[{mode}] {nb_processes} processes: {written} lines in {elapsed:.4f}s '
+              f'({written / elapsed:.0f} lines/s)')
@@ -1,9 +1,12 @@
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple, Union
 from numpy import array, ndarray
 from socket import socket, AF_INET, SOCK_STREAM, SOL_SOCKET, SO_REUSEADDR
 from struct import pack
 
 from SSD.Core.Storage.Database import Database
+from SSD.Core.Storage.DatabaseServer import DatabaseServer
+from SSD.Core.Storage.DatabaseClient import DatabaseClient
+from SSD.Core.Storage.ExtendedFields import ArraySpec
 from SSD.Core.Rendering.Visualizer import Visualizer
 from SSD.Core.Rendering.backend.DataTables import DataTables
 
@@ -17,7 +20,9 @@ class UserAPI:
                  remove_existing: bool = False,
                  non_storing: bool = False,
                  exit_on_window_close: bool = True,
-                 idx_instance: int = 0):
+                 idx_instance: int = 0,
+                 array_spec: Optional[ArraySpec] = None,
+                 in_memory: bool = False):
         """
         The UserAPI is a Factory used to easily create and update visual objects in the Visualizer.
 
@@ -28,6 +33,10 @@ class UserAPI:
         :param non_storing: If True, the Database will not be stored.
         :param exit_on_window_close: If True, program will be killed if the Visualizer is closed.
         :param idx_instance: If several Factories are connected to the same Visualizer, specify the index of instances.
+        :param array_spec: Storage options of the floating point arrays of the visual objects (positions, vectors and
+                           scalar fields), for instance ArraySpec(quantize='float32') for visualization-only data.
+        :param in_memory: If True, the Database is kept in memory (used if 'database' is not defined). Use
+                          'get_database().snapshot()' to save it to a file.
         """
 
         # Define the Database
@@ -35,10 +44,15 @@ class UserAPI:
             self.__database: Database = database
         elif database_name is not None:
             self.__database: Database = Database(database_dir=database_dir,
-                                                 database_name=database_name).new(remove_existing=remove_existing)
+                                                 database_name=database_name).new(remove_existing=remove_existing,
+                                                                                  in_memory=in_memory)
         else:
             raise ValueError("Both 'database' and 'database_name' are not defined.")
         self.__non_storing = non_storing
+        self.__array_spec = array_spec
+
+        # The Factory writes through a DatabaseClient when the Database is served to the Visualizer
+        self.__writer: Union[Database, DatabaseClient] = self.__database
 
         # Information about all Tables
         self.__tables: List[DataTables] = []
@@ -46,15 +60,20 @@ class UserAPI:
         self.__idx: int = idx_instance
         self.__step: int = 1
 
+        # Queries of the current step, written in a single transaction when rendering
+        self.__queries: List[Tuple[DataTables, Dict[str, Any], bool]] = []
+
         # Synchronization between the Factory and the Visualizer
         self.__update: Dict[int, bool] = {}
         self.__socket: Optional[socket] = None
+        self.__server: Optional[DatabaseServer] = None
         self.__offscreen: bool = False
         self.__exit_on_close: bool = exit_on_window_close
 
     def get_database(self) -> Database:
         """
-        Get the Database instance.
+        Get the Database instance. While an in-memory Database is served to the Visualizer, the Factory writes through
+        the server: the Tables of the objects created in the meantime are not registered in this instance.
         """
 
         return self.__database
@@ -86,10 +105,21 @@ class UserAPI:
         if not offscreen:
             # Launch the Visualizer
             database_path = self.get_database_path()
+            if self.__database.in_memory:
+                # The in-memory Database is only available in this process, the Visualizer reads it through a server
+                # which is then the single writer of the Database (the Factory writes through the server as well)
+                self.__write_step()
+                self.__server = DatabaseServer(database=Database(database_dir=database_path[0],
+                                                                 database_name=database_path[1]).load(in_memory=True))
+                self.__server.start()
+                self.__writer = DatabaseClient(address=self.__server.address)
+                for table in self.__tables:
+                    table.database = self.__writer
             Visualizer.launch(backend=backend,
                               database_dir=database_path[0],
                               database_name=database_path[1],
-                              fps=fps)
+                              fps=fps,
+                              in_memory=self.__database.in_memory)
             # Connect the Factory to the Visualizer
             self.connect_visualizer()
 
@@ -104,7 +134,8 @@ class UserAPI:
         self.__offscreen = offscreen
         if not offscreen:
 
-            # Connect the Factory to the Visualizer
+            # Connect the Factory to the Visualizer (the created objects must be available)
+            self.__write_step()
             self.__socket = socket(AF_INET, SOCK_STREAM)
             self.__socket.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
             # Connection attempts while the server is not running on the Visualizer side
@@ -127,9 +158,12 @@ class UserAPI:
         # Add empty lines to non-updated objects & reset all the update flags
         for i in self.__update.keys():
             if not self.__update[i]:
-                self.__tables[i].send_data(data={}, update=False)
+                self.__queries.append((self.__tables[i], {}, False))
             self.__update[i] = self.__non_storing
 
+        # Commit all the queries of the step at once
+        self.__write_step()
+
         # Send the index of the step to render
         if not self.__offscreen:
             if self.__socket is not None:
@@ -146,6 +180,17 @@ class UserAPI:
             else:
                 self.__kill()
 
+    def __write_step(self):
+        """
+        Write the queries of the step in a single transaction, so that the Database is only locked while rendering.
+        """
+
+        queries, self.__queries = self.__queries, []
+        if len(queries) > 0:
+            with self.__writer.transaction():
+                for table, data, update in queries:
+                    table.send_data(data=data, update=update)
+
     def __kill(self):
         """
         Kill the program on Visualizer close.
@@ -162,10 +207,17 @@ class UserAPI:
         Close the Visualization.
         """
 
+        self.__write_step()
         if self.__socket is not None:
             self.__socket.send(b'exit')
             self.__socket.close()
             self.__socket = None
+        if self.__server is not None:
+            self.__writer.close()
+            self.__server.close()
+            self.__writer, self.__server = self.__database, None
+            for table in self.__tables:
+                table.database = self.__database
 
         if self.__non_storing:
             self.__database.close(erase_file=True)
@@ -186,9 +238,10 @@ class UserAPI:
         self.__update[self.__current_id] = self.__non_storing
         self.__current_id += 1
 
-        # Create the Table and register the object
-        table = DataTables(database=self.__database, table_name=table_name).create_columns()
-        table.send_data(data=data, update=False)
+        # Create the Table and register the object (its data is written with the queries of the step)
+        table = DataTables(database=self.__writer, table_name=table_name,
+                           array_spec=self.__array_spec).create_columns()
+        self.__queries.append((table, self.__copy(data), False))
         self.__tables.append(table)
         return self.__current_id - 1
 
@@ -199,11 +252,17 @@ class UserAPI:
         # The call to 'locals()' in update_ methods also includes the 'self' & 'object_id' keys
         del data['self'], data['object_id']
 
-        # Update object data in the Database
-        self.__tables[object_id].send_data(data=data, update=self.__update[object_id])
+        # Update object data in the Database (written with the queries of the step)
+        self.__queries.append((self.__tables[object_id], self.__copy(data), self.__update[object_id]))
         if not self.__update[object_id]:
             self.__update[object_id] = True
 
+    @staticmethod
+    def __copy(data: Dict[str, Any]) -> Dict[str, Any]:
+
+        # The arrays might be modified in place by the user before the step is written
+        return {field: value.copy() if isinstance(value, ndarray) else value for field, value in data.items()}
+
     def __check_id(self,
                    object_id: int,
                    object_type: str) -> int:
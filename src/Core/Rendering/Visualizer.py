@@ -5,6 +5,7 @@ from sys import executable, argv
 from inspect import stack, getmodule
 
 from SSD.Core.Storage.Database import Database
+from SSD.Core.Storage.DatabaseClient import DatabaseClient
 from SSD.Core.Rendering.backend.BaseVisualizer import BaseVisualizer
 
 
@@ -87,7 +88,8 @@ class Visualizer:
                database_dir: str = '',
                database_name: str = '',
                fps: int = 20,
-               nb_clients: int = 1) -> None:
+               nb_clients: int = 1,
+               in_memory: bool = False) -> None:
         """
         Launch the Open3dVisualizer in a new process to keep it interactive.
 
@@ -96,11 +98,12 @@ class Visualizer:
         :param database_name: Name of the Database (used if 'database' is not defined).
         :param fps: Max frame rate.
         :param nb_clients: Number of Factories to connect to.
+        :param in_memory: If True, the Database is an in-memory Database served by a DatabaseServer.
         """
 
         # Launch a new process
         t = Thread(target=Visualizer.__launch,
-                   args=(backend, database_dir, database_name, fps, nb_clients))
+                   args=(backend, database_dir, database_name, fps, nb_clients, in_memory))
         t.daemon = True
         t.start()
 
@@ -109,17 +112,22 @@ class Visualizer:
                  database_dir: str,
                  database_name: str,
                  fps: int,
-                 nb_clients: int) -> None:
+                 nb_clients: int,
+                 in_memory: bool) -> None:
 
         run([executable, __file__,
-             backend, f'{database_dir}%%{database_name}', str(fps), str(nb_clients)])
+             backend, f'{database_dir}%%{database_name}', str(fps), str(nb_clients), str(in_memory)])
 
 
 def __launch_subprocess():
-    # Load the existing Database
+    # Load the existing Database (an in-memory Database is accessed through its server)
     db_path = argv[2].split('%%')
-    db = Database(database_dir=db_path[0],
-                  database_name=db_path[1]).load()
+    if argv[5] == 'True':
+        db = DatabaseClient(database_dir=db_path[0],
+                            database_name=db_path[1])
+    else:
+        db = Database(database_dir=db_path[0],
+                      database_name=db_path[1]).load()
     # Create the Visualizer
     Visualizer(backend=argv[1],
                database=db,
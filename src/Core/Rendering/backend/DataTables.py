@@ -1,26 +1,30 @@
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Union, Type
 from numpy import array, ndarray
 from vedo.utils import is_sequence
 
 from SSD.Core.Storage.Database import Database
+from SSD.Core.Storage.ExtendedFields import ArraySpec
 
 
 class DataTables:
 
     def __init__(self,
                  database: Database,
-                 table_name: str):
+                 table_name: str,
+                 array_spec: Optional[ArraySpec] = None):
         """
         The DataTables are used to create a specific Table in the Database for each object type.
         
         :param database: Database to connect to.
         :param table_name: Name of the Table to create. Should be '<obj_type>_<factory_idx>_<obj_idx>'.
+        :param array_spec: Storage options of the floating point arrays (positions, vectors and scalar fields).
         """
         
         # Table information
         self.database: Database = database
         self.table_name: str = table_name
         self.table_type: str = table_name.split('_')[0]
+        self.float_array: Union[Type[ndarray], ArraySpec] = ndarray if array_spec is None else array_spec
 
         # Select the good methods according to the Table type
         create_columns = {'Mesh': self.__create_mesh_columns,
@@ -52,13 +56,13 @@ class DataTables:
     def __create_mesh_columns(self):
 
         self.database.create_table(table_name=self.table_name,
-                                   fields=[('positions', ndarray),
+                                   fields=[('positions', self.float_array),
                                            ('cells', ndarray),
                                            ('wireframe', bool),
                                            ('line_width', float),
                                            ('c', str),
                                            ('alpha', float),
-                                           ('scalar_field', ndarray),
+                                           ('scalar_field', self.float_array),
                                            ('at', int),
                                            ('colormap', str)
                                            ])
@@ -67,11 +71,11 @@ class DataTables:
     def __create_points_columns(self):
 
         self.database.create_table(table_name=self.table_name,
-                                   fields=[('positions', ndarray),
+                                   fields=[('positions', self.float_array),
                                            ('point_size', int),
                                            ('c', str),
                                            ('alpha', float),
-                                           ('scalar_field', ndarray),
+                                           ('scalar_field', self.float_array),
                                            ('at', int),
                                            ('colormap', str)
                                            ])
@@ -80,12 +84,12 @@ class DataTables:
     def __create_arrows_columns(self):
 
         self.database.create_table(table_name=self.table_name,
-                                   fields=[('positions', ndarray),
-                                           ('vectors', ndarray),
+                                   fields=[('positions', self.float_array),
+                                           ('vectors', self.float_array),
                                            ('res', int),
                                            ('c', str),
                                            ('alpha', float),
-                                           ('scalar_field', ndarray),
+                                           ('scalar_field', self.float_array),
                                            ('at', int),
                                            ('colormap', str)
                                            ])
@@ -101,7 +105,7 @@ class DataTables:
                                            ('filled', bool),
                                            ('c', str),
                                            ('alpha', float),
-                                           ('scalar_field', ndarray),
+                                           ('scalar_field', self.float_array),
                                            ('at', int),
                                            ('colormap', str)
                                            ])
@@ -1,11 +1,17 @@
-from typing import Dict, Type, Any, Union, List, Optional
+from typing import Dict, Type, Any, Union, List, Optional, Tuple
 from peewee import IntegerField, FloatField, TextField, BooleanField, BlobField, DateTimeField, ForeignKeyField, Field
-from peewee import chunked
+from peewee import CompositeKey
 from playhouse.signals import Model, pre_save, post_save
 from playhouse.migrate import migrate, SqliteMigrator, SqliteDatabase
 from datetime import datetime
+from json import dumps, loads
+from collections import Counter
+from sqlite3 import sqlite_version_info
 
-from SSD.Core.Storage.ExtendedFields import NumpyField, ndarray
+from SSD.Core.Storage.ExtendedFields import NumpyField, ArraySpec, DeltaArray, ndarray, reconstruct, is_plain
+
+# Maximum number of variables in a SQLite statement
+MAX_VARIABLES = 32766 if sqlite_version_info >= (3, 32, 0) else 999
 
 
 class AdaptiveTable(Model):
@@ -48,10 +54,13 @@ class AdaptiveTable(Model):
     def extend(cls,
                field_name: str,
                data_type: Type,
-               default_value: Any):
+               default_value: Any,
+               spec: Optional[ArraySpec] = None):
 
         migrator = SqliteMigrator(cls.database())
         atts = {'null': True}
+        if spec is not None:
+            atts['spec'] = spec
         if default_value != '_null_':
             if type(default_value) != data_type:
                 raise TypeError(
@@ -74,6 +83,18 @@ class AdaptiveTable(Model):
         migrate(migrator.add_column(cls._meta.name, field_name, field))
         cls._meta.add_field(field_name, field)
 
+    @classmethod
+    def discard_fields(cls,
+                       fields_names: List[str]):
+
+        # The Fields are only removed from the model (their columns were removed by the rollback of a transaction)
+        for field_name in fields_names:
+            field = cls._meta.fields[field_name]
+            cls._meta.remove_field(field_name)
+            delattr(cls, field_name)
+            if isinstance(field, ForeignKeyField) and hasattr(field.rel_model, field.backref):
+                delattr(field.rel_model, field.backref)
+
     @classmethod
     def rename_table(cls,
                      old_table_name: str,
@@ -89,14 +110,39 @@ class AdaptiveTable(Model):
 
         migrator = SqliteMigrator(cls.database())
         migrate(migrator.rename_column(cls._meta.name, old_field_name, new_field_name))
-        cls._meta.add_field(new_field_name, getattr(cls, old_field_name))
+        field = getattr(cls, old_field_name)
         cls._meta.remove_field(old_field_name)
+        field.column_name = new_field_name
+        cls._meta.add_field(new_field_name, field)
+
+    @classmethod
+    def add_index(cls,
+                  fields_names: List[str],
+                  unique: bool = False):
+
+        migrator = SqliteMigrator(cls.database())
+        migrate(migrator.add_index(cls._meta.table_name,
+                                   [cls._meta.fields[field_name].column_name for field_name in fields_names],
+                                   unique))
+
+    @classmethod
+    def indexes(cls) -> List[Tuple[List[str], bool]]:
+
+        # Automatic indexes of SQLite (primary key, unique constraints) are not listed
+        columns = {field.column_name: field_name for field_name, field in cls._meta.fields.items()}
+        return [([columns.get(column, column) for column in index.columns], index.unique)
+                for index in cls.database().get_indexes(cls._meta.table_name)]
 
     @classmethod
     def remove_field(cls,
                      field_name: str):
 
         migrator = SqliteMigrator(cls.database())
+        # The indexes on the Field are removed with the Field
+        column = cls._meta.fields[field_name].column_name
+        for index in cls.database().get_indexes(cls._meta.table_name):
+            if column in index.columns:
+                migrate(migrator.drop_index(cls._meta.table_name, index.name))
         migrate(migrator.drop_column(cls._meta.name, field_name))
         cls._meta.remove_field(field_name)
 
@@ -111,6 +157,8 @@ class AdaptiveTable(Model):
         for field in cls._meta.sorted_fields:
             if type(field) == ForeignKeyField:
                 field_type = f'(FK -> {field.rel_model._meta.name})'
+            elif getattr(field, 'spec', None) is not None:
+                field_type = f'({field.field_type} {field.spec})'
             else:
                 field_type = f'({field.field_type})'
 
@@ -126,30 +174,197 @@ class AdaptiveTable(Model):
 
         pass
 
+    @classmethod
+    def insert_batch(cls,
+                     fields_names: List[str],
+                     fields_values: List[List[Any]]) -> List[int]:
+        """
+        Insert a batch of lines with multi-rows statements. Return the indices of the new lines.
+
+        :param fields_names: Names of the Fields of the batch.
+        :param fields_values: Values of the batch for each Field.
+        """
+
+        # Convert the values of the given Fields, add the default values of the other Fields
+        nb_lines = len(fields_values[0]) if len(fields_values) > 0 else 0
+        fields = [cls._meta.fields[field_name] for field_name in fields_names]
+        columns = [[field.db_value(value) for value in values] for field, values in zip(fields, fields_values)]
+        for field in cls._meta.sorted_fields:
+            if field.name not in fields_names and not field.primary_key and field.default is not None:
+                fields.append(field)
+                columns.append([field.db_value(field.default() if callable(field.default) else field.default)
+                                for _ in range(nb_lines)])
+        if nb_lines == 0 or len(fields) == 0:
+            return [cls.insert({}).execute() for _ in range(nb_lines)]
+
+        # Number of lines per statement, bounded by the number of variables of a statement
+        chunk_size = max(1, MAX_VARIABLES // len(fields))
+        row = f"({', '.join(['?'] * len(fields))})"
+        columns_names = ', '.join([f'"{field.column_name}"' for field in fields])
+        insert = f'INSERT INTO "{cls._meta.table_name}" ({columns_names}) VALUES '
+        values = [value for line in zip(*columns) for value in line]
+
+        # The statement of full chunks is prepared once and reused, indices are given by the last inserted index
+        lines_id = []
+        statement = insert + ', '.join([row] * min(chunk_size, nb_lines))
+        with cls.database().atomic():
+            for start in range(0, nb_lines, chunk_size):
+                size = min(chunk_size, nb_lines - start)
+                if size < chunk_size and start > 0:
+                    statement = insert + ', '.join([row] * size)
+                last_id = cls.database().execute_sql(statement, values[start * len(fields):
+                                                                        (start + size) * len(fields)]).lastrowid
+                lines_id += list(range(last_id - size + 1, last_id + 1))
+        return lines_id
+
+    @classmethod
+    def dedup_fields(cls) -> List[NumpyField]:
+
+        return [field for field in cls._meta.sorted_fields if isinstance(field, NumpyField) and field.is_dedup]
+
+    @classmethod
+    def release(cls,
+                fields: List[NumpyField],
+                line_id: Optional[int] = None):
+
+        # Release the stored contents referenced by the lines of deduplicated Fields
+        for field in fields:
+            query = cls.select(field.cast('BLOB')).where(field.is_null(False))
+            query = query if line_id is None else query.where(cls.id == line_id)
+            field.release([value for value, in query.tuples()])
+
+    @classmethod
+    def update_data(cls,
+                    line_id: int,
+                    fields_names: List[str],
+                    fields_values: List[Any]):
+
+        cls.release([field for field in cls.dedup_fields() if field.name in fields_names], line_id=line_id)
+        cls.update(dict(zip(fields_names, fields_values))).where(cls.id == line_id).execute()
+
+    @classmethod
+    def resolve(cls,
+                lines: List[Dict[str, Any]]):
+
+        pass
+
 
 class StoringTable(AdaptiveTable):
     role: str = 'Storing'
 
+    @classmethod
+    def delta_fields(cls) -> List[NumpyField]:
+
+        return [field for field in cls._meta.sorted_fields if isinstance(field, NumpyField) and field.is_delta]
+
+    @classmethod
+    def reset_deltas(cls):
+
+        # The next array of each delta Field will be a keyframe (the previous ones might have been cancelled)
+        for field in cls.delta_fields():
+            field.reference, field.nb_deltas, field.cache = None, 0, None
+
     @classmethod
     def add_data(cls,
                  fields_names: List[str],
                  fields_values: List[Any],
                  batched: bool = False):
 
+        # Encode the delta Fields in the order of insertion
+        for field in cls.delta_fields():
+            if field.name in fields_names:
+                idx = fields_names.index(field.name)
+                fields_values[idx] = [field.encode_next(value) for value in fields_values[idx]] if batched else \
+                    field.encode_next(fields_values[idx])
+
         if not batched:
+            # The index of the line might be given (lines written by the write-behind buffer)
             line = cls(**dict(zip(fields_names, fields_values)))
-            line.save()
+            line.save(force_insert=True)
             return line.id
 
         else:
-            fields = [getattr(cls, field) for field in fields_names]
-            batch = [tuple(samples) for samples in zip(*fields_values)]
-            n = cls.select().count()
-            with cls.database().atomic():
-                for chunk in chunked(batch, 100):
-                    cls.insert_many(chunk, fields=fields).execute()
-            N = cls.select().count()
-            return [cls.get_by_id(i + 1).id for i in range(n, N)]
+            return cls.insert_batch(fields_names=fields_names,
+                                    fields_values=fields_values)
+
+    @classmethod
+    def update_data(cls,
+                    line_id: int,
+                    fields_names: List[str],
+                    fields_values: List[Any]):
+
+        for field in cls.delta_fields():
+            if field.name in fields_names:
+                field.cache = None
+                # The next array of the Field might be a delta from the updated line: store it as a keyframe
+                next_line = cls.select(cls.id, field).where((cls.id > line_id) & field.is_null(False)).order_by(
+                    cls.id).limit(1).dicts()
+                if len(next_line) > 0:
+                    next_line = next_line[0]
+                    if isinstance(next_line[field.name], DeltaArray):
+                        cls.resolve([next_line])
+                        cls.update({field: next_line[field.name]}).where(cls.id == next_line['id']).execute()
+                # The updated line is the last one: it becomes the reference of the next array
+                else:
+                    value = fields_values[fields_names.index(field.name)]
+                    value = None if value is None else field.spec.validate(value)
+                    # The reference is the array as it is decoded (cast, quantized), as in 'encode_next'
+                    field.reference = reconstruct(value, field.spec) if value is not None and is_plain(value) else None
+                    field.nb_deltas = 0
+        super().update_data(line_id, fields_names, fields_values)
+
+    @classmethod
+    def resolve(cls,
+                lines: List[Dict[str, Any]]):
+
+        # Decode the delta Fields in the order of the lines
+        lines = sorted(lines, key=lambda l: l['id'])
+        for field in cls.delta_fields():
+            if not any([isinstance(line.get(field.name), DeltaArray) for line in lines]):
+                continue
+            previous: Optional[Tuple[int, int, ndarray]] = None
+            for i, line in enumerate(lines):
+                value = line[field.name]
+                if isinstance(value, DeltaArray):
+                    # The reference is in the lines if all the lines between both were selected
+                    if previous is not None and line['id'] - previous[1] == i - previous[0]:
+                        reference = previous[2]
+                    else:
+                        reference = cls.__reference(field, line['id'])
+                    value = line[field.name] = value.resolve(reference)
+                if value is not None:
+                    previous = (i, line['id'], value)
+            # The returned arrays might be modified in place, the cached one is a copy
+            if previous is not None:
+                field.cache = (previous[1], previous[2].copy())
+
+    @classmethod
+    def __reference(cls,
+                    field: NumpyField,
+                    line_id: int) -> ndarray:
+
+        # Read the previous arrays of the Field until a keyframe (or the last decoded array) is found
+        chain, first_id = [], line_id
+        while len(chain) == 0 or isinstance(chain[-1], DeltaArray):
+            query = cls.select(cls.id, field).where((cls.id < first_id) & field.is_null(False))
+            if field.cache is not None and field.cache[0] < first_id:
+                query = query.where(cls.id >= field.cache[0])
+            lines = query.order_by(cls.id.desc()).limit(field.spec.keyframe_interval).tuples()
+            if len(lines) == 0:
+                raise ValueError(f"Cannot decode the Field '{field.name}' of Table '{cls.get_name()}' at line "
+                                 f"{line_id}: the keyframe of the delta encoding is missing.")
+            for first_id, value in lines:
+                if field.cache is not None and first_id == field.cache[0]:
+                    value = field.cache[1]
+                chain.append(value)
+                if not isinstance(value, DeltaArray):
+                    break
+
+        # Apply the deltas from the keyframe
+        reference = chain.pop()
+        while len(chain) > 0:
+            reference = chain.pop().resolve(reference)
+        return reference
 
 
 class ExchangeTable(AdaptiveTable):
@@ -168,14 +383,133 @@ class ExchangeTable(AdaptiveTable):
             return line.id
 
         else:
-            fields = [getattr(cls, field) for field in fields_names]
-            batch = [tuple(samples) for samples in zip(*fields_values)]
             cls.delete().execute()
             pre_save.send(cls, created=False)
-            n = cls.select().count()
-            with cls.database().atomic():
-                for chunk in chunked(batch, 100):
-                    cls.insert_many(chunk, fields=fields).execute()
-            N = cls.select().count()
+            lines_id = cls.insert_batch(fields_names=fields_names,
+                                        fields_values=fields_values)
             post_save.send(cls, created=False)
-            return [cls.get_by_id(i + 1).id for i in range(n, N)]
+            return lines_id
+
+
+class HiddenTable(Model):
+    name: str = '_ssd_'
+
+    class Meta:
+        database = None
+
+    @classmethod
+    def connect(cls,
+                database: SqliteDatabase) -> Type['HiddenTable']:
+        """
+        Create (or load) the hidden Table in a Database. Hidden Tables are not listed in the Tables of the Database.
+
+        :param database: Database to connect to.
+        """
+
+        table = type(cls.name, (cls,), {})
+        table.bind(database)
+        table.database().create_tables([table])
+        return table
+
+    @classmethod
+    def database(cls) -> SqliteDatabase:
+
+        return cls._meta.database
+
+
+class SchemaTable(HiddenTable):
+    name: str = '_ssd_schema'
+
+    table_name = TextField()
+    field_name = TextField()
+    options = TextField()
+
+    class Meta:
+        primary_key = CompositeKey('table_name', 'field_name')
+
+    @classmethod
+    def set_spec(cls,
+                 table_name: str,
+                 field_name: str,
+                 spec: ArraySpec):
+
+        cls.replace(table_name=table_name, field_name=field_name, options=dumps(spec.options())).execute()
+
+    @classmethod
+    def get_specs(cls) -> Dict[str, Dict[str, ArraySpec]]:
+
+        specs = {}
+        for line in cls.select():
+            specs.setdefault(line.table_name, {})[line.field_name] = ArraySpec.from_options(loads(line.options))
+        return specs
+
+    @classmethod
+    def rename(cls,
+               table_name: str,
+               new_table_name: Optional[str] = None,
+               field_name: Optional[str] = None,
+               new_field_name: Optional[str] = None):
+
+        if field_name is None:
+            cls.update(table_name=new_table_name).where(cls.table_name == table_name).execute()
+        else:
+            cls.update(field_name=new_field_name).where((cls.table_name == table_name) &
+                                                        (cls.field_name == field_name)).execute()
+
+    @classmethod
+    def remove(cls,
+               table_name: str,
+               field_name: Optional[str] = None):
+
+        query = cls.delete().where(cls.table_name == table_name)
+        if field_name is not None:
+            query = query.where(cls.field_name == field_name)
+        query.execute()
+
+
+class BlobTable(HiddenTable):
+    name: str = '_ssd_blobs'
+    cache_size: int = 64
+
+    digest = BlobField(primary_key=True)
+    data = BlobField()
+    refcount = IntegerField(default=1)
+
+    @classmethod
+    def connect(cls,
+                database: SqliteDatabase) -> Type['BlobTable']:
+
+        table = super().connect(database)
+        table.cache: Dict[bytes, bytes] = {}
+        return table
+
+    @classmethod
+    def put(cls,
+            digest: bytes,
+            data: bytes):
+
+        # Only add a reference if the content is already stored
+        if cls.update(refcount=cls.refcount + 1).where(cls.digest == digest).execute() == 0:
+            cls.insert(digest=digest, data=data).execute()
+
+    @classmethod
+    def get(cls,
+            digest: bytes) -> bytes:
+
+        if digest not in cls.cache:
+            if len(cls.cache) >= cls.cache_size:
+                cls.cache.pop(next(iter(cls.cache)))
+            cls.cache[digest] = cls.select(cls.data).where(cls.digest == digest).scalar()
+        return cls.cache[digest]
+
+    @classmethod
+    def release(cls,
+                digests: List[bytes]):
+
+        # Remove the references, then the contents that are no longer referenced
+        with cls.database().atomic():
+            for digest, count in Counter(digests).items():
+                cls.update(refcount=cls.refcount - count).where(cls.digest == digest).execute()
+            for digest in cls.select(cls.digest).where(cls.refcount <= 0).tuples():
+                cls.cache.pop(digest[0], None)
+            cls.delete().where(cls.refcount <= 0).execute()
@@ -0,0 +1,157 @@
+from typing import Dict, Optional, BinaryIO
+from os import remove, fsync
+from os.path import exists, getsize
+from mmap import PAGESIZE
+from numpy import memmap, uint8
+
+# Encoded arrays of the in-memory arenas (per offset), shared by the Databases of this process with the same path
+MEMORY_ARENAS: Dict[str, Dict[int, bytes]] = {}
+
+
+class Arena:
+
+    def __init__(self,
+                 arena_path: str,
+                 in_memory: bool = False):
+        """
+        Append-only sidecar file of a Database in which large encoded arrays are stored.
+        Each array starts on a new page of the file and is read as a view on a memory map of the file.
+
+        :param arena_path: Path of the arena file.
+        :param in_memory: If True, the arrays are kept in memory instead of a file (arena of an in-memory Database).
+        """
+
+        self.path: str = arena_path
+        self.in_memory: bool = in_memory
+        self.__file: Optional[BinaryIO] = None
+        self.__map: Optional[memmap] = None
+
+        # Appended arrays are only synced to the disk before the commit of a step
+        self.hold: bool = False
+        self.__unsynced: bool = False
+
+    @property
+    def exists(self) -> bool:
+
+        return self.path in MEMORY_ARENAS if self.in_memory else exists(self.path)
+
+    @property
+    def size(self) -> int:
+
+        if self.in_memory:
+            if len(arrays := MEMORY_ARENAS.get(self.path, {})) == 0:
+                return 0
+            offset, data = next(reversed(arrays.items()))
+            return offset + len(data)
+        return getsize(self.path) if exists(self.path) else 0
+
+    def append(self,
+               data: bytes) -> int:
+        """
+        Append an encoded array at the end of the arena file, return its offset in the file.
+
+        :param data: Encoded array.
+        """
+
+        if self.in_memory:
+            offset = self.size + (-self.size % PAGESIZE)
+            MEMORY_ARENAS.setdefault(self.path, {})[offset] = bytes(data)
+            return offset
+
+        if self.__file is None:
+            self.__file = open(self.path, 'ab')
+        offset = self.__file.seek(0, 2)
+        padding = -offset % PAGESIZE
+        self.__file.write(b'\x00' * padding + data)
+        # Flush so that the data is available to readers, sync so that it is on the disk before the line referencing
+        # it is committed
+        self.__file.flush()
+        self.__unsynced = True
+        if not self.hold:
+            self.sync()
+        return offset + padding
+
+    def sync(self):
+        """
+        Write the appended arrays to the disk.
+        """
+
+        if self.__unsynced and self.__file is not None:
+            fsync(self.__file.fileno())
+        self.__unsynced = False
+
+    def truncate(self,
+                 size: int):
+        """
+        Remove the arrays appended after a given size of the arena (arrays of a cancelled step).
+
+        :param size: Size of the arena to keep.
+        """
+
+        if self.in_memory:
+            arrays = MEMORY_ARENAS.get(self.path, {})
+            for offset in [offset for offset in arrays if offset >= size]:
+                arrays.pop(offset)
+            return
+
+        if self.size > size:
+            if self.__file is None:
+                self.__file = open(self.path, 'ab')
+            self.__file.truncate(size)
+            self.__map = None
+        self.__unsynced = False
+
+    def read(self,
+             offset: int,
+             length: int) -> memoryview:
+        """
+        Get a read-only view on an encoded array of the arena file.
+
+        :param offset: Offset of the encoded array in the file.
+        :param length: Length of the encoded array.
+        """
+
+        if self.in_memory:
+            return memoryview(MEMORY_ARENAS[self.path][offset])[:length]
+
+        # The file might have grown since the last mapping (written by this process or by another one)
+        if self.__map is None or len(self.__map) < offset + length:
+            self.__map = memmap(self.path, dtype=uint8, mode='r')
+        return memoryview(self.__map)[offset:offset + length]
+
+    def save(self,
+             arena_path: str):
+        """
+        Write the content of the arena in a file.
+
+        :param arena_path: Path of the arena file.
+        """
+
+        with open(arena_path, 'wb') as file:
+            if self.in_memory:
+                for offset, data in list(MEMORY_ARENAS.get(self.path, {}).items()):
+                    file.seek(offset)
+                    file.write(data)
+            elif exists(self.path):
+                with open(self.path, 'rb') as source:
+                    while len(chunk := source.read(2 ** 24)) > 0:
+                        file.write(chunk)
+
+    def close(self,
+              erase_file: bool = False):
+        """
+        Close the arena file. Arrays that were read from the arena remain valid.
+
+        :param erase_file: If True, the arena file will be erased.
+        """
+
+        if self.__file is not None:
+            self.sync()
+            self.__file.close()
+            self.__file = None
+        self.__map = None
+        if erase_file:
+            if self.in_memory:
+                MEMORY_ARENAS.pop(self.path, None)
+            elif exists(self.path):
+                remove(self.path)
@@ -0,0 +1,79 @@
+from typing import Dict, List, Optional, Any
+
+from numpy import ndarray, add, minimum, maximum, flatnonzero, concatenate, diff, float64, zeros, issubdtype, number, \
+    bool_, int64
+
+FUNCTIONS: List[str] = ['count', 'sum', 'mean', 'min', 'max']
+
+
+class ArrayReducer:
+
+    def __init__(self,
+                 functions: List[str],
+                 group_size: Optional[int] = None):
+        """
+        Per-element reduction of the arrays of a Field, computed chunk by chunk so that only one chunk of arrays is held
+        in memory. The arrays are grouped by ranges of line indices.
+
+        :param functions: Names of the reductions to compute ('count', 'sum', 'mean', 'min' or 'max').
+        :param group_size: Number of line indices of each group. If not specified, all the arrays are reduced together.
+        """
+
+        self.functions: List[str] = functions
+        self.group_size: Optional[int] = group_size
+
+        # Partial reductions of each group: number of arrays, sum, minimum and maximum
+        self.__groups: Dict[int, List[Any]] = {}
+
+    def add(self,
+            lines_id: ndarray,
+            arrays: ndarray):
+        """
+        Reduce a chunk of stacked arrays.
+
+        :param lines_id: Indices of the lines of the chunk (sorted).
+        :param arrays: Stacked arrays of the chunk, of shape (nb_lines, ...).
+        """
+
+        if len(lines_id) == 0:
+            return
+        if not issubdtype(arrays.dtype, number) and arrays.dtype != bool_:
+            raise ValueError(f"Arrays with data type {arrays.dtype} can not be reduced.")
+
+        # Bounds of the groups in the chunk (the lines are sorted by index)
+        groups = zeros(len(lines_id), dtype=int64) if self.group_size is None else (lines_id - 1) // self.group_size
+        starts = flatnonzero(concatenate([[True], groups[1:] != groups[:-1]]))
+        counts = diff(concatenate([starts, [len(lines_id)]])).tolist()
+
+        # Sums are computed in double precision, extrema keep the data type of the arrays
+        sums = add.reduceat(arrays, starts, axis=0, dtype=float64)
+        mins = minimum.reduceat(arrays, starts, axis=0)
+        maxs = maximum.reduceat(arrays, starts, axis=0)
+
+        # Merge with the previous chunks (a group can overlap two chunks)
+        for i, group in enumerate(groups[starts].tolist()):
+            if group not in self.__groups:
+                self.__groups[group] = [counts[i], sums[i], mins[i], maxs[i]]
+            else:
+                partial = self.__groups[group]
+                if partial[2].shape != mins[i].shape:
+                    raise ValueError(f"Arrays with different shapes {partial[2].shape} and {mins[i].shape} can not be "
+                                     f"reduced together.")
+                partial[0] += counts[i]
+                partial[1] = partial[1] + sums[i]
+                partial[2] = minimum(partial[2], mins[i])
+                partial[3] = maximum(partial[3], maxs[i])
+
+    def result(self,
+               group: int = 0) -> Dict[str, Any]:
+        """
+        Get the reductions of a group (None if the group does not contain any array).
+
+        :param group: Index of the group.
+        """
+
+        if group not in self.__groups:
+            return {function: 0 if function == 'count' else None for function in self.functions}
+        count, sums, mins, maxs = self.__groups[group]
+        reductions = {'count': count, 'sum': sums, 'mean': sums / count, 'min': mins, 'max': maxs}
+        return {function: reductions[function] for function in self.functions}
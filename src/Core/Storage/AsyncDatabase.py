@@ -0,0 +1,270 @@
+from typing import Union, List, Dict, Tuple, Optional, Any
+from threading import Thread
+from queue import SimpleQueue, Empty
+from concurrent.futures import Future
+from asyncio import Semaphore, get_running_loop, wrap_future
+
+from SSD.Core.Storage.Database import Database
+
+
+class AsyncDatabase:
+
+    def __init__(self,
+                 database: Database,
+                 nb_readers: int = 4,
+                 max_pending: int = 1024,
+                 max_batch: int = 256):
+        """
+        Asyncio interface of a Database. Writes are executed by a dedicated writer thread which commits the pending
+        writes in batches (a single transaction per batch). Reads are executed concurrently by a pool of threads with
+        their own read-only connection to the Database (file or in-memory Database).
+        Back-pressure: awaiting a write suspends the caller while 'max_pending' writes are waiting to be executed.
+        Cancellation: a cancelled write (or read) is never executed if the thread did not start it yet, otherwise it is
+        completed (and committed) even if the awaiting task was cancelled.
+
+        :param database: Database to access (created or loaded), not to be used directly until the AsyncDatabase is
+                         closed.
+        :param nb_readers: Number of reading threads.
+        :param max_pending: Maximum number of pending writes.
+        :param max_batch: Maximum number of writes committed in a single transaction.
+        """
+
+        if nb_readers < 1 or max_pending < 1 or max_batch < 1:
+            raise ValueError(f"The settings of the AsyncDatabase must be positive, not (nb_readers={nb_readers}, "
+                             f"max_pending={max_pending}, max_batch={max_batch}).")
+        if database.in_step:
+            raise ValueError("A step is in progress in the Database, end it before creating an AsyncDatabase.")
+
+        self.database: Database = database
+        self.max_batch: int = max_batch
+        self.__closed: bool = False
+
+        # Writes: queue of the writer thread, slots of the pending writes
+        self.__slots = Semaphore(max_pending)
+        self.__writes: SimpleQueue = SimpleQueue()
+        self.__writer = Thread(target=self.__write_loop, daemon=True)
+
+        # Reads: shared queue of the reading threads, schema version of the Database (readers reload their models
+        # when the writer changed the schema)
+        self.__schema_version: int = database.get_schema_version()
+        self.__reads: SimpleQueue = SimpleQueue()
+        self.__readers = [Thread(target=self.__read_loop, daemon=True) for _ in range(nb_readers)]
+
+        self.__writer.start()
+        for reader in self.__readers:
+            reader.start()
+
+    async def add_data(self,
+                       table_name: str,
+                       data: Dict[str, Any]) -> int:
+        """
+        Execute a line insert query. Return the index of the new line in the Table.
+
+        :param table_name: Name of the Table.
+        :param data: New line of the Table.
+        """
+
+        return await self.__write('add_data', table_name=table_name, data=data)
+
+    async def add_batch(self,
+                        table_name: str,
+                        batch: Dict[str, List[Any]]) -> List[int]:
+        """
+        Execute a batch insert query. Return the indices of the new lines in the Table.
+
+        :param table_name: Name of the Table.
+        :param batch: New lines of the Table.
+        """
+
+        return await self.__write('add_batch', table_name=table_name, batch=batch)
+
+    async def update(self,
+                     table_name: str,
+                     data: Dict[str, Any],
+                     line_id: int = -1,
+                     create_fields: bool = False):
+        """
+        Update a line of a Table.
+
+        :param table_name: Name of the Table on which to perform the query.
+        :param data: Updated data of the line.
+        :param line_id: Index of the line to update.
+        :param create_fields: Create missing fields.
+        """
+
+        return await self.__write('update', table_name=table_name, data=data, line_id=line_id,
+                                  create_fields=create_fields)
+
+    async def get_line(self,
+                       table_name: str,
+                       fields: Optional[Union[str, List[str]]] = None,
+                       line_id: int = -1,
+                       lazy: bool = False) -> Dict[str, Any]:
+        """
+        Get a line of a Table.
+
+        :param table_name: Name of the Table on which to perform the query.
+        :param fields: Name(s) of the Field(s) to request.
+        :param line_id: Index of the line to get.
+        :param lazy: If True, arrays are decoded on first access only.
+        """
+
+        return await self.__read('get_line', table_name=table_name, fields=fields, line_id=line_id, lazy=lazy)
+
+    async def get_lines(self,
+                        table_name: str,
+                        fields: Optional[Union[str, List[str]]] = None,
+                        lines_id: Optional[List[int]] = None,
+                        lines_range: Optional[List[int]] = None,
+                        batched: bool = False,
+                        lazy: bool = False) -> Union[Dict[str, List[Any]], List[Dict[str, Any]]]:
+        """
+        Get a set of lines of a Table.
+
+        :param table_name: Name of the Table on which to perform the query.
+        :param fields: Name(s) of the Field(s) to select.
+        :param lines_id: Indices of the lines to get. If not specified, 'lines_range' value will be used.
+        :param lines_range: Range of indices of the lines to get. If not specified, all lines will be selected.
+        :param batched: If True, data is returned as one batch per field. Otherwise, data is returned as list of lines.
+        :param lazy: If True (and not batched), arrays are decoded on first access only.
+        """
+
+        return await self.__read('get_lines', table_name=table_name, fields=fields, lines_id=lines_id,
+                                 lines_range=lines_range, batched=batched, lazy=lazy)
+
+    async def nb_lines(self,
+                       table_name: str) -> int:
+        """
+        Return the number of entries on a Table.
+
+        :param table_name: Name of the Table.
+        """
+
+        return await self.__read('nb_lines', table_name=table_name)
+
+    async def export(self,
+                     exporter: str,
+                     filename: str,
+                     tables: Optional[Union[str, List[str]]] = None):
+        """
+        Export the Tables of the Database.
+
+        :param exporter: Format of the exported files, either 'json' or 'csv'.
+        :param filename: Name of the exported files.
+        :param tables: Name(s) of the Table(s) to export. If not specified, all the Tables are exported.
+        """
+
+        return await self.__read('export', exporter=exporter, filename=filename, tables=tables)
+
+    async def close(self,
+                    erase_file: bool = False):
+        """
+        Execute the pending reads and writes, then close the Database.
+
+        :param erase_file: If True, the Database file will be erased.
+        """
+
+        if self.__closed:
+            return
+        self.__closed = True
+        loop = get_running_loop()
+        for _ in self.__readers:
+            self.__reads.put(None)
+        for reader in self.__readers:
+            await loop.run_in_executor(None, reader.join)
+        self.__writes.put((None, 'close', {'erase_file': erase_file}))
+        await loop.run_in_executor(None, self.__writer.join)
+
+    async def __write(self,
+                      method: str,
+                      **kwargs) -> Any:
+
+        if self.__closed:
+            raise ValueError("The AsyncDatabase is closed.")
+
+        # Back-pressure: wait for a free slot, the slot is released when the write is done or cancelled
+        await self.__slots.acquire()
+        loop = get_running_loop()
+        future = Future()
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self.__slots.release))
+        self.__writes.put((future, method, kwargs))
+        return await wrap_future(future)
+
+    async def __read(self,
+                     method: str,
+                     **kwargs) -> Any:
+
+        if self.__closed:
+            raise ValueError("The AsyncDatabase is closed.")
+        future = Future()
+        self.__reads.put((future, method, kwargs))
+        return await wrap_future(future)
+
+    def __write_loop(self):
+
+        closing: Optional[Tuple[None, str, Dict[str, Any]]] = None
+        while closing is None:
+
+            # Get the pending writes (the cancelled writes are skipped)
+            jobs, job = [], self.__writes.get()
+            while True:
+                if job[0] is None:
+                    closing = job
+                elif job[0].set_running_or_notify_cancel():
+                    jobs.append(job)
+                if closing is not None or len(jobs) == self.max_batch:
+                    break
+                try:
+                    job = self.__writes.get_nowait()
+                except Empty:
+                    break
+
+            # Commit the writes in a single transaction, replay them one by one if one of them failed
+            if len(jobs) > 0:
+                outcomes: List[Tuple[Future, Any, Optional[Exception]]] = []
+                try:
+                    with self.database.transaction():
+                        for future, method, kwargs in jobs:
+                            outcomes.append((future, getattr(self.database, method)(**kwargs), None))
+                except Exception:
+                    outcomes = []
+                    for future, method, kwargs in jobs:
+                        try:
+                            with self.database.transaction():
+                                outcomes.append((future, getattr(self.database, method)(**kwargs), None))
+                        except Exception as error:
+                            outcomes.append((future, None, error))
+
+                # Readers reload their models after a schema change (before the writes are acknowledged)
+                self.__schema_version = self.database.get_schema_version()
+                for future, result, error in outcomes:
+                    if error is None:
+                        future.set_result(result)
+                    else:
+                        future.set_exception(error)
+
+        # The connection of the writer thread is specific to this thread
+        self.database.close(**closing[2])
+
+    def __read_loop(self):
+
+        reader: Optional[Database] = None
+        schema_version: Optional[int] = None
+        while (job := self.__reads.get()) is not None:
+            future, method, kwargs = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                if reader is None or schema_version != self.__schema_version:
+                    schema_version = self.__schema_version
+                    if reader is not None:
+                        reader.close()
+                    reader = Database(*self.database.get_path()).load(read_only=True,
+                                                                      in_memory=self.database.in_memory)
+                result = getattr(reader, method)(**kwargs)
+            except Exception as error:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        if reader is not None:
+            reader.close()
@@ -0,0 +1,349 @@
+from typing import Union, List, Dict, Optional, Any, Tuple
+from os import mkdir, replace, remove
+from os.path import exists, join, getsize
+from shutil import rmtree
+from json import load as json_load, dump as json_dump
+from numpy import ndarray, asarray, concatenate, load as np_load, save as np_save, cumsum, searchsorted, \
+    dtype as np_dtype
+
+from SSD.Core.Storage.StorageEngine import StorageEngine
+from SSD.Core.Storage.ExtendedFields import ArraySpec
+
+
+class ColumnarEngine(StorageEngine):
+
+    def __init__(self,
+                 database_dir: str,
+                 database_name: str,
+                 chunk_size: int = 1024):
+        """
+        Columnar storage engine: each Field of a Table is stored as append-only chunk files (npy files of 'chunk_size'
+        stacked values) described by an index file. Lines are appended to the Fields in memory and written by chunks,
+        chunks are read through memory maps. Values of a Field must have the same type and shape.
+
+        :param database_dir: Directory which contains the Database files.
+        :param database_name: Name of the Database.
+        :param chunk_size: Number of lines in a chunk file.
+        """
+
+        StorageEngine.__init__(self,
+                               database_dir=database_dir,
+                               database_name=database_name)
+        if chunk_size < 1:
+            raise ValueError(f"The size of the chunks must be positive, not {chunk_size}.")
+
+        self.path: str = join(database_dir, f'{database_name}.columns')
+        self.chunk_size: int = chunk_size
+
+        # Index of the Tables: role, number of lines, Fields (dtype, shape, default value, lengths of the chunks)
+        self.__tables: Dict[str, Dict[str, Any]] = {}
+        # Values of the Fields not written in chunks yet, memory maps of the chunks
+        self.__pending: Dict[str, Dict[str, List[ndarray]]] = {}
+        self.__maps: Dict[Tuple[str, str, int], ndarray] = {}
+
+    def new(self,
+            remove_existing: bool = False) -> None:
+
+        if not exists(self.database_dir) and self.database_dir != '':
+            mkdir(self.database_dir)
+        if exists(self.path):
+            if not remove_existing:
+                raise ValueError(f"The Database {self.path} already exists.")
+            rmtree(self.path)
+        mkdir(self.path)
+        self.__tables, self.__pending, self.__maps = {}, {}, {}
+        self.__save_index()
+
+    def load(self) -> None:
+
+        if not exists(index_path := join(self.path, 'index.json')):
+            raise ValueError(f"WARNING: the following Database does not exist ({self.path}).")
+        with open(index_path, 'r') as file:
+            self.__tables = json_load(file)
+        self.__pending = {table_name: {field_name: [] for field_name in table['fields']}
+                          for table_name, table in self.__tables.items()}
+        self.__maps = {}
+
+    def __save_index(self):
+
+        # The index is replaced at once so that readers never see a partial index
+        with open(index_path := join(self.path, 'index.json.tmp'), 'w') as file:
+            json_dump(self.__tables, file, indent=1)
+        replace(index_path, join(self.path, 'index.json'))
+
+    def get_architecture(self) -> Dict[str, List[str]]:
+
+        return {table_name: [f"{field_name} ({field['dtype']}{tuple(field['shape']) if field['shape'] else ''})"
+                             for field_name, field in table['fields'].items()]
+                for table_name, table in self.__tables.items()}
+
+    def get_tables(self) -> List[str]:
+
+        return list(self.__tables.keys())
+
+    def get_fields(self,
+                   table_name: str) -> List[str]:
+
+        return ['id'] + list(self.__table(table_name)['fields'].keys())
+
+    def create_table(self,
+                     table_name: str,
+                     storing_table: bool,
+                     fields: List[tuple]) -> None:
+
+        if table_name in self.__tables:
+            raise ValueError(f"The Table {table_name} already exists.")
+        mkdir(join(self.path, table_name))
+        self.__tables[table_name] = {'storing': storing_table, 'nb_lines': 0, 'fields': {}}
+        self.__pending[table_name] = {}
+        self.create_fields(table_name=table_name,
+                           fields=fields)
+
+    def create_fields(self,
+                      table_name: str,
+                      fields: List[tuple]) -> None:
+
+        table = self.__table(table_name)
+        if table['nb_lines'] > 0:
+            raise ValueError(f"Fields cannot be added to the non-empty Table {table_name} of a columnar Database.")
+        for field in fields:
+            field_name, field_type, default = field[0], field[1], field[2] if len(field) == 3 else None
+            if isinstance(field_type, str):
+                raise ValueError(f"The Field '{field_name}' is a ForeignKey, which is not available in a columnar "
+                                 f"Database.")
+            # The type and the shape of the arrays are defined by the ArraySpec or by the first value
+            dtype, shape = None, None
+            if isinstance(field_type, ArraySpec):
+                if field_type.shape is None or None in field_type.shape or field_type.dtype is None:
+                    raise ValueError(f"The ArraySpec of the Field '{field_name}' must define the dtype and the fixed "
+                                     f"shape of the arrays in a columnar Database.")
+                dtype, shape = np_dtype(field_type.dtype).str, list(field_type.shape)
+            elif field_type in (int, float, bool):
+                dtype, shape = np_dtype(field_type).str, []
+            elif field_type == str:
+                dtype, shape = 'str', []
+            table['fields'][field_name] = {'dtype': dtype, 'shape': shape, 'chunks': [],
+                                           'default': default.tolist() if isinstance(default, ndarray) else default}
+            self.__pending[table_name][field_name] = []
+        self.__save_index()
+
+    def add_data(self,
+                 table_name: str,
+                 data: Dict[str, Any]) -> int:
+
+        return self.add_batch(table_name=table_name,
+                              batch={field_name: [value] for field_name, value in data.items()})[0]
+
+    def add_batch(self,
+                  table_name: str,
+                  batch: Dict[str, List[Any]]) -> List[int]:
+
+        table = self.__table(table_name)
+        if len(undefined_fields := set(batch.keys()) - set(table['fields'].keys())) > 0:
+            raise ValueError(f"Some fields where not defined in table {table_name}: {list(undefined_fields)}.")
+        nb_samples = len(next(iter(batch.values()))) if len(batch) > 0 else 1
+
+        # Stack the values of each Field (the default value for the missing Fields)
+        blocks = {}
+        for field_name, field in table['fields'].items():
+            if field_name in batch:
+                blocks[field_name] = self.__stack(table_name, field_name, batch[field_name])
+            elif field['default'] is not None:
+                blocks[field_name] = self.__stack(table_name, field_name, [field['default']] * nb_samples)
+            else:
+                raise ValueError(f"The Field '{field_name}' of the Table {table_name} has no default value, it must be "
+                                 f"defined in each line of a columnar Database.")
+            if len(blocks[field_name]) != nb_samples:
+                raise ValueError("The number of samples per batch must be the same for all fields.")
+
+        # ExchangeTables only keep the last line
+        if not table['storing']:
+            self.__clear(table_name)
+            blocks = {field_name: block[-1:] for field_name, block in blocks.items()}
+            nb_samples = 1
+
+        # Append the values, full chunks are written
+        first_id = table['nb_lines'] + 1
+        table['nb_lines'] += nb_samples
+        for field_name, block in blocks.items():
+            self.__pending[table_name][field_name].append(block)
+            if sum([len(b) for b in self.__pending[table_name][field_name]]) >= self.chunk_size:
+                self.__write_chunks(table_name, field_name, full_only=True)
+        return list(range(first_id, first_id + nb_samples))
+
+    def update(self,
+               table_name: str,
+               data: Dict[str, Any],
+               line_id: int) -> None:
+
+        table = self.__table(table_name)
+        for field_name, value in data.items():
+            if field_name not in table['fields']:
+                raise ValueError(f"Unknown field {field_name} in table {table_name}.")
+            value = self.__stack(table_name, field_name, [value])[0]
+            chunk, position = self.__locate(table_name, field_name, line_id - 1)
+            if chunk is None:
+                # The line was not written yet
+                pending = concatenate(self.__pending[table_name][field_name])
+                pending[position] = value
+                self.__pending[table_name][field_name] = [pending]
+            else:
+                # The chunk is replaced (the memory maps of the previous chunk remain valid)
+                values = np_load(chunk_path := self.__chunk_path(table_name, field_name, chunk))
+                values[position] = value
+                np_save(f'{chunk_path}.tmp.npy', values)
+                replace(f'{chunk_path}.tmp.npy', chunk_path)
+                self.__maps.pop((table_name, field_name, chunk), None)
+
+    def get_lines(self,
+                  table_name: str,
+                  fields: List[str],
+                  lines_id: List[int],
+                  batched: bool) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+
+        table = self.__table(table_name)
+        positions = asarray(lines_id, dtype=int) - 1
+        if len(positions) > 0 and (positions[0] < 0 or positions[-1] >= table['nb_lines']):
+            raise ValueError(f"Some lines do not exist in the Table {table_name}.")
+        columns = {'id': positions + 1}
+        for field_name in fields:
+            if field_name in table['fields']:
+                columns[field_name] = self.__read(table_name, field_name, positions)
+
+        # Scalar Fields are returned as lists, array Fields as stacked arrays (batched) or as views (lines)
+        if batched:
+            return {field_name: column.tolist() if column.ndim == 1 else column
+                    for field_name, column in columns.items()}
+        return [{field_name: column[i].item() if column.ndim == 1 else column[i]
+                 for field_name, column in columns.items()} for i in range(len(positions))]
+
+    def nb_lines(self,
+                 table_name: str) -> int:
+
+        return self.__table(table_name)['nb_lines']
+
+    def flush(self) -> None:
+
+        for table_name, table in self.__tables.items():
+            for field_name in table['fields']:
+                self.__write_chunks(table_name, field_name, full_only=False)
+        self.__save_index()
+
+    def memory_size(self) -> int:
+
+        # The pending values are not written (it would write partial chunks), they are counted with their size in memory
+        return sum([getsize(join(self.path, table_name, f'{field_name}.{chunk:06d}.npy'))
+                    for table_name, table in self.__tables.items()
+                    for field_name, field in table['fields'].items()
+                    for chunk in range(len(field['chunks']))]) + \
+            sum([block.nbytes for fields in self.__pending.values() for blocks in fields.values() for block in blocks])
+
+    def close(self,
+              erase_file: bool = False) -> None:
+
+        self.flush()
+        self.__maps = {}
+        if erase_file and exists(self.path):
+            rmtree(self.path)
+
+    def __table(self,
+                table_name: str) -> Dict[str, Any]:
+
+        if table_name not in self.__tables:
+            raise ValueError(f"Unknown table with name {table_name}")
+        return self.__tables[table_name]
+
+    def __chunk_path(self,
+                     table_name: str,
+                     field_name: str,
+                     chunk: int) -> str:
+
+        return join(self.path, table_name, f'{field_name}.{chunk:06d}.npy')
+
+    def __stack(self,
+                table_name: str,
+                field_name: str,
+                values: Union[List[Any], ndarray]) -> ndarray:
+
+        # Vectorized append: the values of a batch are stacked in a single array
+        field = self.__tables[table_name]['fields'][field_name]
+        block = asarray(values) if field['dtype'] in (None, 'str') else asarray(values, dtype=field['dtype'])
+        if field['dtype'] is None:
+            field['dtype'], field['shape'] = block.dtype.str, list(block.shape[1:])
+            self.__save_index()
+        if list(block.shape[1:]) != field['shape']:
+            raise ValueError(f"The values of the Field '{field_name}' must have the shape {tuple(field['shape'])}, not "
+                             f"{block.shape[1:]}.")
+        return block
+
+    def __write_chunks(self,
+                       table_name: str,
+                       field_name: str,
+                       full_only: bool):
+
+        field, pending = self.__tables[table_name]['fields'][field_name], self.__pending[table_name][field_name]
+        if len(pending) == 0:
+            return
+        values = concatenate(pending) if len(pending) > 1 else pending[0]
+        start = 0
+        while len(values) - start >= self.chunk_size or (not full_only and start < len(values)):
+            chunk = values[start:start + self.chunk_size]
+            np_save(self.__chunk_path(table_name, field_name, len(field['chunks'])), chunk)
+            field['chunks'].append(len(chunk))
+            start += len(chunk)
+        self.__pending[table_name][field_name] = [values[start:]] if start < len(values) else []
+
+    def __clear(self,
+                table_name: str):
+
+        table = self.__tables[table_name]
+        for field_name, field in table['fields'].items():
+            for chunk in range(len(field['chunks'])):
+                remove(self.__chunk_path(table_name, field_name, chunk))
+                self.__maps.pop((table_name, field_name, chunk), None)
+            field['chunks'] = []
+            self.__pending[table_name][field_name] = []
+        table['nb_lines'] = 0
+
+    def __locate(self,
+                 table_name: str,
+                 field_name: str,
+                 position: int) -> Tuple[Optional[int], int]:
+
+        # Chunk of a line (None for the pending lines) and position of the line in the chunk
+        chunks = self.__tables[table_name]['fields'][field_name]['chunks']
+        bounds = cumsum([0] + chunks)
+        if position >= bounds[-1]:
+            return None, position - bounds[-1]
+        chunk = int(searchsorted(bounds, position, side='right')) - 1
+        return chunk, position - bounds[chunk]
+
+    def __read(self,
+               table_name: str,
+               field_name: str,
+               positions: ndarray) -> ndarray:
+
+        chunks = self.__tables[table_name]['fields'][field_name]['chunks']
+        bounds = cumsum([0] + chunks)
+        pending = self.__pending[table_name][field_name]
+        contiguous = len(positions) > 0 and positions[-1] - positions[0] + 1 == len(positions)
+
+        # Select the lines in each chunk (a slice of the memory map for contiguous lines), then in the pending lines
+        parts = []
+        for chunk in range(len(chunks)):
+            first, last = searchsorted(positions, [bounds[chunk], bounds[chunk + 1]])
+            if first == last:
+                continue
+            if (key := (table_name, field_name, chunk)) not in self.__maps:
+                self.__maps[key] = np_load(self.__chunk_path(table_name, field_name, chunk), mmap_mode='r')
+            if contiguous:
+                parts.append(self.__maps[key][positions[first] - bounds[chunk]:positions[last - 1] - bounds[chunk] + 1])
+            else:
+                parts.append(self.__maps[key][positions[first:last] - bounds[chunk]])
+        if len(positions) > 0 and positions[-1] >= bounds[-1]:
+            values = concatenate(pending) if len(pending) > 1 else pending[0]
+            parts.append(values[positions[positions >= bounds[-1]] - bounds[-1]])
+        if len(parts) == 0:
+            field = self.__tables[table_name]['fields'][field_name]
+            return asarray([]).reshape((0, *(field['shape'] or [])))
+        return parts[0] if len(parts) == 1 else concatenate(parts)
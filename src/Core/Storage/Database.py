@@ -1,17 +1,53 @@
-from typing import Union, List, Type, Dict, Tuple, Optional, Any, Callable
-from os import remove, mkdir
+from typing import Union, List, Type, Dict, Tuple, Optional, Any, Callable, Iterator, Set
+from contextlib import contextmanager
+from os import remove, mkdir, replace
 from os.path import exists, join, sep, getsize
+from urllib.parse import quote
+from sqlite3 import connect, Connection
 from inspect import getmembers
 from playhouse.migrate import SqliteDatabase
 from playhouse.signals import Signal, pre_save, post_save
 from datetime import datetime
-from numpy import unique
-
-from SSD.Core.Storage.AdaptiveTable import AdaptiveTable, StoringTable, ExchangeTable, ForeignKeyField
+from itertools import islice
+from functools import partial
+from numpy import unique, ndarray, array
+
+from SSD.Core.Storage.AdaptiveTable import AdaptiveTable, StoringTable, ExchangeTable, SchemaTable, BlobTable, \
+    ForeignKeyField
+from SSD.Core.Storage.ExtendedFields import ArraySpec, NumpyField, LazyArray, LazyLine
+from SSD.Core.Storage.Arena import Arena
+from SSD.Core.Storage.WriteBuffer import WriteBuffer
+from SSD.Core.Storage.Snapshotter import Snapshotter
+from SSD.Core.Storage.MetadataCache import MetadataCache
+from SSD.Core.Storage.QueryPlan import QueryPlan
+from SSD.Core.Storage.JoinPlan import JoinPlan
+from SSD.Core.Storage.Where import Where, order_clause
+from SSD.Core.Storage.ArrayReducer import ArrayReducer, FUNCTIONS
+from SSD.Core.Storage.selection import DataType, line_index, lines_range as get_lines_range, stack_values
 from SSD.Core.Storage.ExtendedPeewee import generate_models
 from SSD.Core.Storage.Exporter import Exporter, ExporterJson, ExporterCSV
 
-FieldType = Union[Tuple[str, Type], Tuple[str, Type, Any], Tuple[str, str]]
+FieldType = Union[Tuple[str, Type], Tuple[str, Type, Any], Tuple[str, str], Tuple[str, ArraySpec]]
+Condition = Union[Where, Dict[str, Any]]
+
+# SQL aggregate function of each reduction, and Field types on which sums and means are defined
+AGGREGATES: Dict[str, str] = {'count': 'COUNT', 'sum': 'SUM', 'mean': 'AVG', 'min': 'MIN', 'max': 'MAX'}
+NUMERIC_TYPES: List[str] = ['INT', 'BIGINT', 'SMALLINT', 'AUTO', 'FLOAT', 'DOUBLE', 'DECIMAL', 'BOOL']
+
+# SQLite performance profiles (the page size only applies when creating the Database file)
+PROFILES: Dict[str, Dict[str, Any]] = {
+    # Default SQLite behavior: rollback journal, full synchronization at each commit
+    'safe': {'page_size': 4096, 'journal_mode': 'delete', 'synchronous': 2, 'cache_size': -2000, 'mmap_size': 0,
+             'temp_store': 0},
+    # Write-ahead log (readers do not block the writer), synchronization at checkpoints only
+    'throughput': {'page_size': 16384, 'journal_mode': 'wal', 'synchronous': 1, 'cache_size': -65536,
+                   'mmap_size': 2 ** 28, 'temp_store': 2},
+    # No synchronization: fastest writes, the last transactions might be lost on power failure
+    'bulk_load': {'page_size': 16384, 'journal_mode': 'wal', 'synchronous': 0, 'cache_size': -262144,
+                  'mmap_size': 2 ** 28, 'temp_store': 2},
+    # Large cache and memory map for reading recorded data
+    'read_replay': {'page_size': 16384, 'journal_mode': 'wal', 'synchronous': 1, 'cache_size': -262144,
+                    'mmap_size': 2 ** 30, 'temp_store': 2}}
 
 
 class Database:
@@ -33,9 +69,25 @@ class Database:
         self.__database_dir = database_dir
         self.__database_name = database_name
         self.__database: Optional[SqliteDatabase] = None
+        self.__in_memory: bool = False
+        self.__anchor: Optional[Connection] = None
+        self.__snapshotter: Optional[Snapshotter] = None
+        self.__profile: Optional[str] = None
+        self.__metadata: Optional[MetadataCache] = None
+        self.__plans: Dict[Tuple[str, Tuple[str, ...]], QueryPlan] = {}
+        self.__joins: Dict[Tuple[str, Tuple[str, ...], bool], JoinPlan] = {}
         self.__tables: Dict[str, type(AdaptiveTable)] = {}
         self.__fk: Dict[str, Dict[str, str]] = {}
+        self.__schema: Optional[Type[SchemaTable]] = None
+        self.__blobs: Optional[Type[BlobTable]] = None
+        self.__arena: Optional[Arena] = None
+        self.__buffer: Optional[WriteBuffer] = None
+        self.__step: Optional[Any] = None
+        self.__step_schema: Optional[Tuple] = None
+        self.__step_arena: int = 0
         self.__signals: List[Tuple[str, Signal, str, Callable, str]] = []
+        # Tables connected to signals as sender, their lines are saved as peewee models to send the signals
+        self.__senders: Set[str] = set()
         self.__exporters: Dict[str, Tuple[Type[Exporter], str]] = {'json': (ExporterJson, 'json'),
                                                                    'csv': (ExporterCSV, 'csv')}
 
@@ -50,22 +102,61 @@ class Database:
         return table_name[0] + table_name[1:].lower() if len(table_name) > 1 else table_name
 
     def new(self,
-            remove_existing: bool = False):
+            remove_existing: bool = False,
+            profile: str = 'safe',
+            in_memory: bool = False):
         """
         Create a new Database file.
 
         :param remove_existing: If True, Database file will be overwritten.
+        :param profile: SQLite performance profile, either 'safe', 'throughput', 'bulk_load' or 'read_replay'.
+        :param in_memory: If True, the Database is kept in memory instead of a file. The in-memory Database is shared
+                          by all the connections of this process to the same Database path (see 'load'). Use 'snapshot'
+                          to save it to a file.
         """
 
+        self.__check_profile(profile)
+
         # Create directory if not exists
         if not exists(self.__database_dir) and self.__database_dir != '':
             mkdir(self.__database_dir)
 
+        # In-memory Database: the anchor connection keeps the Database alive until it is closed
+        if in_memory:
+            self.__in_memory = True
+            self.__anchor = connect(self.__memory_uri(), uri=True, check_same_thread=False)
+            if len(tables := self.__memory_tables()) > 0:
+                # Option 1: Overwriting Database
+                if remove_existing:
+                    for table_name in tables:
+                        self.__anchor.execute(f'DROP TABLE "{table_name}"')
+                    self.__anchor.commit()
+                    Arena(self.__arena_path(), in_memory=True).close(erase_file=True)
+                # Option 2: Indexing Database name
+                else:
+                    database_name, index = self.__database_name, 0
+                    while len(self.__memory_tables()) > 0:
+                        index += 1
+                        self.__anchor.close()
+                        self.__database_name = f'{database_name}({index})'
+                        self.__anchor = connect(self.__memory_uri(), uri=True, check_same_thread=False)
+            self.__database = SqliteDatabase(self.__memory_uri(),
+                                             uri=True,
+                                             pragmas=[(pragma, value) for pragma, value in PROFILES[profile].items()
+                                                      if pragma not in ('journal_mode', 'mmap_size')])
+            self.__metadata = MetadataCache(self.__database)
+            self.__profile = profile
+            return self
+
         # Check for existing similar files
         if exists(database_path := join(self.__database_dir, f'{self.__database_name}.db')):
             # Option 1: Overwriting file
             if remove_existing:
                 remove(database_path)
+                for journal_path in [f'{database_path}-wal', f'{database_path}-shm']:
+                    if exists(journal_path):
+                        remove(journal_path)
+                Arena(self.__arena_path()).close(erase_file=True)
             # Option 2: Indexing file name
             else:
                 index = 1
@@ -74,24 +165,58 @@ class Database:
                 self.__database_name = f'{self.__database_name}({index})'
 
         # Create the Database
-        self.__database = SqliteDatabase(database_path)
+        self.__database = SqliteDatabase(database_path,
+                                         pragmas=list(PROFILES[profile].items()))
+        self.__metadata = MetadataCache(self.__database)
+        self.__profile = profile
         return self
 
     def load(self,
-             show_architecture: bool = False):
+             show_architecture: bool = False,
+             profile: Optional[str] = None,
+             read_only: bool = False,
+             in_memory: bool = False):
         """
         Load an existing Database file.
 
         :param show_architecture: If True, the loaded models will be printed.
+        :param profile: SQLite performance profile, either 'safe', 'throughput', 'bulk_load' or 'read_replay'. If not
+                        specified, the settings of the Database file are kept (the Database file might be shared
+                        with another process).
+        :param read_only: If True, the Database file is opened with a read-only connection.
+        :param in_memory: If True, attach to the in-memory Database created with the same path in this process.
         """
 
+        if profile is not None:
+            self.__check_profile(profile)
+
         # Check file existence
-        if not exists(database_path := join(self.__database_dir, f'{self.__database_name}.db')):
+        database_path = join(self.__database_dir, f'{self.__database_name}.db')
+        if in_memory:
+            self.__in_memory = True
+            database_path = self.__memory_uri()
+            connection = connect(database_path, uri=True)
+            empty = len(connection.execute("SELECT name FROM sqlite_master").fetchall()) == 0
+            connection.close()
+            if empty:
+                raise ValueError(f"WARNING: the following in-memory Database does not exist ({database_path}).")
+        elif not exists(database_path):
             raise ValueError(f"WARNING: the following Database does not exist ({database_path}).")
 
         # Load the Database
-        self.__database = SqliteDatabase(database_path)
-        models, database_descr = generate_models(self.__database)
+        if read_only:
+            database_path = f'{database_path}&mode=ro' if in_memory else f'file:{database_path}?mode=ro'
+        self.__database = SqliteDatabase(database_path,
+                                         uri=read_only or in_memory,
+                                         pragmas=[] if profile is None else
+                                         [(pragma, value) for pragma, value in PROFILES[profile].items()
+                                          if pragma != 'page_size' and not (in_memory and pragma in ('journal_mode',
+                                                                                                     'mmap_size'))])
+        self.__metadata = MetadataCache(self.__database)
+        self.__profile = profile
+        tables = self.__database.get_tables()
+        models, database_descr = generate_models(self.__database,
+                                                 table_names=[t for t in tables if not t.startswith('_ssd_')])
         for table_name, model in models.items():
             # Loading removes the '_' symbol in desc.model_names
             table_name_parts = table_name.split('_')
@@ -112,12 +237,109 @@ class Database:
                 if type(field) == ForeignKeyField:
                     self.__fk[table_name][field_name] = field.rel_model._meta.name
 
+        # Register the options of array Fields
+        if BlobTable.name in tables:
+            self.__blobs = BlobTable.connect(self.__database)
+        if (arena := Arena(self.__arena_path(), in_memory=self.__in_memory)).exists:
+            self.__arena = arena
+        if SchemaTable.name in tables:
+            self.__schema = SchemaTable.connect(self.__database)
+            for table_name, specs in self.__schema.get_specs().items():
+                for field_name, spec in specs.items():
+                    # The arena file might not be created yet by the writer of the Database
+                    if spec.external is not None and self.__arena is None:
+                        self.__arena = Arena(self.__arena_path(), in_memory=self.__in_memory)
+                    field = self.__tables[table_name].fields(only_names=False)[field_name]
+                    field.spec, field.store, field.arena = spec, self.__blobs, self.__arena
+
         # Show resulting architecture
         if show_architecture:
             self.print_architecture()
 
         return self
 
+    def __arena_path(self) -> str:
+
+        return join(self.__database_dir, f'{self.__database_name}.arena')
+
+    def __memory_uri(self) -> str:
+
+        # The 'memdb' VFS shares a Database between the connections of a process if its name starts with '/'
+        return f"file:/{quote(join(self.__database_dir, self.__database_name).lstrip(sep))}?vfs=memdb"
+
+    def __memory_tables(self) -> List[str]:
+
+        return [row[0] for row in self.__anchor.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+
+    @property
+    def in_memory(self) -> bool:
+        """
+        Check if the Database is kept in memory.
+        """
+
+        return self.__in_memory
+
+    def snapshot(self,
+                 database_name: Optional[str] = None) -> str:
+        """
+        Save a copy of the committed content of the Database to a file with the online backup API of SQLite, without
+        interrupting the writes. Return the path of the snapshot file.
+
+        :param database_name: Name of the snapshot file in the Database directory. Default is the name of the Database
+                              for an in-memory Database and the name of the Database with the '_snapshot' suffix
+                              otherwise.
+        """
+
+        if database_name is None:
+            database_name = self.__database_name if self.__in_memory else f'{self.__database_name}_snapshot'
+        database_name = database_name if len(database_name.split('.')) == 1 else database_name.split('.')[0]
+        if database_name == self.__database_name and not self.__in_memory:
+            raise ValueError("The snapshot of a Database can not overwrite the Database file.")
+        if not exists(self.__database_dir) and self.__database_dir != '':
+            mkdir(self.__database_dir)
+
+        # The copy is written in a temporary file first so that the snapshot file is always complete
+        snapshot_path = join(self.__database_dir, f'{database_name}.db')
+        source = connect(self.__memory_uri(), uri=True) if self.__in_memory else \
+            connect(join(self.__database_dir, f'{self.__database_name}.db'))
+        target = connect(f'{snapshot_path}.tmp')
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        replace(f'{snapshot_path}.tmp', snapshot_path)
+
+        # The arena contains at least the arrays referenced by the copy (arrays are only appended)
+        if (arena := Arena(self.__arena_path(), in_memory=self.__in_memory)).exists:
+            arena_path = join(self.__database_dir, f'{database_name}.arena')
+            arena.save(f'{arena_path}.tmp')
+            replace(f'{arena_path}.tmp', arena_path)
+        return snapshot_path
+
+    def enable_snapshots(self,
+                         period: float = 10.,
+                         database_name: Optional[str] = None):
+        """
+        Periodically save a snapshot of the Database in a background thread (see 'snapshot').
+
+        :param period: Delay in seconds between two snapshots.
+        :param database_name: Name of the snapshot file in the Database directory.
+        """
+
+        self.disable_snapshots()
+        self.__snapshotter = Snapshotter(snapshot=lambda: self.snapshot(database_name=database_name),
+                                         period=period)
+
+    def disable_snapshots(self):
+        """
+        Stop saving periodic snapshots of the Database.
+        """
+
+        if self.__snapshotter is not None:
+            snapshotter, self.__snapshotter = self.__snapshotter, None
+            snapshotter.close()
+
     def get_path(self):
         """
         Access the Database file path.
@@ -125,6 +347,49 @@ class Database:
 
         return self.__database_dir, self.__database_name
 
+    @staticmethod
+    def __check_profile(profile: str):
+
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown performance profile '{profile}'. Available profiles are "
+                             f"{list(PROFILES.keys())}.")
+
+    def set_profile(self,
+                    profile: str):
+        """
+        Switch the SQLite performance profile of the Database (for instance from 'bulk_load' while recording to
+        'read_replay' while reading).
+
+        :param profile: SQLite performance profile, either 'safe', 'throughput', 'bulk_load' or 'read_replay'.
+        """
+
+        self.__check_profile(profile)
+        if self.__step is not None:
+            raise ValueError("The performance profile cannot be changed while a step is in progress.")
+        self.flush()
+        for pragma, value in PROFILES[profile].items():
+            if pragma != 'page_size':
+                self.__database.pragma(pragma, value, permanent=True)
+        self.__profile = profile
+
+    def get_profile(self) -> Dict[str, Any]:
+        """
+        Get the SQLite performance profile in effect, with the values of its settings read from the Database.
+        """
+
+        report = {'profile': self.__profile}
+        for pragma in PROFILES['safe'].keys():
+            report[pragma] = self.__database.pragma(pragma)
+        return report
+
+    def get_schema_version(self) -> int:
+        """
+        Get the schema version of the Database file, which changes each time a Table or a Field is created, renamed or
+        removed (by this Database object or by another connection).
+        """
+
+        return self.__database.pragma('schema_version')
+
     def print_architecture(self):
         """
         Print the content of the Database with Table(s) and their Field(s).
@@ -182,7 +447,8 @@ class Database:
 
         :param table_name: Name of the Table to add to the Database.
         :param storing_table: Specify whether the Table must be a storing or an exchange Table.
-        :param fields: Name(s), type(s) and default value(s) of the Field(s) to add to the Table.
+        :param fields: Name(s), type(s) and default value(s) of the Field(s) to add to the Table. The type of an array
+                       Field can be an ArraySpec to define its storage options.
         """
 
         table_name = self.make_name(table_name)
@@ -198,7 +464,8 @@ class Database:
         Add new Fields to a Table.
 
         :param table_name: Name of the Table on which to add the new Fields.
-        :param fields: Name(s), type(s) and default value(s) of the Field(s) to add to the Table.
+        :param fields: Name(s), type(s) and default value(s) of the Field(s) to add to the Table. The type of an array
+                       Field can be an ArraySpec to define its storage options.
         """
 
         table_name = self.make_name(table_name)
@@ -206,6 +473,54 @@ class Database:
                       existing_table=True,
                       fields=fields)
 
+    def create_index(self,
+                     table_name: str,
+                     fields: Union[str, List[str]],
+                     unique: bool = False):
+        """
+        Create an index on Field(s) of a Table, to speed up the selection of lines with conditions on these Fields and
+        their ordering (see 'get_lines'). The index is stored in the Database file.
+
+        :param table_name: Name of the Table.
+        :param fields: Name(s) of the indexed Field(s).
+        :param unique: If True, the lines of the Table must have different values for these Fields.
+        """
+
+        # Check the Table and the Fields existence
+        table_name = self.make_name(table_name)
+        if table_name not in self.__tables:
+            raise ValueError(f"Unknown Table with name '{table_name}'")
+        table = self.__tables[table_name]
+        fields = [fields] if type(fields) == str else list(fields)
+        for field_name in fields:
+            if field_name not in table.fields():
+                raise ValueError(f"Unknown Field with name '{field_name}' for Table '{table_name}'")
+            if isinstance(table.fields(only_names=False)[field_name], NumpyField):
+                raise ValueError(f"The array Field '{field_name}' of Table '{table_name}' can not be indexed.")
+
+        # An index on the same Fields is only created once
+        self.flush()
+        for index_fields, index_unique in table.indexes():
+            if index_fields == fields:
+                if index_unique != unique:
+                    raise ValueError(f"An index on the Fields {fields} of Table '{table_name}' already exists with "
+                                     f"unique={index_unique}.")
+                return
+        table.add_index(fields, unique)
+
+    def get_indexes(self,
+                    table_name: str) -> List[Tuple[List[str], bool]]:
+        """
+        Get the indexes of a Table, as the names of the indexed Fields and the unique option of each index.
+
+        :param table_name: Name of the Table.
+        """
+
+        table_name = self.make_name(table_name)
+        if table_name not in self.__tables:
+            raise ValueError(f"Unknown Table with name '{table_name}'")
+        return self.__tables[table_name].indexes()
+
     def __create(self,
                  table_name: str,
                  existing_table: bool,
@@ -270,8 +585,30 @@ class Database:
                                              f"exists. Created Tables so far: {self.__tables.keys()}")
                         table.extend_fk(self.__tables[fk_table_name], field_name)
                         self.__fk[table_name][field_name] = fk_table_name
+                    # Array with storage options
+                    elif isinstance(field_type, ArraySpec):
+                        if (field_type.delta is not None or field_type.dedup or field_type.external is not None) \
+                                and issubclass(table, ExchangeTable):
+                            raise ValueError(f"The Field '{field_name}' of the ExchangeTable '{table_name}' cannot use "
+                                             f"delta encoding, deduplication or external storage, which are only "
+                                             f"available in StoringTables.")
+                        table.extend(field_name, ndarray, field_default, spec=field_type)
+                        if field_type.dedup:
+                            if self.__blobs is None:
+                                self.__blobs = BlobTable.connect(self.__database)
+                            table.fields(only_names=False)[field_name].store = self.__blobs
+                        if field_type.external is not None:
+                            if self.__arena is None:
+                                self.__arena = Arena(self.__arena_path(), in_memory=self.__in_memory)
+                                self.__arena.hold = self.__step is not None
+                            table.fields(only_names=False)[field_name].arena = self.__arena
+                        if self.__schema is None:
+                            self.__schema = SchemaTable.connect(self.__database)
+                        self.__schema.set_spec(table_name, field_name, field_type)
                     else:
                         table.extend(field_name, field_type, field_default)
+            self.__metadata.invalidate(table)
+            self.__plans, self.__joins = {}, {}
 
     def register_pre_save_signal(self,
                                  table_name: str,
@@ -331,7 +668,157 @@ class Database:
                 signal_class.connect(receiver=handler,
                                      sender=self.__tables[table_name],
                                      name=name)
+                self.__senders.add(table_name)
         self.__signals = []
+        self.__plans, self.__joins = {}, {}
+
+    def enable_write_behind(self,
+                            max_lines: int = 256,
+                            max_bytes: int = 2 ** 24,
+                            max_delay: float = 1.):
+        """
+        Buffer the lines added to StoringTables with 'add_data': lines are written by a background thread in a single
+        transaction when one of the thresholds is reached, when 'flush' is called, when the Database is closed or
+        before reading or updating the Database.
+
+        :param max_lines: Maximum number of buffered lines.
+        :param max_bytes: Maximum size of the buffered arrays in bytes.
+        :param max_delay: Maximum delay in seconds before writing a buffered line.
+        """
+
+        self.disable_write_behind()
+        self.__buffer = WriteBuffer(database=self.__database,
+                                    max_lines=max_lines,
+                                    max_bytes=max_bytes,
+                                    max_delay=max_delay)
+
+    def disable_write_behind(self):
+        """
+        Write the buffered lines and stop buffering the lines added to StoringTables.
+        """
+
+        if self.__buffer is not None:
+            self.__buffer.close()
+            self.__buffer = None
+
+    def flush(self):
+        """
+        Write the lines buffered by the write-behind mode.
+        """
+
+        if self.__buffer is not None:
+            self.__buffer.flush()
+
+    @property
+    def in_step(self) -> bool:
+        """
+        Check if a step (transaction) is in progress.
+        """
+
+        return self.__step is not None
+
+    def begin_step(self):
+        """
+        Begin a step: all the queries until the end of the step are committed at once (a single transaction).
+        """
+
+        if self.__step is not None:
+            raise ValueError("A step is already in progress, end it before beginning a new one.")
+        if self.__buffer is not None:
+            self.__buffer.flush()
+            self.__buffer.hold = True
+        self.__step = self.__database.atomic()
+        self.__step.__enter__()
+        # The arrays appended to the arena are synced before the commit, or removed if the step is cancelled
+        self.__step_arena = Arena(self.__arena_path(), in_memory=self.__in_memory).size if self.__arena is None else \
+            self.__arena.size
+        if self.__arena is not None:
+            self.__arena.hold = True
+        # The models of the Tables are restored if the step is cancelled
+        self.__step_schema = (dict(self.__tables), {table_name: dict(fk) for table_name, fk in self.__fk.items()},
+                              {table_name: table.fields() for table_name, table in self.__tables.items()},
+                              self.__schema, self.__blobs)
+
+    def end_step(self,
+                 rollback: bool = False):
+        """
+        End a step: commit all the queries of the step (the buffered lines of the write-behind mode included).
+
+        :param rollback: If True, the queries of the step are cancelled instead of committed.
+        """
+
+        if self.__step is None:
+            raise ValueError("No step is in progress, begin a step before ending it.")
+        if not rollback:
+            # The step is cancelled if its buffered lines cannot be written
+            try:
+                self.flush()
+            except Exception:
+                self.end_step(rollback=True)
+                raise
+        step, self.__step = self.__step, None
+        step_schema, self.__step_schema = self.__step_schema, None
+        try:
+            if rollback:
+                if self.__buffer is not None:
+                    self.__buffer.discard()
+                step.__exit__(ValueError, ValueError('Step cancelled.'), None)
+                if self.__arena is not None:
+                    self.__arena.truncate(self.__step_arena)
+                self.__restore_schema(*step_schema)
+                for table in self.__tables.values():
+                    if issubclass(table, StoringTable):
+                        table.reset_deltas()
+                self.__metadata.invalidate()
+            else:
+                if self.__arena is not None:
+                    self.__arena.sync()
+                step.__exit__(None, None, None)
+        finally:
+            if self.__buffer is not None:
+                self.__buffer.hold = False
+            if self.__arena is not None:
+                self.__arena.hold = False
+
+    def __restore_schema(self,
+                         tables: Dict[str, Type[AdaptiveTable]],
+                         fk: Dict[str, Dict[str, str]],
+                         fields: Dict[str, List[str]],
+                         schema: Optional[Type[SchemaTable]],
+                         blobs: Optional[Type[BlobTable]]):
+
+        # Remove the Fields created during the step from the models (with the backrefs of the ForeignKeys)
+        for table_name, table in self.__tables.items():
+            if table_name in tables:
+                table.discard_fields([field_name for field_name in table.fields() if field_name not in
+                                      fields[table_name]])
+            else:
+                table.discard_fields(list(self.__fk[table_name].keys()))
+        self.__tables, self.__fk, self.__schema, self.__blobs = tables, fk, schema, blobs
+        self.__plans, self.__joins = {}, {}
+
+    def __check_no_step(self):
+
+        if self.__step is not None:
+            raise ValueError("Tables and Fields cannot be renamed or removed while a step is in progress.")
+
+    @contextmanager
+    def transaction(self) -> Iterator['Database']:
+        """
+        Context manager of a step: all the queries in the context are committed at once, or cancelled if an error is
+        raised. If a step is already in progress, the queries are part of this step.
+        """
+
+        if self.__step is not None:
+            yield self
+            return
+        self.begin_step()
+        try:
+            yield self
+        except BaseException:
+            self.end_step(rollback=True)
+            raise
+        self.end_step()
 
     def add_data(self,
                  table_name: str,
@@ -373,6 +860,11 @@ class Database:
                    data: Union[Dict[str, Any], Dict[str, List[Any]]],
                    batched: Optional[bool] = False):
 
+        # A line with known Fields uses the compiled plan of the Table (the Fields were already checked)
+        if not batched and (plan := self.__plans.get((table_name, tuple(data.keys())))) is not None:
+            return self.__add_line(plan=plan,
+                                   fields_values=list(data.values()))
+
         # Unpack kwargs
         fields_names = list(data.keys())
         fields_values = list(data.values())
@@ -391,10 +883,10 @@ class Database:
         table = self.__tables[table_name]
 
         # Check fields existence
-        undefined_fields = set(fields_names) - set(table.fields())
+        undefined_fields = set(fields_names) - self.__metadata.fields(table)
         if len(undefined_fields) > 0:
             # Empty table: add fields on the fly
-            if len(table.select()) == 0:
+            if self.__metadata.nb_lines(table) == 0:
                 self.create_fields(table_name=table_name,
                                    fields=list(zip(fields_names, fields_types)))
             # Non-empty table
@@ -403,6 +895,15 @@ class Database:
                                  f" As table {table} is non-empty, please define first the following fields :"
                                  f" {list(undefined_fields)}.")
 
+        # Compile the plan of the Table for this set of Fields
+        if not batched:
+            plan = self.__plans[(table_name, tuple(fields_names))] = QueryPlan(table=table,
+                                                                               fields_names=tuple(fields_names),
+                                                                               fk=self.__fk[table_name],
+                                                                               signals=table_name in self.__senders)
+            return self.__add_line(plan=plan,
+                                   fields_values=fields_values)
+
         # Check FK data
         fk_fields = set(fields_names).intersection(set(self.__fk[table_name].keys()))
         for fk_field in fk_fields:
@@ -414,10 +915,47 @@ class Database:
                                        batched=batched)
                 fields_values[idx] = line
 
-        # Add the data to Table
-        return table.add_data(fields_names=fields_names,
-                              fields_values=fields_values,
-                              batched=batched)
+        # Add the data to Table (buffered lines are written first to keep the order of the lines)
+        if self.__buffer is not None:
+            self.__buffer.flush()
+            self.__buffer.forget(table_name)
+        lines_id = table.add_data(fields_names=fields_names,
+                                  fields_values=fields_values,
+                                  batched=batched)
+
+        # Update the metadata (ExchangeTables are emptied before adding data)
+        if issubclass(table, StoringTable):
+            self.__metadata.add_lines(table, lines_id)
+        else:
+            self.__metadata.invalidate(table)
+        return lines_id
+
+    def __add_line(self,
+                   plan: QueryPlan,
+                   fields_values: List[Any]) -> int:
+
+        # Check FK data
+        for idx, fk_table_name in plan.fk_positions.items():
+            if type(fields_values[idx]) == dict:
+                fields_values[idx] = self.__add_data(table_name=fk_table_name,
+                                                     data=fields_values[idx])
+
+        # Add the line to Table (buffered lines are written first to keep the order of the lines)
+        if self.__buffer is not None and issubclass(plan.table, StoringTable):
+            line_id = self.__buffer.add(plan=plan,
+                                        fields_values=fields_values)
+        else:
+            if self.__buffer is not None:
+                self.__buffer.flush()
+                self.__buffer.forget(plan.table.get_name())
+            line_id = plan.insert_line(fields_values=fields_values)
+
+        # Update the metadata (ExchangeTables are emptied before adding data)
+        if issubclass(plan.table, StoringTable):
+            self.__metadata.add_lines(plan.table, [line_id])
+        else:
+            self.__metadata.invalidate(plan.table)
+        return line_id
 
     def update(self,
                table_name: str,
@@ -434,6 +972,7 @@ class Database:
         """
 
         # Check table existence
+        self.flush()
         table_name = self.make_name(table_name)
         if table_name not in self.__tables:
             raise ValueError(f"Unknown table with name {table_name}")
@@ -448,17 +987,20 @@ class Database:
         if nb_line == 0:
             self.add_data(table_name=table_name, data=data)
             return
-        if line_id < 0:
-            line_id += nb_line + 1
-        elif line_id > nb_line:
-            line_id = nb_line
+        line_id = line_index(line_id, nb_line)
+
+        # Known Fields without FK use the compiled plan of the Table (the Fields were already checked)
+        if (plan := self.__plans.get((table_name, tuple(fields_names)))) is not None and len(plan.fk_positions) == 0:
+            plan.update_line(line_id=line_id,
+                             fields_values=fields_values)
+            return
 
         # Check fields existence
-        undefined_fields = set(fields_names) - set(table.fields())
+        undefined_fields = set(fields_names) - self.__metadata.fields(table)
         if create_fields:
             fields_to_create = [(undef, type(data[undef])) for undef in undefined_fields]
             self.create_fields(table_name=table_name, fields=fields_to_create)
-        undefined_fields = set(fields_names) - set(table.fields())
+        undefined_fields = set(fields_names) - self.__metadata.fields(table)
         if len(undefined_fields) > 0:
             raise ValueError(f"[{self.__class__.__name__}]  Some fields where not defined in table {table}."
                              f" As table {table} is non-empty, please define first the following fields :"
@@ -479,62 +1021,64 @@ class Database:
             del fields_names[idx]
             del fields_values[idx]
 
-        # Update query
-        table.update(dict(zip(fields_names, fields_values))).where(table.id == line_id).execute()
+        # Update query (compile the plan of the Table for this set of Fields)
+        if len(fk_fields) == 0:
+            plan = self.__plans[(table_name, tuple(fields_names))] = QueryPlan(table=table,
+                                                                               fields_names=tuple(fields_names),
+                                                                               fk=self.__fk[table_name],
+                                                                               signals=table_name in self.__senders)
+            plan.update_line(line_id=line_id,
+                             fields_values=fields_values)
+        else:
+            table.update_data(line_id=line_id,
+                              fields_names=fields_names,
+                              fields_values=fields_values)
 
     def get_line(self,
                  table_name: str,
                  fields: Optional[Union[str, List[str]]] = None,
-                 line_id: int = -1):
+                 line_id: int = -1,
+                 lazy: bool = False):
         """
         Get a line of a Table.
 
         :param table_name: Name of the Table on which to perform the query.
         :param fields: Name(s) of the Field(s) to request.
         :param line_id: Index of the line to get.
+        :param lazy: If True, arrays are decoded on first access only.
         """
 
         # Check the Table existence
+        self.flush()
         table_name = self.make_name(table_name)
         if table_name not in self.__tables:
             raise ValueError(f"Unknown table with name {table_name}")
-        table = self.__tables[table_name]
-
-        # Define the fields to select
-        fields_selection = ()
-        if fields is None:
-            fields = table.fields()
-        fields_selection += (table.id,)
-        fields = [fields] if type(fields) == str else fields
-        for field in fields:
-            if field in table.fields():
-                fields_selection += (table.fields(only_names=False)[field],)
 
         # Define the index of the line to select
         nb_line = self.nb_lines(table_name=table_name)
-        if line_id < 0:
-            line_id += nb_line + 1
-        elif line_id > nb_line:
-            line_id = nb_line
-
-        # Selection query
-        data = table.select(*fields_selection).where(table.id == line_id).dicts()[0]
-
-        # Join
-        for field in fields:
-            if field in self.__fk[table_name].keys():
-                data[field] = self.get_line(table_name=self.__fk[table_name][field],
-                                      fields=fields,
-                                      line_id=data[field])
+        line_id = line_index(line_id, nb_line)
 
-        return data
+        # Selection query (with the lines referenced by the ForeignKey Fields)
+        plan = self.__join_plan(table_name, fields, lazy)
+        lines = [plan.line(row) for row in plan.select(where='WHERE t0."id" = ?', params=[line_id])]
+        return self.__format_lines(plan=plan,
+                                   lines=lines,
+                                   batched=False,
+                                   lazy=lazy)[0]
 
     def get_lines(self,
                   table_name: str,
                   fields: Optional[Union[str, List[str]]] = None,
                   lines_id: Optional[List[int]] = None,
                   lines_range: Optional[List[int]] = None,
-                  batched: bool = False):
+                  batched: bool = False,
+                  lazy: bool = False,
+                  stacked: bool = False,
+                  dtype: Optional[DataType] = None,
+                  out: Optional[Dict[str, ndarray]] = None,
+                  where: Optional[Condition] = None,
+                  order_by: Optional[Union[str, List[str]]] = None,
+                  limit: Optional[int] = None):
         """
         Get a set of lines of a Table.
 
@@ -542,66 +1086,320 @@ class Database:
         :param fields: Name(s) of the Field(s) to select.
         :param lines_id: Indices of the lines to get. If not specified, 'lines_range' value will be used.
         :param lines_range: Range of indices of the lines to get. If not specified, all lines will be selected.
-        :param batched: If True, data is returned as one batch per field. Otherwise, data is returned as list of lines.
+        :param batched: If True, data is returned as one batch per field (a single stacked array for the array Fields
+                        with a fixed shape). Otherwise, data is returned as list of lines.
+        :param lazy: If True (and not batched), arrays are decoded on first access only.
+        :param stacked: If True, data is returned as one array of shape (nb_lines, ...) per field. Arrays are decoded
+                        directly in the stacked array, the arrays of a Field must be defined with the same shape.
+        :param dtype: Data type of the stacked arrays, either a single data type for the array Fields or a data type
+                      per Field name.
+        :param out: Preallocated arrays in which the fields are stacked, per Field name. The first dimension of these
+                    arrays must be at least the number of lines, the stacked arrays are views on their first lines.
+        :param where: Condition on the lines to select, either a Where condition or the values of Fields (a list of
+                      values is a set of accepted values).
+        :param order_by: Name(s) of the Field(s) to sort the lines (descending order with the '-' prefix). By default,
+                         lines are sorted by index.
+        :param limit: Maximum number of lines to select.
         """
 
         # Check table existence
+        self.flush()
         table_name = self.make_name(table_name)
         if table_name not in self.__tables:
             raise ValueError(f"Unknown table with name {table_name}")
-        table = self.__tables[table_name]
 
-        # Define the fields to select
-        fields_selection = ()
-        if fields is None:
-            fields = table.fields()
-        fields_selection += (table.id,)
-        fields = [fields] if type(fields) == str else fields
-        for field in fields:
-            if field in table.fields():
-                fields_selection += (table.fields(only_names=False)[field],)
-
-        # Define the indices of lines to select
-        if lines_id is None:
-            if lines_range is not None and len(lines_range) != 2:
-                raise ValueError("The range of lines must contains the first and the last line indices.")
-            nb_line = self.nb_lines(table_name=table_name)
-            first_line_id = lines_range[0] if lines_range is not None else 1
-            last_line_id = lines_range[1] if lines_range is not None else nb_line
-            _slice = [first_line_id, last_line_id]
-            for i, idx in enumerate(_slice):
-                if idx < 0:
-                    _slice[i] += nb_line + 1
-                elif idx > nb_line:
-                    _slice[i] = nb_line
-            _slice[1] = _slice[0] + 1 if _slice[1] < _slice[0] else _slice[1] + 1
-            lines_id = range(*_slice)
-
-        # Selection query
-        query = table.select(*fields_selection).where(table.id << lines_id).dicts()
-
-        # Return the lines as batch or as list of lines
+        # Define the lines to select
+        clause, params = self.__selection(table_name, lines_id, lines_range, where, order_by, limit)
+
+        # Selection query (with the lines referenced by the ForeignKey Fields), stacked arrays are decoded from the raw
+        # encoded values
+        plan = self.__join_plan(table_name, fields, lazy or stacked)
+        lines = [plan.line(row) for row in plan.select(where=clause, params=params)]
+        return self.__format_lines(plan=plan,
+                                   lines=lines,
+                                   batched=batched,
+                                   lazy=lazy or stacked,
+                                   stacked=stacked,
+                                   dtype=dtype,
+                                   out=out)
+
+    def iter_lines(self,
+                   table_name: str,
+                   fields: Optional[Union[str, List[str]]] = None,
+                   lines_range: Optional[List[int]] = None,
+                   chunk_size: int = 1024,
+                   batched: bool = False,
+                   lazy: bool = False,
+                   stacked: bool = False,
+                   dtype: Optional[DataType] = None,
+                   out: Optional[Dict[str, ndarray]] = None,
+                   where: Optional[Condition] = None,
+                   order_by: Optional[Union[str, List[str]]] = None,
+                   limit: Optional[int] = None) -> Iterator[Union[Dict[str, Any], List[Dict[str, Any]]]]:
+        """
+        Iterate over the lines of a Table by chunks. The lines are fetched chunk by chunk from a single selection query,
+        so that only one chunk of lines is held in memory.
+
+        :param table_name: Name of the Table on which to perform the query.
+        :param fields: Name(s) of the Field(s) to select.
+        :param lines_range: Range of indices of the lines to get. If not specified, all lines will be selected.
+        :param chunk_size: Number of lines of each chunk.
+        :param batched: If True, each chunk is returned as one batch per field (a single stacked array for the array
+                        Fields with a fixed shape). Otherwise, each chunk is returned as list of lines.
+        :param lazy: If True (and not batched), arrays are decoded on first access only.
+        :param stacked: If True, each chunk is returned as one array of shape (nb_lines, ...) per field (see
+                        'get_lines').
+        :param dtype: Data type of the stacked arrays, either a single data type for the array Fields or a data type
+                      per Field name.
+        :param out: Preallocated arrays in which the fields of each chunk are stacked, per Field name (the stacked
+                    arrays of a chunk are overwritten by the next chunk).
+        :param where: Condition on the lines to select (see 'get_lines').
+        :param order_by: Name(s) of the Field(s) to sort the lines (descending order with the '-' prefix).
+        :param limit: Maximum number of lines to select.
+        """
+
+        if chunk_size < 1:
+            raise ValueError(f"The size of the chunks must be positive, not {chunk_size}.")
+
+        # Check table existence
+        self.flush()
+        table_name = self.make_name(table_name)
+        if table_name not in self.__tables:
+            raise ValueError(f"Unknown table with name {table_name}")
+
+        # Define the lines to select
+        clause, params = self.__selection(table_name, None, lines_range, where, order_by, limit)
+        plan = self.__join_plan(table_name, fields, lazy or stacked)
+        return self.__iter_chunks(plan=plan,
+                                  cursor=plan.select(where=clause, params=params),
+                                  chunk_size=chunk_size,
+                                  format_options={'batched': batched, 'lazy': lazy or stacked, 'stacked': stacked,
+                                                  'dtype': dtype, 'out': out})
+
+    def aggregate(self,
+                  table_name: str,
+                  fields: Union[str, List[str]],
+                  functions: Optional[Union[str, List[str]]] = None,
+                  lines_range: Optional[List[int]] = None,
+                  where: Optional[Condition] = None,
+                  group_size: Optional[int] = None,
+                  chunk_size: int = 1024) -> Dict[str, Any]:
+        """
+        Compute reductions of Fields over the lines of a Table, without selecting the lines. The reductions of the
+        scalar Fields are computed by SQLite, the arrays are reduced per element chunk by chunk.
+        Return the reductions of each Field, with the ranges of indices of the groups if the lines are grouped.
+
+        :param table_name: Name of the Table on which to perform the query.
+        :param fields: Name(s) of the Field(s) to reduce.
+        :param functions: Name(s) of the reduction(s) to compute among 'count' (number of defined values), 'sum',
+                          'mean', 'min' and 'max'. If not specified, all the reductions are computed.
+        :param lines_range: Range of indices of the lines to reduce. If not specified, all lines will be reduced.
+        :param where: Condition on the lines to reduce (see 'get_lines').
+        :param group_size: Number of line indices of each group, lines are grouped by ranges of indices. If not
+                           specified, all the lines are reduced together.
+        :param chunk_size: Number of lines of each chunk of arrays.
+        """
+
+        # Check table and Fields existence
+        self.flush()
+        table_name = self.make_name(table_name)
+        if table_name not in self.__tables:
+            raise ValueError(f"Unknown table with name {table_name}")
+        table = self.__tables[table_name]
+        fields = [fields] if type(fields) == str else list(fields)
+        functions = FUNCTIONS if functions is None else [functions] if type(functions) == str else list(functions)
+        for function in functions:
+            if function not in FUNCTIONS:
+                raise ValueError(f"Unknown reduction '{function}', available reductions are {FUNCTIONS}.")
+        if group_size is not None and group_size < 1:
+            raise ValueError(f"The size of the groups must be positive, not {group_size}.")
+        scalar_fields, array_fields = [], []
+        for field_name in fields:
+            if field_name not in (table_fields := table.fields(only_names=False)):
+                raise ValueError(f"Unknown Field with name '{field_name}' for Table '{table_name}'")
+            field = table_fields[field_name]
+            if isinstance(field, NumpyField):
+                array_fields.append(field_name)
+            elif field.field_type not in NUMERIC_TYPES and len({'sum', 'mean'} & set(functions)) > 0:
+                raise ValueError(f"The Field '{field_name}' of Table '{table_name}' is not numeric, only the 'count', "
+                                 f"'min' and 'max' reductions are available.")
+            else:
+                scalar_fields.append(field)
+
+        # Reductions of the scalar Fields (and number of lines) of each group
+        clause, params = self.__conditions(table_name, None, lines_range, where)
+        group = '0' if group_size is None else f'(t0."id" - 1) / {int(group_size)}'
+        reductions = [f'{AGGREGATES[function]}(t0."{field.column_name}")' for field in scalar_fields
+                      for function in functions]
+        rows = table.database().execute_sql(f'SELECT {group} AS "_group", {", ".join(["COUNT(*)"] + reductions)} '
+                                            f'FROM "{table._meta.table_name}" AS t0 {clause}'
+                                            f'{"" if group_size is None else "GROUP BY _group ORDER BY _group"}',
+                                            params).fetchall()
+
+        # Reductions of the array Fields, the stacked arrays of the lines where they are defined are reduced chunk by
+        # chunk
+        reducers = {field_name: ArrayReducer(functions, group_size) for field_name in array_fields}
+        if len(array_fields) > 0 and sum([row[1] for row in rows]) > 0:
+            where = Where.from_dict(where) if isinstance(where, dict) else where
+            for field_name, reducer in reducers.items():
+                defined = Where(field_name).is_null(False)
+                for chunk in self.iter_lines(table_name=table_name,
+                                             fields=field_name,
+                                             lines_range=lines_range,
+                                             chunk_size=chunk_size,
+                                             stacked=True,
+                                             where=defined if where is None else where & defined):
+                    reducer.add(chunk['id'], chunk[field_name])
+
+        # Format the reductions of each Field (min and max values are converted as the Field values)
+        results = [{} for _ in rows]
+        for result, row in zip(results, rows):
+            values = iter(row[2:])
+            for field in scalar_fields:
+                result[field.name] = {function: field.python_value(value) if function in ('min', 'max') and
+                                      value is not None else value for function, value in zip(functions, values)}
+            for field_name, reducer in reducers.items():
+                result[field_name] = reducer.result(row[0])
+        if group_size is None:
+            return {field_name: results[0][field_name] for field_name in fields}
+
+        # Reductions of the groups are batched, arrays are stacked (unless a group has no defined array)
+        aggregation: Dict[str, Any] = {'lines_range': [[row[0] * group_size + 1, (row[0] + 1) * group_size]
+                                                       for row in rows]}
+        for field_name in fields:
+            aggregation[field_name] = {}
+            for function in functions:
+                values = [result[field_name][function] for result in results]
+                aggregation[field_name][function] = array(values) if field_name in reducers and function != 'count' \
+                    and len(values) > 0 and all([value is not None for value in values]) else values
+        return aggregation
+
+    def __iter_chunks(self,
+                      plan: JoinPlan,
+                      cursor: Iterator[Tuple[Any, ...]],
+                      chunk_size: int,
+                      format_options: Dict[str, Any]) -> Iterator[Union[Dict[str, Any], List[Dict[str, Any]]]]:
+
+        # The rows of the cursor are fetched by SQLite as they are consumed
+        while len(chunk := list(islice(cursor, chunk_size))) > 0:
+            yield self.__format_lines(plan=plan,
+                                      lines=[plan.line(row) for row in chunk],
+                                      **format_options)
+
+    def __selection(self,
+                    table_name: str,
+                    lines_id: Optional[List[int]],
+                    lines_range: Optional[List[int]],
+                    where: Optional[Condition],
+                    order_by: Optional[Union[str, List[str]]],
+                    limit: Optional[int]) -> Tuple[str, List[Any]]:
+
+        # Ordering and number of lines
+        clause, params = self.__conditions(table_name, lines_id, lines_range, where)
+        clause += f'ORDER BY {order_clause(self.__tables[table_name], "t0", [] if order_by is None else order_by)}'
+        if limit is not None:
+            if limit < 0:
+                raise ValueError(f"The maximum number of lines must be positive, not {limit}.")
+            clause += ' LIMIT ?'
+            params.append(limit)
+        return clause, params
+
+    def __conditions(self,
+                     table_name: str,
+                     lines_id: Optional[List[int]],
+                     lines_range: Optional[List[int]],
+                     where: Optional[Condition]) -> Tuple[str, List[Any]]:
+
+        # Indices of the lines (all the lines by default)
+        conditions, params = [], []
+        if lines_id is not None:
+            lines_id = lines_id.tolist() if isinstance(lines_id, ndarray) else list(lines_id)
+            conditions.append(f't0."id" IN ({", ".join(["?"] * len(lines_id))})')
+            params += lines_id
+        elif lines_range is not None:
+            lines_range = get_lines_range(lines_range, self.nb_lines(table_name=table_name))
+            conditions.append('t0."id" BETWEEN ? AND ?')
+            params += [lines_range.start, lines_range.stop - 1]
+
+        # Conditions on the Fields
+        if where is not None:
+            condition, condition_params = (Where.from_dict(where) if isinstance(where, dict) else where).compile(
+                self.__tables[table_name], 't0')
+            conditions.append(condition)
+            params += condition_params
+        return (f'WHERE {" AND ".join(conditions)} ' if len(conditions) > 0 else ''), params
+
+    def __join_plan(self,
+                    table_name: str,
+                    fields: Optional[Union[str, List[str]]],
+                    lazy: bool) -> JoinPlan:
+
+        # Compile the selection query of the Table for this set of Fields
+        fields = self.__tables[table_name].fields() if fields is None else [fields] if type(fields) == str else fields
+        if (key := (table_name, tuple(fields), lazy)) not in self.__joins:
+            self.__joins[key] = JoinPlan(tables=self.__tables,
+                                         fk=self.__fk,
+                                         table_name=table_name,
+                                         fields_names=fields,
+                                         lazy=lazy)
+        return self.__joins[key]
+
+    def __format_lines(self,
+                       plan: JoinPlan,
+                       lines: List[Optional[Dict[str, Any]]],
+                       batched: bool,
+                       lazy: bool,
+                       stacked: bool = False,
+                       dtype: Optional[DataType] = None,
+                       out: Optional[Dict[str, ndarray]] = None) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+
+        # Lines are undefined when a ForeignKey Field does not reference any line
+        table = plan.table
+        query = [self.__lazy_line(table, line) if lazy and not stacked and line is not None else line
+                 for line in lines]
+        table.resolve([line for line in query if line is not None])
+
+        # The referenced lines are formatted with the same options
+        joins = {field_name: self.__format_lines(plan=join,
+                                                 lines=[None if line is None else line[field_name] for line in query],
+                                                 batched=batched,
+                                                 lazy=lazy,
+                                                 stacked=stacked,
+                                                 dtype=dtype) for field_name, join in plan.joins.items()}
+
+        # Return the lines as batch, as stacked arrays or as list of lines
         lines: Union[Dict[str, List[Any]], List[Dict[str, Any]]]
-        if batched:
-            lines = dict(zip(query[0].keys(),
-                             [[query[i][key] for i in range(len(query))] for key in query[0].keys()]))
-        else:
-            lines = [line for line in query]
-
-        # Join
-        for field in fields:
-            if field in self.__fk[table_name].keys():
-                data = self.get_lines(table_name=self.__fk[table_name][field],
-                                      fields=fields,
-                                      lines_id=lines[field] if batched else [line[field] for line in lines],
-                                      batched=batched)
-                if batched:
-                    lines[field] = data
+        if batched or stacked:
+            lines = {}
+            for field, raw in zip(plan.fields, plan.raw):
+                values = [None if line is None else line[field.name] for line in query]
+                if field.name in joins:
+                    lines[field.name] = joins[field.name]
+                # The raw encoded arrays are decoded one by one in the stacked arrays (without an intermediate copy)
+                elif stacked:
+                    lines[field.name] = stack_values(field.name, values, dtype, out,
+                                                     partial(field.python_value, copy=False) if raw else None)
+                # Arrays of Fields with a fixed shape are stacked
+                elif getattr(field, 'spec', None) is not None:
+                    lines[field.name] = field.spec.stack(values)
                 else:
-                    for i, l in enumerate(data):
-                        lines[i][field] = l
+                    lines[field.name] = values
+        else:
+            lines = query
+            for field_name, joined_lines in joins.items():
+                for line, joined_line in zip(lines, joined_lines):
+                    if line is not None:
+                        line[field_name] = joined_line
         return lines
 
+    @staticmethod
+    def __lazy_line(table: Type[AdaptiveTable],
+                    line: Dict[str, Any]) -> LazyLine:
+
+        fields = table.fields(only_names=False)
+        return LazyLine({key: LazyArray(fields[key], value) if isinstance(fields.get(key), NumpyField) and
+                         not fields[key].is_delta and value is not None else value for key, value in line.items()})
+
     def nb_lines(self,
                  table_name: str):
         """
@@ -611,31 +1409,62 @@ class Database:
         """
 
         # Check the Table existence
+        self.flush()
         table_name = self.make_name(table_name)
         if table_name not in self.__tables:
             raise ValueError(f"Unknown table with name {table_name}")
 
         # Get the number of entries
-        return self.__tables[table_name].select().count()
+        return self.__metadata.nb_lines(self.__tables[table_name])
+
+    def invalidate_cache(self,
+                         table_name: Optional[str] = None):
+        """
+        Invalidate the cached metadata of a Table (number of lines, last index and Fields), to call when the Table was
+        modified without this Database object. Modifications committed by other connections are detected anyway.
+
+        :param table_name: Name of the Table. If not specified, the metadata of all the Tables is invalidated.
+        """
+
+        self.__metadata.invalidate(None if table_name is None else self.__tables[self.make_name(table_name)])
 
     @property
     def memory_size(self):
         """
-        Return the Database file memory size in bytes.
+        Return the Database file memory size in bytes (including the arena file of the externally stored arrays).
         """
 
-        return getsize(join(self.__database_dir, f'{self.__database_name}.db'))
+        self.flush()
+        if self.__in_memory:
+            return self.__database.pragma('page_count') * self.__database.pragma('page_size') + \
+                Arena(self.__arena_path(), in_memory=True).size
+        return getsize(join(self.__database_dir, f'{self.__database_name}.db')) + Arena(self.__arena_path()).size
 
     def close(self, erase_file: bool = False):
         """
         Close the Database.
 
-        :param erase_file: If True, the Database file will be erased.
+        :param erase_file: If True, the Database file (and its arena file) will be erased.
         """
 
+        if self.__step is not None:
+            self.end_step()
+        self.disable_write_behind()
+        self.disable_snapshots()
         self.__database.close()
-        if erase_file and exists(database_path := join(self.__database_dir, f'{self.__database_name}.db')):
+        # The in-memory Database is freed with its anchor connection
+        if self.__anchor is not None:
+            self.__anchor.close()
+            self.__anchor = None
+            Arena(self.__arena_path(), in_memory=True).close(erase_file=True)
+        database_path = join(self.__database_dir, f'{self.__database_name}.db')
+        if erase_file and not self.__in_memory and exists(database_path):
             remove(database_path)
+            for journal_path in [f'{database_path}-wal', f'{database_path}-shm']:
+                if exists(journal_path):
+                    remove(journal_path)
+        if self.__arena is not None:
+            self.__arena.close(erase_file=erase_file)
 
     def rename_table(self,
                      table_name: str,
@@ -647,14 +1476,26 @@ class Database:
         :param new_table_name: New name of the Table.
         """
 
+        self.__check_no_step()
+
         # Check the Table existence
         table_name = self.make_name(table_name)
         if table_name not in self.__tables:
             raise ValueError(f"Unknown table with name {table_name}")
 
         # Renaming
+        self.flush()
+        if self.__buffer is not None:
+            self.__buffer.forget(table_name)
+        self.__metadata.invalidate(self.__tables[table_name])
+        self.__plans, self.__joins = {}, {}
         self.__tables[new_table_name] = self.__tables.pop(table_name)
         self.__tables[new_table_name].rename_table(table_name, new_table_name)
+        if table_name in self.__senders:
+            self.__senders.remove(table_name)
+            self.__senders.add(new_table_name)
+        if self.__schema is not None:
+            self.__schema.rename(table_name=table_name, new_table_name=new_table_name)
 
     def rename_field(self,
                      table_name: str,
@@ -668,6 +1509,8 @@ class Database:
         :param new_field_name: New name of the Field.
         """
 
+        self.__check_no_step()
+
         # Check the Table existence
         table_name = self.make_name(table_name)
         if table_name not in self.__tables:
@@ -678,7 +1521,12 @@ class Database:
             raise ValueError(f"Unknown Field with name '{field_name}' for Table '{table_name}'")
 
         # Renaming
+        self.flush()
+        self.__metadata.invalidate(self.__tables[table_name])
+        self.__plans, self.__joins = {}, {}
         self.__tables[table_name].rename_field(field_name, new_field_name)
+        if self.__schema is not None:
+            self.__schema.rename(table_name=table_name, field_name=field_name, new_field_name=new_field_name)
 
     def remove_table(self,
                      table_name: str):
@@ -688,14 +1536,25 @@ class Database:
         :param table_name: Name of the Table.
         """
 
+        self.__check_no_step()
+
         # Check the table existence
         table_name = self.make_name(table_name)
         if table_name not in self.__tables:
             raise ValueError(f"Unknown Table with name '{table_name}'")
 
         # Remove the Table
+        self.flush()
+        if self.__buffer is not None:
+            self.__buffer.forget(table_name)
+        self.__metadata.invalidate(self.__tables[table_name])
+        self.__plans, self.__joins = {}, {}
+        self.__tables[table_name].release(self.__tables[table_name].dedup_fields())
         self.__database.drop_tables(self.__tables[table_name])
         del self.__tables[table_name]
+        self.__senders.discard(table_name)
+        if self.__schema is not None:
+            self.__schema.remove(table_name=table_name)
 
     def remove_field(self,
                      table_name: str,
@@ -707,6 +1566,8 @@ class Database:
         :param field_name: Current name of the Field to remove.
         """
 
+        self.__check_no_step()
+
         # Check the Table existence
         table_name = self.make_name(table_name)
         if table_name not in self.__tables:
@@ -716,8 +1577,15 @@ class Database:
         if field_name not in self.__tables[table_name].fields():
             raise ValueError(f"Unknown Field with name '{field_name}' for Table '{table_name}'")
 
-        # Renaming
+        # Removing
+        self.flush()
+        self.__metadata.invalidate(self.__tables[table_name])
+        self.__plans, self.__joins = {}, {}
+        self.__tables[table_name].release([field for field in self.__tables[table_name].dedup_fields()
+                                           if field.name == field_name])
         self.__tables[table_name].remove_field(field_name)
+        if self.__schema is not None:
+            self.__schema.remove(table_name=table_name, field_name=field_name)
 
     def export(self,
                exporter: str,
@@ -746,12 +1614,15 @@ class Database:
 
         # Export each table
         # Todo: see 'at once' version
+        self.flush()
         for table in tables:
             _filename = filename + f'_{table}.{extension}'
             if exporter == 'json':
-                query = self.get_lines(table_name=table,
-                                       batched=True)
+                self.__exporters[exporter][0].export(filename=_filename,
+                                                     query=self.get_lines(table_name=table,
+                                                                          batched=True))
             else:
-                query = self.__tables[table].select().tuples()
-            self.__exporters[exporter][0].export(filename=_filename,
-                                                 query=query)
+                # The lines are decoded (arrays stored as deltas, deduplicated or external) and written by chunks
+                self.__exporters[exporter][0].export(filename=_filename,
+                                                     query=self.iter_lines(table_name=table),
+                                                     fields=self.get_fields(table))
@@ -0,0 +1,273 @@
+from typing import List, Dict, Tuple, Optional, Any, Iterator
+from contextlib import contextmanager
+from os.path import join
+from multiprocessing.connection import Client, Connection
+
+from SSD.Core.Storage.Database import Database
+from SSD.Core.Storage.DatabaseServer import QUERIES, read_authkey
+from SSD.Core.Storage.PendingIndex import PendingIndex
+
+
+class DatabaseClient:
+
+    def __init__(self,
+                 database_dir: str = '',
+                 database_name: str = 'database',
+                 address: Optional[str] = None,
+                 authkey: Optional[bytes] = None,
+                 batch_size: int = 64,
+                 max_in_flight: int = 8):
+        """
+        Proxy of a Database served by a DatabaseServer, with the same interface as a Database (the methods of the
+        Database that modify its structure or its files are not available).
+        Writes ('add_data', 'add_batch', 'update') are pipelined: they are sent by batches without waiting for the
+        previous batches to be acknowledged, and they return a PendingIndex. The writes of a step are sent as a single
+        batch at the end of the step. The other methods wait for the pending writes to be acknowledged.
+
+        :param database_dir: Directory which contains the Database file.
+        :param database_name: Name of the Database file.
+        :param address: Path of the Unix socket (or name of the Windows pipe) of the server. Default is the Database
+                        path with the '.sock' extension.
+        :param authkey: Authentication key of the server. Default is the key written by the server in the key file
+                        (socket path with the '.key' extension).
+        :param max_in_flight: Maximum number of batches sent and not acknowledged yet.
+        :param batch_size: Number of writes sent in a single batch.
+        """
+
+        if batch_size < 1 or max_in_flight < 1:
+            raise ValueError(f"The batch size and the number of batches in flight must be positive, not "
+                             f"(batch_size={batch_size}, max_in_flight={max_in_flight}).")
+
+        database_name = database_name if len(database_name.split('.')) == 1 else database_name.split('.')[0]
+        self.address: str = join(database_dir, database_name) + '.sock' if address is None else address
+        self.batch_size: int = batch_size
+        self.max_in_flight: int = max_in_flight
+
+        self.__connection: Connection = Client(self.address,
+                                               authkey=read_authkey(self.address) if authkey is None else authkey)
+        self.__seq: int = 0
+        self.__batch: List[Tuple[str, Dict[str, Any]]] = []
+        self.__in_flight: List[int] = []
+        self.__in_step: bool = False
+
+        # Indices of the lines of the current batch and of the batches in flight
+        self.__pending: List[PendingIndex] = []
+        self.__sent: Dict[int, List[PendingIndex]] = {}
+
+    make_name = staticmethod(Database.make_name)
+
+    def add_data(self,
+                 table_name: str,
+                 data: Dict[str, Any]) -> PendingIndex:
+        """
+        Add a line insert query to the current batch. Return the index of the new line (known when the write is
+        acknowledged).
+
+        :param table_name: Name of the Table.
+        :param data: New line of the Table.
+        """
+
+        return self.__write('add_data', table_name=table_name, data=data)
+
+    def add_batch(self,
+                  table_name: str,
+                  batch: Dict[str, List[Any]]) -> PendingIndex:
+        """
+        Add a batch insert query to the current batch. Return the indices of the new lines (known when the write is
+        acknowledged).
+
+        :param table_name: Name of the Table.
+        :param batch: New lines of the Table.
+        """
+
+        return self.__write('add_batch', table_name=table_name, batch=batch)
+
+    def update(self,
+               table_name: str,
+               data: Dict[str, Any],
+               line_id: int = -1,
+               create_fields: bool = False) -> PendingIndex:
+        """
+        Add a line update query to the current batch. Return a PendingIndex whose 'result' method waits for the
+        acknowledgment of the update (and raises its error if the update failed).
+
+        :param table_name: Name of the Table on which to perform the query.
+        :param data: Updated data of the line.
+        :param line_id: Index of the line to update.
+        :param create_fields: Create missing fields.
+        """
+
+        return self.__write('update', table_name=table_name, data=data, line_id=line_id,
+                            create_fields=create_fields)
+
+    def flush(self):
+        """
+        Send the current batch and wait for all the batches to be acknowledged. The writes of a step in progress are
+        only sent at the end of the step.
+        """
+
+        if not self.__in_step:
+            self.__send_batch()
+        while len(self.__in_flight) > 0:
+            self.__receive()
+
+    @property
+    def in_step(self) -> bool:
+        """
+        Check if a step (transaction) is in progress.
+        """
+
+        return self.__in_step
+
+    def begin_step(self):
+        """
+        Begin a step: all the writes until the end of the step are kept by the client and sent as a single batch (a
+        single transaction). The queries of the step do not see its writes.
+        """
+
+        if self.__in_step:
+            raise ValueError("A step is already in progress, end it before beginning a new one.")
+        self.__send_batch()
+        self.__in_step = True
+
+    def end_step(self,
+                 rollback: bool = False):
+        """
+        End a step: send the writes of the step and wait for them to be committed.
+
+        :param rollback: If True, the writes of the step are cancelled instead of committed.
+        """
+
+        if not self.__in_step:
+            raise ValueError("No step is in progress.")
+        self.__in_step = False
+        if rollback:
+            for pending in self.__pending:
+                pending.error = 'The write was cancelled.'
+            self.__batch, self.__pending = [], []
+        self.flush()
+
+    @contextmanager
+    def transaction(self) -> Iterator['DatabaseClient']:
+        """
+        Context manager of a step: all the writes in the context are committed at once, or cancelled if an error is
+        raised. If a step is already in progress, the writes are part of this step.
+        """
+
+        if self.__in_step:
+            yield self
+            return
+        self.begin_step()
+        try:
+            yield self
+        except BaseException:
+            self.end_step(rollback=True)
+            raise
+        self.end_step()
+
+    def close(self):
+        """
+        Send the pending writes and disconnect from the server (the Database is closed by the server).
+        """
+
+        if self.__in_step:
+            self.end_step()
+        self.flush()
+        self.__connection.close()
+
+    def __getattr__(self,
+                    item: str):
+
+        # The other queries and properties of the Database are executed by the server
+        if item not in QUERIES:
+            raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{item}'")
+        if isinstance(getattr(Database, item), property):
+            return self.__call(item)
+        return lambda *args, **kwargs: self.__call(item, *args, **kwargs)
+
+    def __write(self,
+                method: str,
+                **kwargs) -> PendingIndex:
+
+        # The indices of the lines added by the current batch are replaced by the server
+        kwargs = PendingIndex.substitute(kwargs, lambda pending: pending if pending.seq is None and
+                                         pending.error is None else self.__resolve(pending))
+        self.__batch.append((method, kwargs))
+        self.__pending.append(pending := PendingIndex(index=len(self.__batch) - 1, resolve=self.__resolve))
+        if not self.__in_step and len(self.__batch) >= self.batch_size:
+            self.__send_batch()
+        return pending
+
+    def __resolve(self,
+                  pending: PendingIndex) -> Any:
+
+        # Send the batch of the write and wait for its acknowledgment
+        if pending.seq is None and pending.error is None:
+            if self.__in_step:
+                raise ValueError("The index of a line added during a step is only known at the end of the step.")
+            self.__send_batch()
+        while pending.seq in self.__in_flight:
+            self.__receive()
+        if pending.error is not None:
+            raise ValueError(f"The index of the line is not available: {pending.error}")
+        return pending.value
+
+    def __send_batch(self):
+
+        if len(self.__batch) > 0:
+            # Back-pressure: wait for the oldest batches to be acknowledged
+            while len(self.__in_flight) >= self.max_in_flight:
+                self.__receive()
+            self.__seq += 1
+            self.__connection.send(('batch', self.__seq, self.__batch))
+            self.__in_flight.append(self.__seq)
+            for pending in self.__pending:
+                pending.seq = self.__seq
+            self.__sent[self.__seq] = self.__pending
+            self.__batch, self.__pending = [], []
+
+    def __call(self,
+               method: str,
+               *args,
+               **kwargs) -> Any:
+
+        # The writes of a step in progress are not sent before the end of the step
+        if not self.__in_step:
+            self.__send_batch()
+        args, kwargs = PendingIndex.substitute((args, kwargs), self.__resolve)
+        self.__seq += 1
+        self.__connection.send(('call', self.__seq, method, (args, kwargs)))
+        self.__in_flight.append(call_seq := self.__seq)
+
+        # Receive the acknowledgments of the pending batches, then the result of the call
+        error: Optional[str] = None
+        while True:
+            kind, seq, value = self.__acknowledge(*self.__connection.recv())
+            if kind == 'error' and error is None:
+                error = value
+            if seq == call_seq:
+                break
+        if error is not None:
+            raise ValueError(f"The server could not execute the queries: {error}")
+        return value
+
+    def __receive(self):
+
+        # Replies are received in the order of the messages
+        kind, seq, value = self.__acknowledge(*self.__connection.recv())
+        if kind == 'error':
+            raise ValueError(f"The server could not execute the queries: {value}")
+
+    def __acknowledge(self,
+                      kind: str,
+                      seq: int,
+                      value: Any) -> Tuple[str, int, Any]:
+
+        # The indices of the lines added by a batch are known with its acknowledgment
+        self.__in_flight.remove(seq)
+        for pending in self.__sent.pop(seq, []):
+            if kind == 'ack':
+                pending.value = value[pending.index]
+            else:
+                pending.error = value
+        return kind, seq, value
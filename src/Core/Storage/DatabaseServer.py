@@ -0,0 +1,228 @@
+from typing import List, Dict, Tuple, Optional, Any
+from threading import Thread, Lock
+from queue import SimpleQueue, Empty
+from os import remove, urandom, open as os_open, O_WRONLY, O_CREAT, O_TRUNC, fdopen
+from os.path import exists, join
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client, Connection
+
+from SSD.Core.Storage.Database import Database
+from SSD.Core.Storage.PendingIndex import PendingIndex
+
+# Methods of the Database executed for the clients, the other ones are rejected
+WRITES = ('add_data', 'add_batch', 'update')
+QUERIES = ('get_line', 'get_lines', 'aggregate', 'nb_lines', 'get_tables', 'get_fields', 'get_architecture',
+           'get_path', 'get_profile', 'get_schema_version', 'get_indexes', 'create_table', 'create_fields',
+           'create_index', 'memory_size', 'in_memory')
+
+
+def read_authkey(address: str) -> bytes:
+    """
+    Read the authentication key of a DatabaseServer in its key file.
+
+    :param address: Path of the Unix socket (or name of the Windows pipe) of the server.
+    """
+
+    if not exists(address + '.key'):
+        raise ValueError(f"The key file of the DatabaseServer {address}.key does not exist, the authentication key "
+                         f"must be provided.")
+    with open(address + '.key', 'rb') as file:
+        return file.read()
+
+
+class DatabaseServer:
+
+    def __init__(self,
+                 database: Database,
+                 address: Optional[str] = None,
+                 authkey: Optional[bytes] = None,
+                 max_batch: int = 256):
+        """
+        Single writer of a Database file shared by several processes. Clients (DatabaseClient) send their batches of
+        writes and their queries through a local socket, the server executes them in a single thread and commits the
+        pending batches of all the clients in a single transaction.
+        Clients are authenticated with a random key, written in a key file only readable by the user (socket path with
+        the '.key' extension); only the writes and the queries of the Database are executed for them.
+
+        :param database: Database to serve (created or loaded), not to be used directly until the server is closed.
+        :param address: Path of the Unix socket (or name of the Windows pipe). Default is the Database path with the
+                        '.sock' extension.
+        :param authkey: Authentication key of the clients. Default is a random key.
+        :param max_batch: Maximum number of batches of writes committed in a single transaction.
+        """
+
+        self.database: Database = database
+        self.address: str = join(*database.get_path()) + '.sock' if address is None else address
+        self.max_batch: int = max_batch
+        self.__authkey: bytes = urandom(32) if authkey is None else authkey
+
+        # Messages of the clients, executed in order by the writer thread
+        self.__messages: SimpleQueue = SimpleQueue()
+        self.__listener: Optional[Listener] = None
+        self.__connections: List[Connection] = []
+        self.__lock = Lock()
+        self.__closed: bool = False
+        self.__threads: List[Thread] = []
+
+    def start(self) -> 'DatabaseServer':
+        """
+        Start accepting clients in background threads.
+        """
+
+        if exists(self.address):
+            remove(self.address)
+
+        # The key file is only readable by the user
+        with fdopen(os_open(self.address + '.key', O_WRONLY | O_CREAT | O_TRUNC, 0o600), 'wb') as file:
+            file.write(self.__authkey)
+        self.__listener = Listener(self.address, authkey=self.__authkey)
+        self.__threads = [Thread(target=self.__write_loop, daemon=True), Thread(target=self.__accept_loop, daemon=True)]
+        for thread in self.__threads:
+            thread.start()
+        return self
+
+    def serve_forever(self):
+        """
+        Accept clients until the server is closed (blocking).
+        """
+
+        if self.__listener is None:
+            self.start()
+        self.__threads[0].join()
+
+    def close(self,
+              erase_file: bool = False):
+        """
+        Execute the received messages, disconnect the clients and close the Database.
+
+        :param erase_file: If True, the Database file will be erased.
+        """
+
+        if self.__closed or self.__listener is None:
+            return
+        self.__closed = True
+        # Wake up the accepting thread with a last connection
+        Client(self.__listener.address, authkey=self.__authkey).close()
+        self.__threads[1].join()
+        self.__listener.close()
+        with self.__lock:
+            for connection in self.__connections:
+                connection.close()
+        self.__messages.put((None, ('close', None, 'close', ((), {'erase_file': erase_file}))))
+        self.__threads[0].join()
+        for file in (self.address, self.address + '.key'):
+            if exists(file):
+                remove(file)
+
+    def __accept_loop(self):
+
+        while not self.__closed:
+            # Connections are refused if the client is not authenticated
+            try:
+                connection = self.__listener.accept()
+            except (AuthenticationError, EOFError, OSError):
+                continue
+            if self.__closed:
+                connection.close()
+                break
+            with self.__lock:
+                self.__connections.append(connection)
+            Thread(target=self.__receive_loop, args=(connection,), daemon=True).start()
+
+    def __receive_loop(self,
+                       connection: Connection):
+
+        # Messages of a client are executed in the order of reception
+        while True:
+            try:
+                message = connection.recv()
+            except (EOFError, OSError):
+                break
+            self.__messages.put((connection, message))
+        with self.__lock:
+            if connection in self.__connections:
+                self.__connections.remove(connection)
+
+    def __write_loop(self):
+
+        closing: Optional[Dict[str, Any]] = None
+        while closing is None:
+
+            # Get the received messages, consecutive batches of writes are committed together
+            messages, message = [], self.__messages.get()
+            while True:
+                messages.append(message)
+                if message[1][0] != 'batch' or len(messages) == self.max_batch:
+                    break
+                try:
+                    message = self.__messages.get_nowait()
+                except Empty:
+                    break
+            batches = [message for message in messages if message[1][0] == 'batch']
+            if len(batches) > 0:
+                self.__commit(batches)
+
+            # Execute the query of a client
+            if (message := messages[-1])[1][0] == 'call':
+                connection, (_, seq, method, (args, kwargs)) = message
+                try:
+                    if method not in QUERIES:
+                        raise ValueError(f"The method '{method}' of the Database is not available for the clients.")
+                    attribute = getattr(self.database, method)
+                    result = attribute(*args, **kwargs) if callable(attribute) else attribute
+                except Exception as error:
+                    self.__send(connection, ('error', seq, f'{type(error).__name__}: {error}'))
+                else:
+                    self.__send(connection, ('result', seq, result))
+            elif message[1][0] == 'close':
+                closing = message[1][3][1]
+
+        # The connection of the writer thread is specific to this thread
+        self.database.close(**closing)
+
+    def __commit(self,
+                 batches: List[Tuple[Connection, Tuple[str, int, List[Tuple[str, Dict[str, Any]]]]]]):
+
+        # Commit the batches in a single transaction, replay them one by one if one of them failed
+        outcomes: List[Tuple[Any, Optional[Exception]]] = []
+        try:
+            with self.database.transaction():
+                for _, (_, _, writes) in batches:
+                    outcomes.append((self.__execute(writes), None))
+        except Exception:
+            outcomes = []
+            for _, (_, _, writes) in batches:
+                try:
+                    with self.database.transaction():
+                        outcomes.append((self.__execute(writes), None))
+                except Exception as error:
+                    outcomes.append((None, error))
+
+        # Acknowledge the batches
+        for (connection, (_, seq, _)), (result, error) in zip(batches, outcomes):
+            if error is None:
+                self.__send(connection, ('ack', seq, result))
+            else:
+                self.__send(connection, ('error', seq, f'{type(error).__name__}: {error}'))
+
+    def __execute(self,
+                  writes: List[Tuple[str, Dict[str, Any]]]) -> List[Any]:
+
+        # The indices of the lines added by the previous writes of the batch replace their PendingIndex
+        results = []
+        for method, kwargs in writes:
+            if method not in WRITES:
+                raise ValueError(f"The method '{method}' of the Database is not a write.")
+            kwargs = PendingIndex.substitute(kwargs, lambda pending: results[pending.index])
+            results.append(getattr(self.database, method)(**kwargs))
+        return results
+
+    @staticmethod
+    def __send(connection: Connection,
+               message: Tuple[str, int, Any]):
+
+        # The client might be disconnected
+        try:
+            connection.send(message)
+        except OSError:
+            pass
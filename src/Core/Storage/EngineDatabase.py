@@ -0,0 +1,367 @@
+from typing import Union, List, Dict, Optional, Any, Iterator, Type
+from contextlib import contextmanager
+from numpy import ndarray
+
+from SSD.Core.Storage.StorageEngine import StorageEngine
+from SSD.Core.Storage.ColumnarEngine import ColumnarEngine
+from SSD.Core.Storage.selection import DataType, line_index, lines_range as get_lines_range, stack_values
+
+# Storage engines other than SQLite
+ENGINES: Dict[str, Type[StorageEngine]] = {'columnar': ColumnarEngine}
+
+
+class EngineDatabase:
+
+    def __init__(self,
+                 database_dir: str = '',
+                 database_name: str = 'database',
+                 engine: str = 'columnar'):
+        """
+        Database stored by a StorageEngine other than SQLite. It provides the core methods of the Database with the same
+        interface: Tables and Fields creation, lines insertion, update and selection (with the 'get_line', 'get_lines'
+        and 'iter_lines' methods, without conditions and lazy arrays). The other methods of the Database are not
+        available. The lines are written without transactions, so steps are not available.
+
+        :param database_dir: Directory which contains the Database files.
+        :param database_name: Name of the Database.
+        :param engine: Name of the storage engine.
+        """
+
+        # Eventually remove extension from the database name
+        database_name = database_name if len(database_name.split('.')) == 1 else database_name.split('.')[0]
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown storage engine with name {engine}. Available engines are "
+                             f"{list(ENGINES.keys())} (use a Database for SQLite).")
+
+        self.__database_dir: str = database_dir
+        self.__database_name: str = database_name
+        self.__engine: StorageEngine = ENGINES[engine](database_dir=database_dir, database_name=database_name)
+
+    def __getattr__(self, item: str):
+
+        # The other methods of the Database are not available with the storage engines
+        if item.startswith('_'):
+            raise AttributeError(item)
+        raise AttributeError(f"The method '{item}' of the Database is not available with the "
+                             f"{self.__engine.__class__.__name__}.")
+
+    @staticmethod
+    def make_name(table_name: str):
+        """
+        Harmonize the Table names.
+
+        :param table_name: Name of the Table.
+        """
+
+        return table_name[0] + table_name[1:].lower() if len(table_name) > 1 else table_name
+
+    def new(self,
+            remove_existing: bool = False):
+        """
+        Create new Database files.
+
+        :param remove_existing: If True, existing Database files will be overwritten.
+        """
+
+        self.__engine.new(remove_existing=remove_existing)
+        return self
+
+    def load(self,
+             show_architecture: bool = False):
+        """
+        Load existing Database files.
+
+        :param show_architecture: If True, the loaded Tables will be printed.
+        """
+
+        self.__engine.load()
+        if show_architecture:
+            self.print_architecture()
+        return self
+
+    def get_path(self):
+        """
+        Access the Database files path.
+        """
+
+        return self.__database_dir, self.__database_name
+
+    def print_architecture(self):
+        """
+        Print the content of the Database with Table(s) and their Field(s).
+        """
+
+        print(f'\nDATABASE {self.__database_name} ({self.__engine.__class__.__name__})')
+        for table_name, fields in self.__engine.get_architecture().items():
+            print(f'  * {table_name}\n' + ''.join([f'    - {field}\n' for field in fields]))
+
+    def get_architecture(self):
+        """
+        Get the content of the Database with Table(s) and their Field(s).
+        """
+
+        return self.__engine.get_architecture()
+
+    def get_tables(self):
+        """
+        Get the names of created Tables in the Database.
+        """
+
+        return self.__engine.get_tables()
+
+    def get_fields(self,
+                   table_name: str):
+        """
+        Get the names of the Field(s) of a Tables of the Database.
+
+        :param table_name: Name of the Table.
+        """
+
+        return self.__engine.get_fields(self.make_name(table_name))
+
+    def create_table(self,
+                     table_name: str,
+                     storing_table: bool = True,
+                     fields: Optional[Union[tuple, List[tuple]]] = None):
+        """
+        Add a new Table to the Database with customizable Fields.
+
+        :param table_name: Name of the Table to add to the Database.
+        :param storing_table: Specify whether the Table must be a storing or an exchange Table.
+        :param fields: Name(s), type(s) and default value(s) of the Field(s) to add to the Table.
+        """
+
+        self.__engine.create_table(table_name=self.make_name(table_name),
+                                   storing_table=storing_table,
+                                   fields=[] if fields is None else [fields] if type(fields) != list else fields)
+
+    def create_fields(self,
+                      table_name: str,
+                      fields: Union[tuple, List[tuple]]):
+        """
+        Add new Fields to a Table.
+
+        :param table_name: Name of the Table on which to add the new Fields.
+        :param fields: Name(s), type(s) and default value(s) of the Field(s) to add to the Table.
+        """
+
+        self.__engine.create_fields(table_name=self.make_name(table_name),
+                                    fields=[fields] if type(fields) != list else fields)
+
+    @property
+    def in_step(self) -> bool:
+        """
+        Check if a step (transaction) is in progress.
+        """
+
+        return False
+
+    def begin_step(self):
+        """
+        Steps are not available with the storage engines.
+        """
+
+        raise ValueError(f"Steps are not available with the {self.__engine.__class__.__name__}, its queries cannot be "
+                         f"committed at once or cancelled.")
+
+    @contextmanager
+    def transaction(self) -> Iterator['EngineDatabase']:
+        """
+        Steps are not available with the storage engines.
+        """
+
+        self.begin_step()
+        yield self
+
+    def add_data(self,
+                 table_name: str,
+                 data: Dict[str, Any]):
+        """
+        Execute a line insert query. Return the index of the new line in the Table.
+
+        :param table_name: Name of the Table.
+        :param data: New line of the Table.
+        """
+
+        return self.__add_data(table_name=self.make_name(table_name),
+                               data=data,
+                               batched=False)
+
+    def add_batch(self,
+                  table_name: str,
+                  batch: Dict[str, List[Any]]):
+        """
+        Execute a batch insert query. Return the indices of the new lines in the Table.
+
+        :param table_name: Name of the Table.
+        :param batch: New lines of the Table.
+        """
+
+        return self.__add_data(table_name=self.make_name(table_name),
+                               data=batch,
+                               batched=True)
+
+    def __add_data(self,
+                   table_name: str,
+                   data: Union[Dict[str, Any], Dict[str, List[Any]]],
+                   batched: bool):
+
+        # Create the Table and the Fields on the fly
+        fields_types = [(name, type(value[0]) if batched else type(value)) for name, value in data.items()]
+        if table_name not in self.__engine.get_tables():
+            self.create_table(table_name=table_name, fields=fields_types)
+        elif len(undefined_fields := set(data.keys()) - set(self.__engine.get_fields(table_name))) > 0:
+            if self.__engine.nb_lines(table_name) > 0:
+                raise ValueError(f"[{self.__class__.__name__}]  Some fields where not defined in table {table_name}."
+                                 f" As table {table_name} is non-empty, please define first the following fields :"
+                                 f" {list(undefined_fields)}.")
+            self.create_fields(table_name=table_name,
+                               fields=[field for field in fields_types if field[0] in undefined_fields])
+        if batched:
+            return self.__engine.add_batch(table_name=table_name, batch=data)
+        return self.__engine.add_data(table_name=table_name, data=data)
+
+    def update(self,
+               table_name: str,
+               data: Dict[str, Any],
+               line_id: int = -1):
+        """
+        Update a line of a Table.
+
+        :param table_name: Name of the Table on which to perform the query.
+        :param data: Updated data of the line.
+        :param line_id: Index of the line to update.
+        """
+
+        table_name = self.make_name(table_name)
+        if (nb_line := self.__engine.nb_lines(table_name)) == 0:
+            self.add_data(table_name=table_name, data=data)
+        else:
+            self.__engine.update(table_name=table_name,
+                                 data=data,
+                                 line_id=line_index(line_id, nb_line))
+
+    def get_line(self,
+                 table_name: str,
+                 fields: Optional[Union[str, List[str]]] = None,
+                 line_id: int = -1):
+        """
+        Get a line of a Table.
+
+        :param table_name: Name of the Table on which to perform the query.
+        :param fields: Name(s) of the Field(s) to request.
+        :param line_id: Index of the line to get.
+        """
+
+        table_name = self.make_name(table_name)
+        fields = self.__engine.get_fields(table_name) if fields is None else fields
+        return self.__engine.get_lines(table_name=table_name,
+                                       fields=[fields] if type(fields) == str else fields,
+                                       lines_id=[line_index(line_id, self.__engine.nb_lines(table_name))],
+                                       batched=False)[0]
+
+    def get_lines(self,
+                  table_name: str,
+                  fields: Optional[Union[str, List[str]]] = None,
+                  lines_id: Optional[List[int]] = None,
+                  lines_range: Optional[List[int]] = None,
+                  batched: bool = False,
+                  stacked: bool = False,
+                  dtype: Optional[DataType] = None,
+                  out: Optional[Dict[str, ndarray]] = None):
+        """
+        Get a set of lines of a Table.
+
+        :param table_name: Name of the Table on which to perform the query.
+        :param fields: Name(s) of the Field(s) to select.
+        :param lines_id: Indices of the lines to get. If not specified, 'lines_range' value will be used.
+        :param lines_range: Range of indices of the lines to get. If not specified, all lines will be selected.
+        :param batched: If True, data is returned as one batch per field. Otherwise, data is returned as list of lines.
+        :param stacked: If True, data is returned as one array of shape (nb_lines, ...) per field.
+        :param dtype: Data type of the stacked arrays, either a single data type for the array Fields or a data type
+                      per Field name.
+        :param out: Preallocated arrays in which the fields are stacked, per Field name.
+        """
+
+        table_name = self.make_name(table_name)
+        fields = self.__engine.get_fields(table_name) if fields is None else fields
+        if lines_id is None:
+            lines_id = get_lines_range(lines_range, self.__engine.nb_lines(table_name))
+        lines = self.__engine.get_lines(table_name=table_name,
+                                        fields=[fields] if type(fields) == str else fields,
+                                        lines_id=sorted(lines_id),
+                                        batched=batched or stacked)
+        if stacked:
+            return {key: stack_values(key, values, dtype, out) for key, values in lines.items()}
+        return lines
+
+    def iter_lines(self,
+                   table_name: str,
+                   fields: Optional[Union[str, List[str]]] = None,
+                   lines_range: Optional[List[int]] = None,
+                   chunk_size: int = 1024,
+                   batched: bool = False,
+                   stacked: bool = False,
+                   dtype: Optional[DataType] = None,
+                   out: Optional[Dict[str, ndarray]] = None) -> Iterator[Union[Dict[str, Any], List[Dict[str, Any]]]]:
+        """
+        Iterate over the lines of a Table by chunks.
+
+        :param table_name: Name of the Table on which to perform the query.
+        :param fields: Name(s) of the Field(s) to select.
+        :param lines_range: Range of indices of the lines to get. If not specified, all lines will be selected.
+        :param chunk_size: Number of lines of each chunk.
+        :param batched: If True, each chunk is returned as one batch per field. Otherwise, each chunk is returned as
+                        list of lines.
+        :param stacked: If True, each chunk is returned as one array of shape (nb_lines, ...) per field.
+        :param dtype: Data type of the stacked arrays, either a single data type for the array Fields or a data type
+                      per Field name.
+        :param out: Preallocated arrays in which the fields of each chunk are stacked, per Field name.
+        """
+
+        if chunk_size < 1:
+            raise ValueError(f"The size of the chunks must be positive, not {chunk_size}.")
+        table_name = self.make_name(table_name)
+        lines_id = get_lines_range(lines_range, self.__engine.nb_lines(table_name))
+        return (self.get_lines(table_name=table_name,
+                               fields=fields,
+                               lines_id=list(lines_id[start:start + chunk_size]),
+                               batched=batched,
+                               stacked=stacked,
+                               dtype=dtype,
+                               out=out) for start in range(0, len(lines_id), chunk_size))
+
+    def nb_lines(self,
+                 table_name: str):
+        """
+        Return the number of entries on a Table.
+
+        :param table_name: Name of the Table.
+        """
+
+        return self.__engine.nb_lines(self.make_name(table_name))
+
+    def flush(self):
+        """
+        Write the pending lines in the Database files.
+        """
+
+        self.__engine.flush()
+
+    @property
+    def memory_size(self):
+        """
+        Return the Database files memory size in bytes.
+        """
+
+        return self.__engine.memory_size()
+
+    def close(self,
+              erase_file: bool = False):
+        """
+        Close the Database.
+
+        :param erase_file: If True, the Database files will be erased.
+        """
+
+        self.__engine.close(erase_file=erase_file)
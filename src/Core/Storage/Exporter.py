@@ -1,4 +1,4 @@
-from typing import Union, Dict, Any
+from typing import Union, Dict, List, Any, Iterator, Optional
 import json
 import csv
 from peewee import Query
@@ -39,16 +39,41 @@ class ExporterJson(Exporter):
 
 class ExporterCSV(Exporter):
 
+    @staticmethod
+    def default(o: Any):
+
+        # Lines referenced by ForeignKey Fields are written as their index
+        if isinstance(o, dict):
+            return o.get('id')
+
+        elif isinstance(o, ndarray):
+            return o.tolist()
+
+        return o
+
     @classmethod
     def export(cls,
                filename: str,
-               query: Union[Dict[str, Any], Query]):
+               query: Union[Dict[str, Any], Query, Iterator[List[Dict[str, Any]]]],
+               fields: Optional[List[str]] = None):
 
         with open(filename, 'w') as file:
             writer = csv.writer(file)
-            t = query.execute()
-            t.initialize()
-            if getattr(t, 'columns', None):
-                writer.writerow([column for column in t.columns])
-            for row in t:
-                writer.writerow(row)
+
+            # Raw rows of a selection query
+            if isinstance(query, Query):
+                t = query.execute()
+                t.initialize()
+                if getattr(t, 'columns', None):
+                    writer.writerow([column for column in t.columns])
+                for row in t:
+                    writer.writerow(row)
+
+            # Decoded lines, by chunks
+            else:
+                if fields is not None:
+                    writer.writerow(fields)
+                for lines in query:
+                    for line in lines:
+                        writer.writerow([cls.default(line.get(field)) for field in
+                                         (line.keys() if fields is None else fields)])
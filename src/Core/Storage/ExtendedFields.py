@@ -1,17 +1,607 @@
-from peewee import Field
-from numpy import ndarray
+from typing import Union, Optional, Dict, Any, Tuple, List
+from struct import Struct
+from collections import UserDict
 from pickle import loads
+import zlib
+import lzma
+import bz2
+from hashlib import blake2b
+from peewee import Field
+from numpy import ndarray, frombuffer, ascontiguousarray, array, asarray, empty, dtype as np_dtype, prod, uint8, \
+    uint16, uint32, int64, bitwise_xor, subtract, add, rint, isfinite, iinfo
+
+# Binary codec header: magic bytes, flags, length of the dtype string, number of dimensions
+MAGIC = b'\x93SSD'
+REFERENCE = b'\x93SSR'
+DIGEST_SIZE = 16
+EXTERNAL = b'\x93SSX'
+ADDRESS = Struct('<QQ')
+HEADER = Struct('<4sBBB')
+ALIGNMENT = 16
+
+# Header flags (bits 2-3 store the compression codec)
+F_ORDER = 1 << 0
+SHUFFLE = 1 << 1
+COMPRESSION_SHIFT = 2
+COMPRESSION_MASK = 0b11 << COMPRESSION_SHIFT
+DELTA_XOR = 1 << 4
+DELTA_SUB = 1 << 5
+DELTA_MASK = DELTA_XOR | DELTA_SUB
+CAST = 1 << 6
+FIXED = 1 << 7
+
+# Compression codecs: name -> (codec id, compress, decompress, default level, available levels)
+COMPRESSIONS = {'zlib': (1, lambda data, level: zlib.compress(data, level), zlib.decompress, 6, range(-1, 10)),
+                'lzma': (2, lambda data, level: lzma.compress(data, preset=level), lzma.decompress, 6, range(0, 10)),
+                'bz2': (3, lambda data, level: bz2.compress(data, level), bz2.decompress, 9, range(1, 10))}
+DECOMPRESSORS = {codec[0]: codec[2] for codec in COMPRESSIONS.values()}
+
+# Delta encodings, computed on the bits of the items: name -> (flag, encode, decode)
+DELTAS = {'xor': (DELTA_XOR, bitwise_xor, bitwise_xor),
+          'sub': (DELTA_SUB, subtract, add)}
+
+# Quantization: available reduced precisions, integer types of fixed-point arrays, step safety margin
+PRECISIONS = ['float16', 'float32']
+FIXED_TYPES = [uint8, uint16, uint32]
+FIXED_MARGIN = 0.999
+
+
+class ArraySpec:
+
+    def __init__(self,
+                 compression: Optional[str] = None,
+                 level: Optional[int] = None,
+                 shuffle: bool = False,
+                 delta: Optional[str] = None,
+                 keyframe_interval: int = 32,
+                 quantize: Optional[str] = None,
+                 max_error: Optional[float] = None,
+                 dedup: bool = False,
+                 external: Optional[int] = None,
+                 dtype: Optional[Any] = None,
+                 shape: Optional[Tuple[Optional[int], ...]] = None):
+        """
+        Storage options of an array Field, to use instead of the 'ndarray' type in a Field definition such as
+        ('positions', ArraySpec(compression='zlib')).
+
+        :param compression: Name of the compression codec (either 'zlib', 'lzma' or 'bz2').
+        :param level: Compression level (the default level of the codec is used if not specified).
+        :param shuffle: If True, bytes are shuffled before compression (groups the bytes of the same significance of
+                        each item, which compresses floating point arrays better).
+        :param delta: Name of the delta encoding (either 'xor' or 'sub'). Only available in StoringTables: each array
+                      is stored as the difference with the previous array of the Field, which compresses much better
+                      when consecutive arrays are close.
+        :param keyframe_interval: Number of consecutive arrays between two full arrays (keyframes) when using delta
+                                  encoding. This bounds the number of arrays to read to decode a given line.
+        :param quantize: Lossy storage of floating point arrays with a reduced precision (either 'float16' or
+                         'float32'). Arrays are converted back to their original type when read.
+        :param max_error: Lossy storage of floating point arrays as fixed-point integers, with this maximum absolute
+                          error. Arrays are converted back to their original type when read.
+        :param dedup: If True, identical arrays are stored once in the Database and lines only reference them (only
+                      available in StoringTables, not compatible with delta encoding).
+        :param external: Encoded arrays larger than this number of bytes are stored in an append-only sidecar file of
+                         the Database and read as memory mapped views (only available in StoringTables, not compatible
+                         with deduplication).
+        :param dtype: Data type of the arrays of the Field. Arrays are cast to this type when added to the Table.
+        :param shape: Shape of the arrays of the Field, one dimension might be variable (None). The shape of arrays is
+                      checked when added to the Table and batches of lines are returned as a single stacked array.
+        """
+
+        if compression is not None:
+            if compression not in COMPRESSIONS:
+                raise ValueError(f"Unknown compression codec '{compression}'. "
+                                 f"Available codecs are {list(COMPRESSIONS.keys())}.")
+            level = COMPRESSIONS[compression][3] if level is None else level
+            if level not in COMPRESSIONS[compression][4]:
+                raise ValueError(f"The compression level of '{compression}' must be in "
+                                 f"{list(COMPRESSIONS[compression][4])}, not {level}.")
+        elif level is not None:
+            raise ValueError("A compression level was given without compression codec.")
+        if delta is not None and delta not in DELTAS:
+            raise ValueError(f"Unknown delta encoding '{delta}'. Available encodings are {list(DELTAS.keys())}.")
+        if keyframe_interval < 1:
+            raise ValueError(f"The keyframe interval must be positive, not {keyframe_interval}.")
+        if quantize is not None and quantize not in PRECISIONS:
+            raise ValueError(f"Unknown quantization '{quantize}'. Available precisions are {PRECISIONS}.")
+        if max_error is not None:
+            if quantize is not None:
+                raise ValueError("Only one quantization can be used, either 'quantize' or 'max_error'.")
+            if max_error <= 0:
+                raise ValueError(f"The maximum quantization error must be positive, not {max_error}.")
+        if dedup and delta is not None:
+            raise ValueError("Deduplication cannot be used with delta encoding.")
+        if external is not None:
+            if dedup:
+                raise ValueError("Deduplication cannot be used with external storage.")
+            if external < 0:
+                raise ValueError(f"The external storage threshold must be positive, not {external}.")
+        if shape is not None:
+            shape = tuple(shape)
+            if [dim for dim in shape if dim is not None and (type(dim) != int or dim < 0)]:
+                raise ValueError(f"The dimensions of the shape must be positive integers or None, not {shape}.")
+            if shape.count(None) > 1:
+                raise ValueError(f"Only one dimension of the shape can be variable, not {shape.count(None)}.")
+
+        self.compression: Optional[str] = compression
+        self.level: Optional[int] = level
+        self.shuffle: bool = shuffle
+        self.delta: Optional[str] = delta
+        self.keyframe_interval: int = keyframe_interval
+        self.quantize: Optional[str] = quantize
+        self.max_error: Optional[float] = max_error
+        self.dedup: bool = dedup
+        self.external: Optional[int] = external
+        self.dtype: Optional[np_dtype] = None if dtype is None else np_dtype(dtype)
+        self.shape: Optional[Tuple[Optional[int], ...]] = shape
+
+    def options(self) -> Dict[str, Any]:
+        """
+        Get the options of the specification (as stored in the Database schema).
+        """
+
+        return {'compression': self.compression,
+                'level': self.level,
+                'shuffle': self.shuffle,
+                'delta': self.delta,
+                'keyframe_interval': self.keyframe_interval,
+                'quantize': self.quantize,
+                'max_error': self.max_error,
+                'dedup': self.dedup,
+                'external': self.external,
+                'dtype': None if self.dtype is None else self.dtype.str,
+                'shape': self.shape}
+
+    @classmethod
+    def from_options(cls,
+                     options: Dict[str, Any]) -> 'ArraySpec':
+        """
+        Create a specification from the options stored in the Database schema.
+
+        :param options: Options of the specification.
+        """
+
+        return cls(**options)
+
+    def __repr__(self):
+
+        options = []
+        if self.compression is not None:
+            options.append(f'{self.compression}-{self.level}')
+        if self.shuffle:
+            options.append('shuffle')
+        if self.delta is not None:
+            options.append(f'delta-{self.delta}/{self.keyframe_interval}')
+        if self.quantize is not None:
+            options.append(self.quantize)
+        if self.max_error is not None:
+            options.append(f'max_error-{self.max_error}')
+        if self.dedup:
+            options.append('dedup')
+        if self.external is not None:
+            options.append(f'external-{self.external}')
+        if self.dtype is not None:
+            options.append(f'dtype-{self.dtype}')
+        if self.shape is not None:
+            options.append(f'shape-{self.shape_descr}')
+        return f"[{', '.join(options)}]"
+
+    @property
+    def shape_descr(self) -> str:
+
+        dims = ['n' if dim is None else str(dim) for dim in self.shape]
+        return f"({', '.join(dims)}{',' if len(dims) == 1 else ''})"
+
+    def validate(self,
+                 value: Any) -> ndarray:
+        """
+        Cast an array to the data type of the specification and check its shape.
+
+        :param value: Array to add to a Table.
+        """
+
+        if self.dtype is None and self.shape is None:
+            return value
+        value = asarray(value, dtype=self.dtype)
+        if self.shape is not None:
+            if value.ndim != len(self.shape) or \
+                    [dim for dim, ref in zip(value.shape, self.shape) if ref is not None and dim != ref]:
+                raise ValueError(f"The shape of the array {value.shape} does not match the shape of the Field "
+                                 f"{self.shape_descr}.")
+        return value
+
+    def stack(self,
+              values: List[Optional[ndarray]]) -> Union[ndarray, List[Optional[ndarray]]]:
+        """
+        Stack the arrays of a batch of lines in a single array of shape (nb_lines, *shape). The list of arrays is
+        returned if the arrays cannot be stacked (undefined values or different variable dimensions).
+
+        :param values: Arrays of the batch of lines.
+        """
+
+        if self.shape is None or len(values) == 0 or any([value is None for value in values]) or \
+                any([value.shape != values[0].shape for value in values]):
+            return values
+        stacked = empty((len(values), *values[0].shape), dtype=values[0].dtype)
+        for i, value in enumerate(values):
+            stacked[i] = value
+        return stacked
+
+
+class DeltaArray:
+
+    def __init__(self,
+                 value: bytes):
+        """
+        Encoded array stored as a delta with the previous array of its Field.
+
+        :param value: Encoded array.
+        """
+
+        self.value: bytes = value
+
+    def resolve(self,
+                reference: ndarray) -> ndarray:
+        """
+        Decode the array from its reference.
+
+        :param reference: Previous array of the Field.
+        """
+
+        return decode_array(self.value, reference)
+
+
+class LazyArray:
+
+    def __init__(self,
+                 field: 'NumpyField',
+                 value: bytes):
+        """
+        Encoded array of a line, decoded on first access.
+
+        :param field: Field of the array.
+        :param value: Encoded array.
+        """
+
+        self.field: NumpyField = field
+        self.value: bytes = value
+
+    def decode(self) -> ndarray:
+
+        return self.field.python_value(self.value)
+
+    def __repr__(self):
+
+        return f'<lazy {self.field.name}>'
+
+
+class LazyLine(UserDict):
+    """
+    Line of a Table whose arrays are decoded on first access, then cached. Other Fields are available as in a dict.
+    """
+
+    def __getitem__(self, key: str):
+
+        value = self.data[key]
+        if isinstance(value, LazyArray):
+            value = self.data[key] = value.decode()
+        return value
+
+
+def is_plain(value: ndarray) -> bool:
+    """
+    Check if an array can be stored as a raw buffer.
+
+    :param value: Array to check.
+    """
+
+    return not value.dtype.hasobject and value.dtype.fields is None
+
+
+def raw_buffer(value: ndarray,
+               f_order: bool = False) -> ndarray:
+    """
+    Get the raw buffer of an array as bytes, in C or Fortran order.
+
+    :param value: Array to read.
+    :param f_order: If True, the buffer is in Fortran order.
+    """
+
+    value = ascontiguousarray(value.T if f_order else value)
+    return value.reshape(-1).view(uint8)
+
+
+def item_view(buffer: ndarray,
+              itemsize: int) -> ndarray:
+    """
+    View a raw buffer as unsigned integers with the size of the array items, to compute deltas on their bits.
+
+    :param buffer: Raw buffer.
+    :param itemsize: Size of the items of the array.
+    """
+
+    return buffer.view(f'<u{itemsize}') if itemsize in (1, 2, 4, 8) else buffer
+
+
+def quantize(value: ndarray,
+             spec: Optional[ArraySpec]) -> Tuple[ndarray, Optional[Tuple[float, float]]]:
+    """
+    Convert a floating point array to the reduced precision or to the fixed-point integers of a specification.
+    Return the converted array and the (offset, step) parameters of the fixed-point integers.
+
+    :param value: Array to convert.
+    :param spec: Storage options of the Field.
+    """
+
+    if spec is None or value.dtype.kind != 'f' or value.size == 0:
+        return value, None
+
+    # Reduced precision
+    if spec.quantize is not None:
+        return (value.astype(spec.quantize), None) if value.itemsize > np_dtype(spec.quantize).itemsize else \
+            (value, None)
+
+    # Fixed-point integers with the smallest type that holds the range of the array (not available with inf or nan)
+    if spec.max_error is not None:
+        low, high = value.min(), value.max()
+        if isfinite(low) and isfinite(high):
+            step = 2 * spec.max_error * FIXED_MARGIN
+            for fixed_type in FIXED_TYPES:
+                if rint((high - low) / step) <= iinfo(fixed_type).max:
+                    return rint((value - low) / step).astype(fixed_type), (float(low), step)
+    return value, None
+
+
+def requantize(value: ndarray,
+               quantized_type: np_dtype,
+               params: Optional[Tuple[float, float]]) -> ndarray:
+    """
+    Convert an array with the quantization of another array (used to compute deltas between quantized arrays).
+
+    :param value: Array to convert.
+    :param quantized_type: Type of the quantized array.
+    :param params: Fixed-point parameters of the quantized array.
+    """
+
+    if params is None:
+        return value.astype(quantized_type)
+    return rint((value - params[0]) / params[1]).astype(int64).astype(quantized_type)
+
+
+def dequantize(value: ndarray,
+               dtype: np_dtype,
+               params: Optional[Tuple[float, float]]) -> ndarray:
+    """
+    Convert a quantized array back to its original type.
+
+    :param value: Quantized array.
+    :param dtype: Original type of the array.
+    :param params: Fixed-point parameters of the quantized array.
+    """
+
+    if params is None:
+        return value.astype(dtype)
+    return (params[0] + value * params[1]).astype(dtype)
+
+
+def reconstruct(value: ndarray,
+                spec: Optional[ArraySpec]) -> ndarray:
+    """
+    Get a copy of an array as it will be decoded from the Database.
+
+    :param value: Array to encode.
+    :param spec: Storage options of the Field.
+    """
+
+    quantized, params = quantize(value, spec)
+    return array(value) if quantized is value else dequantize(quantized, value.dtype, params)
+
+
+def encode_array(value: ndarray,
+                 spec: Optional[ArraySpec] = None,
+                 reference: Optional[ndarray] = None) -> bytes:
+    """
+    Encode an array as a small dtype / shape / order header followed by the raw buffer of the array.
+    Arrays that do not have a plain memory layout (objects, structured dtypes) are pickled.
+
+    :param value: Array to encode.
+    :param spec: Storage options of the Field.
+    :param reference: Previous array of the Field, if the array must be stored as a delta (same dtype and shape).
+    """
+
+    if not is_plain(value):
+        return value.dumps()
+
+    # Raw buffer in C or Fortran order
+    flags = 0
+    if not value.flags.c_contiguous:
+        if value.flags.f_contiguous:
+            flags |= F_ORDER
+        else:
+            value = ascontiguousarray(value)
+
+    # Optional quantization
+    quantized, params = quantize(value, spec)
+    if quantized is not value:
+        flags |= CAST if params is None else CAST | FIXED
+    buffer = raw_buffer(quantized, f_order=flags & F_ORDER)
+
+    # Optional delta encoding, byte shuffling and compression
+    if spec is not None:
+        if reference is not None and (params is None or isfinite(reference).all()):
+            delta_flag, encode = DELTAS[spec.delta][:2]
+            reference = requantize(reference, quantized.dtype, params) if flags & CAST else reference
+            buffer = encode(item_view(buffer, quantized.itemsize),
+                            item_view(raw_buffer(reference, f_order=flags & F_ORDER), quantized.itemsize)).view(uint8)
+            flags |= delta_flag
+        if spec.shuffle and quantized.itemsize > 1:
+            buffer = buffer.reshape(-1, quantized.itemsize).T.reshape(-1)
+            flags |= SHUFFLE
+        if spec.compression is not None:
+            codec_id, compress = COMPRESSIONS[spec.compression][:2]
+            buffer = compress(buffer, spec.level)
+            flags |= codec_id << COMPRESSION_SHIFT
+
+    # Header padded so that the raw buffer is aligned
+    dtype = value.dtype.str.encode()
+    header = HEADER.pack(MAGIC, flags, len(dtype), value.ndim) + dtype + Struct(f'<{value.ndim}q').pack(*value.shape)
+    if flags & CAST:
+        header += bytes([len(quantized.dtype.str)]) + quantized.dtype.str.encode()
+    if flags & FIXED:
+        header += Struct('<dd').pack(*params)
+    header += b'\x00' * (-len(header) % ALIGNMENT)
+    return b''.join((header, buffer))
+
+
+def decode_array(value: Union[bytes, memoryview],
+                 reference: Optional[ndarray] = None,
+                 copy: bool = True) -> Union[ndarray, DeltaArray]:
+    """
+    Decode an array. Pickled arrays from older Databases are also supported.
+
+    :param value: Encoded array.
+    :param reference: Previous array of the Field, required to decode a delta (a DeltaArray is returned otherwise).
+    :param copy: If False, uncompressed arrays are returned as read-only views on the encoded bytes (without copy).
+    """
+
+    if value[:4] != MAGIC:
+        return loads(value)
+
+    # Read the header
+    _, flags, dtype_len, ndim = HEADER.unpack_from(value)
+    if flags & DELTA_MASK and reference is None:
+        return DeltaArray(value)
+    offset = HEADER.size
+    dtype = np_dtype(bytes(value[offset:offset + dtype_len]).decode())
+    offset += dtype_len
+    shape = Struct(f'<{ndim}q').unpack_from(value, offset)
+    offset += 8 * ndim
+    quantized_type, params = dtype, None
+    if flags & CAST:
+        quantized_type = np_dtype(bytes(value[offset + 1:offset + 1 + value[offset]]).decode())
+        offset += 1 + value[offset]
+    if flags & FIXED:
+        params = Struct('<dd').unpack_from(value, offset)
+        offset += 16
+    offset += -offset % ALIGNMENT
+    count = int(prod(shape))
+    itemsize = quantized_type.itemsize
+
+    # Decompress, un-shuffle and apply the delta to the raw buffer
+    if flags & (COMPRESSION_MASK | SHUFFLE | DELTA_MASK):
+        buffer = memoryview(value)[offset:]
+        if flags & COMPRESSION_MASK:
+            buffer = DECOMPRESSORS[(flags & COMPRESSION_MASK) >> COMPRESSION_SHIFT](buffer)
+        if flags & SHUFFLE:
+            buffer = frombuffer(buffer, dtype=uint8).reshape(itemsize, -1).T.copy()
+        if flags & DELTA_MASK:
+            decode = [delta[2] for delta in DELTAS.values() if delta[0] == flags & DELTA_MASK][0]
+            reference = requantize(reference, quantized_type, params) if flags & CAST else reference
+            buffer = decode(item_view(frombuffer(buffer, dtype=uint8, count=count * itemsize), itemsize),
+                            item_view(raw_buffer(reference, f_order=flags & F_ORDER), itemsize))
+        value, offset = buffer, 0
+
+    # Read the raw buffer and convert quantized arrays back, the views on the encoded bytes are read-only
+    decoded = frombuffer(value, dtype=quantized_type, count=count, offset=offset)
+    decoded = decoded.reshape(shape, order='F' if flags & F_ORDER else 'C')
+    if flags & CAST:
+        return dequantize(decoded, dtype, params)
+    return decoded.copy(order='K') if copy and not decoded.flags.writeable else decoded
 
 
 class NumpyField(Field):
     field_type = 'NUMPY'
 
+    def __init__(self,
+                 spec: Optional[ArraySpec] = None,
+                 *args, **kwargs):
+
+        super().__init__(*args, **kwargs)
+        self.spec: Optional[ArraySpec] = spec
+
+        # Delta encoding: last written array and number of deltas since the last keyframe, last decoded line
+        self.reference: Optional[ndarray] = None
+        self.nb_deltas: int = 0
+        self.cache: Optional[Tuple[int, ndarray]] = None
+
+        # Deduplication: content-addressed store of the encoded arrays
+        self.store: Optional[Any] = None
+
+        # External storage: sidecar file of the large encoded arrays
+        self.arena: Optional[Any] = None
+
+    @property
+    def is_delta(self) -> bool:
+
+        return self.spec is not None and self.spec.delta is not None
+
+    @property
+    def is_dedup(self) -> bool:
+
+        return self.spec is not None and self.spec.dedup
+
+    @property
+    def is_external(self) -> bool:
+
+        return self.spec is not None and self.spec.external is not None
+
+    def encode_next(self,
+                    value: Optional[ndarray]) -> Optional[bytes]:
+        """
+        Encode the next array of the Field, either as a keyframe or as a delta with the previous array.
+
+        :param value: New array of the Field.
+        """
+
+        if value is None:
+            return value
+        value = self.spec.validate(value)
+        reference = self.reference
+        if reference is None or self.nb_deltas + 1 >= self.spec.keyframe_interval or not is_plain(value) or \
+                reference.dtype != value.dtype or reference.shape != value.shape:
+            reference, self.nb_deltas = None, 0
+        else:
+            self.nb_deltas += 1
+        self.reference = reconstruct(value, self.spec) if is_plain(value) else None
+        return encode_array(value, self.spec, reference)
+
+    def release(self,
+                values: List[bytes]):
+        """
+        Release the stored contents referenced by encoded arrays of a deduplicated Field.
+
+        :param values: Encoded arrays.
+        """
+
+        if len(digests := [bytes(value[4:]) for value in values if value[:4] == REFERENCE]) > 0:
+            self.store.release(digests)
+
     def db_value(self,
                  value: ndarray):
 
-        return value if value is None else value.dumps()
+        if value is None or (isinstance(value, bytes) and value[:4] != MAGIC):
+            return value
+        if not isinstance(value, bytes):
+            value = encode_array(value if self.spec is None else self.spec.validate(value), self.spec)
+
+        # Store the content once, the line only stores its digest
+        if self.is_dedup:
+            digest = blake2b(value, digest_size=DIGEST_SIZE).digest()
+            self.store.put(digest, value)
+            return REFERENCE + digest
+
+        # Store large contents in the arena file, the line only stores their address
+        if self.is_external and len(value) > self.spec.external:
+            return EXTERNAL + ADDRESS.pack(self.arena.append(value), len(value))
+        return value
 
     def python_value(self,
-                     value: bytes):
+                     value: bytes,
+                     copy: bool = True):
 
-        return value if value is None else loads(value)
+        if value is None:
+            return value
+        if value[:4] == REFERENCE:
+            value = self.store.get(bytes(value[4:]))
+        elif value[:4] == EXTERNAL:
+            value = self.arena.read(*ADDRESS.unpack_from(value, 4))
+        return decode_array(value, copy=copy)
@@ -0,0 +1,112 @@
+from typing import Dict, List, Tuple, Type, Any, Optional, Iterable
+
+from SSD.Core.Storage.AdaptiveTable import AdaptiveTable
+from SSD.Core.Storage.ExtendedFields import NumpyField
+
+
+class JoinPlan:
+
+    def __init__(self,
+                 tables: Dict[str, Type[AdaptiveTable]],
+                 fk: Dict[str, Dict[str, str]],
+                 table_name: str,
+                 fields_names: List[str],
+                 lazy: bool,
+                 alias: str = 't0',
+                 path: Tuple[str, ...] = ()):
+        """
+        Compiled selection query of a Table in which the Tables referenced by the selected ForeignKey Fields are joined,
+        so that the lines and their referenced lines are read with a single query.
+        The selected Fields of a referenced Table are the Fields with the same names (and its index), a Table is only
+        joined once in a path of ForeignKeys.
+
+        :param tables: Tables of the Database.
+        :param fk: ForeignKey Fields of each Table with the name of their related Table.
+        :param table_name: Name of the Table.
+        :param fields_names: Names of the Fields to select.
+        :param lazy: If True, arrays are selected as raw encoded values (except delta encoded arrays which are decoded
+                     with the previous lines).
+        :param alias: Alias of the Table in the query.
+        :param path: Names of the Tables which reference this Table in the query.
+        """
+
+        self.table: Type[AdaptiveTable] = tables[table_name]
+        self.alias: str = alias
+        table_fields = self.table.fields(only_names=False)
+        self.fields = [table_fields['id']] + [table_fields[field_name] for field_name in fields_names
+                                              if field_name in table_fields and field_name != 'id']
+        self.raw: List[bool] = [lazy and isinstance(field, NumpyField) and not field.is_delta for field in self.fields]
+
+        # Referenced Tables, joined with the line of their index
+        self.joins: Dict[str, JoinPlan] = {}
+        for field_name in fields_names:
+            if field_name in fk[table_name] and (fk_table_name := fk[table_name][field_name]) not in \
+                    path + (table_name,):
+                self.joins[field_name] = JoinPlan(tables=tables,
+                                                  fk=fk,
+                                                  table_name=fk_table_name,
+                                                  fields_names=fields_names,
+                                                  lazy=lazy,
+                                                  alias=f'{alias}_{len(self.joins)}',
+                                                  path=path + (table_name,))
+
+        # Columns of the Tables in the order of the query
+        self.offset: int = 0
+        if len(path) == 0:
+            self.__set_offsets(0)
+            self.query: str = f'SELECT {", ".join(self.__columns())} FROM "{self.table._meta.table_name}" AS {alias}' \
+                              f'{"".join(self.__joins())}'
+
+    def __set_offsets(self,
+                      offset: int) -> int:
+
+        self.offset = offset
+        offset += len(self.fields)
+        for join in self.joins.values():
+            offset = join.__set_offsets(offset)
+        return offset
+
+    def __columns(self) -> List[str]:
+
+        return [f'{self.alias}."{field.column_name}"' for field in self.fields] + \
+            [column for join in self.joins.values() for column in join.__columns()]
+
+    def __joins(self) -> List[str]:
+
+        joins = []
+        for field_name, join in self.joins.items():
+            column = self.table._meta.fields[field_name].column_name
+            joins.append(f' LEFT OUTER JOIN "{join.table._meta.table_name}" AS {join.alias} '
+                         f'ON {join.alias}."{join.table.id.column_name}" = {self.alias}."{column}"')
+            joins += join.__joins()
+        return joins
+
+    def select(self,
+               where: str,
+               params: Iterable[Any] = ()) -> Iterable[Tuple[Any, ...]]:
+        """
+        Execute the selection query. Return the cursor of the rows.
+
+        :param where: Condition and order of the query on the columns of the Table (prefixed by the 't0' alias).
+        :param params: Parameters of the condition.
+        """
+
+        return self.table.database().execute_sql(f'{self.query} {where}', list(params))
+
+    def line(self,
+             row: Tuple[Any, ...]) -> Optional[Dict[str, Any]]:
+        """
+        Convert a row of the query to a line, with a nested line for each joined ForeignKey Field (None if the Field
+        does not reference any line).
+
+        :param row: Row of the query.
+        """
+
+        values = row[self.offset:self.offset + len(self.fields)]
+        if values[0] is None:
+            return None
+        line = {field.name: value if raw else field.python_value(value)
+                for field, raw, value in zip(self.fields, self.raw, values)}
+        for field_name, join in self.joins.items():
+            line[field_name] = join.line(row)
+        return line
@@ -0,0 +1,104 @@
+from typing import Dict, List, Optional, Set, Type
+from threading import get_ident
+from peewee import fn
+from playhouse.migrate import SqliteDatabase
+
+from SSD.Core.Storage.AdaptiveTable import AdaptiveTable
+
+
+class MetadataCache:
+
+    def __init__(self,
+                 database: SqliteDatabase):
+        """
+        Cache of the number of lines, the last index and the Fields of the Tables of a Database.
+        The cache is kept up to date by the write queries of the Database and is invalidated when another connection
+        modified the Database file.
+
+        :param database: Database of the Tables.
+        """
+
+        self.database: SqliteDatabase = database
+        # The data version is specific to the connection of each thread
+        self.__data_version: Dict[int, int] = {}
+        self.__nb_lines: Dict[str, int] = {}
+        self.__last_id: Dict[str, int] = {}
+        self.__fields: Dict[str, Set[str]] = {}
+
+    def check(self):
+        """
+        Invalidate the cache if the Database file was modified by another connection (another process, another thread).
+        """
+
+        # The data version only changes when another connection commits changes
+        data_version = self.database.pragma('data_version')
+        if data_version != self.__data_version.get(thread := get_ident()):
+            self.__data_version[thread] = data_version
+            self.__nb_lines, self.__last_id = {}, {}
+
+    def invalidate(self,
+                   table: Optional[Type[AdaptiveTable]] = None):
+        """
+        Invalidate the cache of a Table (or of all the Tables if not specified).
+
+        :param table: Table.
+        """
+
+        for cache in [self.__nb_lines, self.__last_id, self.__fields]:
+            if table is None:
+                cache.clear()
+            else:
+                cache.pop(table.get_name(), None)
+
+    def nb_lines(self,
+                 table: Type[AdaptiveTable]) -> int:
+        """
+        Get the number of lines of a Table.
+
+        :param table: Table.
+        """
+
+        self.check()
+        if (table_name := table.get_name()) not in self.__nb_lines:
+            self.__nb_lines[table_name] = table.select().count()
+        return self.__nb_lines[table_name]
+
+    def last_id(self,
+                table: Type[AdaptiveTable]) -> int:
+        """
+        Get the index of the last line of a Table.
+
+        :param table: Table.
+        """
+
+        self.check()
+        if (table_name := table.get_name()) not in self.__last_id:
+            self.__last_id[table_name] = table.select(fn.MAX(table.id)).scalar() or 0
+        return self.__last_id[table_name]
+
+    def fields(self,
+               table: Type[AdaptiveTable]) -> Set[str]:
+        """
+        Get the names of the Fields of a Table.
+
+        :param table: Table.
+        """
+
+        if (table_name := table.get_name()) not in self.__fields:
+            self.__fields[table_name] = set(table.fields())
+        return self.__fields[table_name]
+
+    def add_lines(self,
+                  table: Type[AdaptiveTable],
+                  lines_id: List[int]):
+        """
+        Register new lines of a Table.
+
+        :param table: Table.
+        :param lines_id: Indices of the new lines.
+        """
+
+        if (table_name := table.get_name()) in self.__nb_lines:
+            self.__nb_lines[table_name] += len(lines_id)
+        if table_name in self.__last_id and len(lines_id) > 0:
+            self.__last_id[table_name] = max(self.__last_id[table_name], max(lines_id))
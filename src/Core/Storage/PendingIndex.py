@@ -0,0 +1,66 @@
+from typing import Dict, Optional, Any, Callable
+
+
+class PendingIndex:
+
+    def __init__(self,
+                 index: int,
+                 resolve: Optional[Callable[['PendingIndex'], Any]] = None):
+        """
+        Index (or indices) of the line(s) added by a pipelined write of a DatabaseClient, known when the write is
+        acknowledged by the server. It can be used as a value (for instance of a ForeignKey Field) in the next writes
+        of the client, it is then replaced by the index of the line by the server.
+
+        :param index: Position of the write in its batch.
+        :param resolve: Function that waits for the acknowledgment of the write.
+        """
+
+        self.index: int = index
+        self.seq: Optional[int] = None
+        self.value: Optional[Any] = None
+        self.error: Optional[str] = None
+        self.__resolve = resolve
+
+    def __getstate__(self):
+
+        # Only the position of the write is sent to the server
+        return {'index': self.index}
+
+    def __setstate__(self, state: Dict[str, Any]):
+
+        self.index, self.seq, self.value, self.error = state['index'], None, None, None
+        self.__resolve = None
+
+    def result(self) -> Any:
+        """
+        Get the index (or indices) of the line(s), wait for the acknowledgment of the write if needed.
+        """
+
+        return self.__resolve(self)
+
+    def __int__(self):
+        return int(self.result())
+
+    def __index__(self):
+        return int(self.result())
+
+    def __repr__(self):
+        return f'<PendingIndex {self.value if self.seq is not None and self.error is None else "..."}>'
+
+    @staticmethod
+    def substitute(value: Any,
+                   resolve: Callable[['PendingIndex'], Any]) -> Any:
+        """
+        Replace the PendingIndex in the values of a query.
+
+        :param value: Values of the query.
+        :param resolve: Function that returns the replacement of a PendingIndex.
+        """
+
+        if isinstance(value, PendingIndex):
+            return resolve(value)
+        if isinstance(value, dict):
+            return {key: PendingIndex.substitute(item, resolve) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return type(value)([PendingIndex.substitute(item, resolve) for item in value])
+        return value
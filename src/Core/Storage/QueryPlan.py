@@ -0,0 +1,93 @@
+from typing import Dict, List, Tuple, Type, Any, Optional
+
+from SSD.Core.Storage.AdaptiveTable import AdaptiveTable, StoringTable
+from SSD.Core.Storage.ExtendedFields import NumpyField
+
+
+class QueryPlan:
+
+    def __init__(self,
+                 table: Type[AdaptiveTable],
+                 fields_names: Tuple[str, ...],
+                 fk: Dict[str, str],
+                 signals: bool = False):
+        """
+        Compiled insert and update queries of a Table for a given set of Fields.
+        The Fields were already checked, the SQL statements are built once and reused for each line.
+
+        :param table: Table of the queries.
+        :param fields_names: Names of the Fields of the lines.
+        :param fk: ForeignKey Fields of the Table with the name of their related Table.
+        :param signals: If True, the Table is connected to signals as sender.
+        """
+
+        self.table: Type[AdaptiveTable] = table
+        self.fields_names: List[str] = list(fields_names)
+        self.fields = [table._meta.fields[field_name] for field_name in fields_names]
+        self.fk_positions: Dict[int, str] = {i: fk[field_name] for i, field_name in enumerate(fields_names)
+                                             if field_name in fk}
+        self.delta_positions: List[int] = [i for i, field in enumerate(self.fields)
+                                           if isinstance(field, NumpyField) and field.is_delta]
+
+        # Lines are saved as peewee models if they must send signals
+        self.signals: bool = signals
+
+        # Insert statement, with the default values of the other Fields and the optional index of the line
+        self.defaults = [field for field in table._meta.sorted_fields if field.name not in fields_names and
+                         not field.primary_key and field.default is not None]
+        columns = ', '.join([f'"{field.column_name}"' for field in self.fields + self.defaults + [table.id]])
+        values = ', '.join(['?'] * (len(self.fields) + len(self.defaults) + 1))
+        self.insert: str = f'INSERT INTO "{table._meta.table_name}" ({columns}) VALUES ({values})'
+
+        # Update statement, not available for the Fields that require more than a query (delta, deduplication)
+        self.update: Optional[str] = None
+        if len(self.fields) > 0 and not [field for field in self.fields if isinstance(field, NumpyField) and
+                                         (field.is_delta or field.is_dedup)]:
+            columns = ', '.join([f'"{field.column_name}" = ?' for field in self.fields])
+            self.update = f'UPDATE "{table._meta.table_name}" SET {columns} WHERE "{table.id.column_name}" = ?'
+
+    def insert_line(self,
+                    fields_values: List[Any],
+                    line_id: Optional[int] = None) -> int:
+        """
+        Insert a line in the Table. Return the index of the line.
+
+        :param fields_values: Values of the Fields of the line.
+        :param line_id: Index of the line (the next index of the Table is used if not specified).
+        """
+
+        if self.signals:
+            if line_id is None:
+                return self.table.add_data(fields_names=self.fields_names,
+                                           fields_values=fields_values)
+            return self.table.add_data(fields_names=self.fields_names + ['id'],
+                                       fields_values=fields_values + [line_id])
+
+        # StoringTables: encode the delta Fields in the order of insertion, ExchangeTables: only keep the new line
+        if issubclass(self.table, StoringTable):
+            for i in self.delta_positions:
+                fields_values[i] = self.fields[i].encode_next(fields_values[i])
+        else:
+            self.table.delete().execute()
+        params = [field.db_value(value) for field, value in zip(self.fields, fields_values)]
+        params += [field.db_value(field.default() if callable(field.default) else field.default)
+                   for field in self.defaults]
+        return self.table.database().execute_sql(self.insert, params + [line_id]).lastrowid
+
+    def update_line(self,
+                    line_id: int,
+                    fields_values: List[Any]):
+        """
+        Update a line of the Table.
+
+        :param line_id: Index of the line.
+        :param fields_values: New values of the Fields of the line.
+        """
+
+        if self.update is None:
+            self.table.update_data(line_id=line_id,
+                                   fields_names=self.fields_names,
+                                   fields_values=fields_values)
+        else:
+            params = [field.db_value(value) for field, value in zip(self.fields, fields_values)]
+            self.table.database().execute_sql(self.update, params + [line_id])
@@ -0,0 +1,163 @@
+from typing import Union, List, Dict, Optional, Any, Iterator
+from threading import Thread
+from queue import SimpleQueue
+from concurrent.futures import Future
+from collections import deque
+from numpy import ndarray, sort
+from numpy.random import default_rng
+
+from SSD.Core.Storage.Database import Database, Condition, DataType
+
+
+class Sampler:
+
+    def __init__(self,
+                 database: Database,
+                 table_name: str,
+                 fields: Optional[Union[str, List[str]]] = None,
+                 batch_size: int = 32,
+                 shuffle: bool = True,
+                 drop_last: bool = False,
+                 nb_workers: int = 2,
+                 prefetch: int = 4,
+                 lines_range: Optional[List[int]] = None,
+                 where: Optional[Condition] = None,
+                 dtype: Optional[DataType] = None,
+                 seed: Optional[int] = None):
+        """
+        Mini-batch sampler of the lines of a Table. Each iteration over the Sampler is an epoch which returns the
+        selected lines by batches of stacked arrays (see 'get_lines'), in a new random order if shuffled.
+        The batches are read and decoded in advance by a pool of threads with their own read-only connection to the
+        Database file, so that reading the next batches overlaps with the processing of the current one.
+        The lines are selected when the Sampler is created, the lines added later are not sampled.
+
+        :param database: Database to sample (created or loaded).
+        :param table_name: Name of the Table.
+        :param fields: Name(s) of the Field(s) to select.
+        :param batch_size: Number of lines of each batch.
+        :param shuffle: If True, the lines are sampled in a new random order at each epoch (the lines of a batch are
+                        sorted by index). Otherwise, the lines are sampled by index.
+        :param drop_last: If True, the last batch of an epoch is dropped if it contains less than 'batch_size' lines.
+        :param nb_workers: Number of reading threads.
+        :param prefetch: Maximum number of batches read in advance.
+        :param lines_range: Range of indices of the lines to sample. If not specified, all lines will be sampled.
+        :param where: Condition on the lines to sample (see 'get_lines').
+        :param dtype: Data type of the stacked arrays, either a single data type for the array Fields or a data type
+                      per Field name.
+        :param seed: Seed of the random order of the lines.
+        """
+
+        if batch_size < 1 or nb_workers < 1 or prefetch < 1:
+            raise ValueError(f"The settings of the Sampler must be positive, not (batch_size={batch_size}, "
+                             f"nb_workers={nb_workers}, prefetch={prefetch}).")
+        if database.in_step:
+            raise ValueError("A step is in progress in the Database, end it before creating a Sampler.")
+
+        self.database: Database = database
+        self.table_name: str = table_name
+        self.fields: Optional[Union[str, List[str]]] = fields
+        self.batch_size: int = batch_size
+        self.shuffle: bool = shuffle
+        self.drop_last: bool = drop_last
+        self.prefetch: int = prefetch
+        self.dtype: Optional[DataType] = dtype
+        self.epoch: int = 0
+        self.__rng = default_rng(seed)
+        self.__closed: bool = False
+
+        # Indices of the sampled lines
+        self.lines_id: ndarray = database.get_lines(table_name=table_name,
+                                                    fields=[],
+                                                    lines_range=lines_range,
+                                                    where=where,
+                                                    stacked=True)['id']
+
+        # Reads: shared queue of the reading threads
+        self.__reads: SimpleQueue = SimpleQueue()
+        self.__workers = [Thread(target=self.__read_loop, daemon=True) for _ in range(nb_workers)]
+        for worker in self.__workers:
+            worker.start()
+
+    def __len__(self):
+        """
+        Number of batches of an epoch.
+        """
+
+        if self.drop_last:
+            return len(self.lines_id) // self.batch_size
+        return -(-len(self.lines_id) // self.batch_size)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over the batches of a new epoch.
+        """
+
+        if self.__closed:
+            raise ValueError("The Sampler is closed.")
+
+        # Order of the lines of the epoch
+        lines_id = self.__rng.permutation(self.lines_id) if self.shuffle else self.lines_id
+        batches = (sort(lines_id[start:start + self.batch_size]) for start in range(0, len(self) * self.batch_size,
+                                                                                    self.batch_size))
+        self.epoch += 1
+        return self.__epoch(batches)
+
+    def __epoch(self,
+                batches: Iterator[ndarray]) -> Iterator[Dict[str, Any]]:
+
+        # The next batches are submitted to the reading threads while the current one is processed
+        pending = deque()
+        try:
+            for batch in batches:
+                pending.append(self.__read(batch))
+                if len(pending) > self.prefetch:
+                    yield pending.popleft().result()
+            while len(pending) > 0:
+                yield pending.popleft().result()
+        finally:
+            # The batches read in advance are cancelled if the epoch is interrupted
+            for future in pending:
+                future.cancel()
+
+    def __read(self,
+               lines_id: ndarray) -> Future:
+
+        future = Future()
+        self.__reads.put((future, lines_id))
+        return future
+
+    def __read_loop(self):
+
+        reader: Optional[Database] = None
+        while (job := self.__reads.get()) is not None:
+            future, lines_id = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                if reader is None:
+                    reader = Database(*self.database.get_path()).load(read_only=True,
+                                                                      in_memory=self.database.in_memory)
+                result = reader.get_lines(table_name=self.table_name,
+                                          fields=self.fields,
+                                          lines_id=lines_id,
+                                          stacked=True,
+                                          dtype=self.dtype)
+            except Exception as error:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        if reader is not None:
+            reader.close()
+
+    def close(self):
+        """
+        Stop the reading threads.
+        """
+
+        if self.__closed:
+            return
+        self.__closed = True
+        for _ in self.__workers:
+            self.__reads.put(None)
+        for worker in self.__workers:
+            worker.join()
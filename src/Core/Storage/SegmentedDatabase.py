@@ -0,0 +1,743 @@
+from typing import Union, List, Dict, Optional, Any, Iterator, Tuple
+from contextlib import contextmanager
+from os import remove, mkdir
+from os.path import exists, join, getsize
+from json import load as json_load, dump as json_dump
+from shutil import copyfileobj
+import gzip
+from playhouse.migrate import SqliteDatabase
+from numpy import ndarray, concatenate
+
+from SSD.Core.Storage.AdaptiveTable import ExchangeTable
+from SSD.Core.Storage.Database import Database, FieldType, Condition, DataType, PROFILES
+
+
+class SegmentedDatabase:
+
+    def __init__(self,
+                 database_dir: str = '',
+                 database_name: str = 'database',
+                 max_lines: Optional[int] = None,
+                 max_bytes: Optional[int] = None):
+        """
+        Logical Database stored in a sequence of segment files. Lines are added to the last segment, which is closed
+        and replaced by a new one (with the same Tables and Fields) when it contains 'max_lines' lines or 'max_bytes'
+        bytes. The lines keep global indices across the segments, reads are routed to the segments by index range.
+        Closed segments can be archived (compressed), restored or dropped individually.
+
+        :param database_dir: Directory which contains the segment files.
+        :param database_name: Name of the Database (segment files are named '<database_name>_<index>.db').
+        :param max_lines: Maximum number of lines (of all the Tables) in a segment.
+        :param max_bytes: Maximum size of a segment file in bytes.
+        """
+
+        if (max_lines is not None and max_lines < 1) or (max_bytes is not None and max_bytes < 1):
+            raise ValueError(f"The thresholds of the segments must be positive, not (max_lines={max_lines}, "
+                             f"max_bytes={max_bytes}).")
+
+        # Eventually remove extension from the database name
+        database_name = database_name if len(database_name.split('.')) == 1 else database_name.split('.')[0]
+
+        self.__database_dir: str = database_dir
+        self.__database_name: str = database_name
+        self.max_lines: Optional[int] = max_lines
+        self.max_bytes: Optional[int] = max_bytes
+        self.__profile: Optional[str] = None
+
+        # Segments: name, status ('active', 'closed', 'archived' or 'dropped') and number of lines of each Table
+        self.__segments: List[Dict[str, Any]] = []
+        self.__active: Optional[Database] = None
+        self.__active_lines: int = 0
+        self.__readers: Dict[int, Database] = {}
+
+    def new(self,
+            remove_existing: bool = False,
+            profile: str = 'safe'):
+        """
+        Create a new segmented Database with a first segment.
+
+        :param remove_existing: If True, the existing segment files will be overwritten.
+        :param profile: SQLite performance profile of the segments.
+        """
+
+        # Create directory if not exists
+        if not exists(self.__database_dir) and self.__database_dir != '':
+            mkdir(self.__database_dir)
+
+        # Check for existing similar files
+        if exists(self.__manifest_path()):
+            if not remove_existing:
+                raise ValueError(f"The segmented Database {self.__manifest_path()} already exists.")
+            self.load()
+            self.close(erase_file=True)
+            self.__active, self.__segments = None, []
+
+        self.__profile = profile
+        self.__segments = [{'name': self.__segment_name(0), 'status': 'active', 'nb_lines': {}}]
+        self.__active = Database(database_dir=self.__database_dir,
+                                 database_name=self.__segments[0]['name']).new(remove_existing=True,
+                                                                               profile=profile)
+        self.__active_lines = 0
+        self.__save_manifest()
+        return self
+
+    def load(self,
+             profile: Optional[str] = None):
+        """
+        Load an existing segmented Database (the last segment remains the active one).
+
+        :param profile: SQLite performance profile of the active segment.
+        """
+
+        if not exists(self.__manifest_path()):
+            raise ValueError(f"WARNING: the following segmented Database does not exist ({self.__manifest_path()}).")
+        with open(self.__manifest_path(), 'r') as file:
+            manifest = json_load(file)
+        self.max_lines = manifest['max_lines'] if self.max_lines is None else self.max_lines
+        self.max_bytes = manifest['max_bytes'] if self.max_bytes is None else self.max_bytes
+        self.__segments = manifest['segments']
+        self.__profile = profile if profile is not None else manifest['profile']
+        self.__active = Database(database_dir=self.__database_dir,
+                                 database_name=self.__segments[-1]['name']).load(profile=profile)
+        self.__active_lines = self.__count_lines()
+        return self
+
+    def __manifest_path(self) -> str:
+
+        return join(self.__database_dir, f'{self.__database_name}.segments.json')
+
+    def __segment_name(self,
+                       index: int) -> str:
+
+        return f'{self.__database_name}_{index:04d}'
+
+    def __save_manifest(self):
+
+        with open(self.__manifest_path(), 'w') as file:
+            json_dump({'max_lines': self.max_lines, 'max_bytes': self.max_bytes, 'profile': self.__profile,
+                       'segments': self.__segments}, file, indent=1)
+
+    def get_path(self):
+        """
+        Access the path of the segmented Database.
+        """
+
+        return self.__database_dir, self.__database_name
+
+    def get_segments(self) -> List[Dict[str, Any]]:
+        """
+        Get the description of the segments: name, status ('active', 'closed', 'archived' or 'dropped'), index of the
+        first line and number of lines of each Table, size of the files.
+        """
+
+        segments = []
+        for index, segment in enumerate(self.__segments):
+            nb_lines = self.__segment_lines(index)
+            segments.append({'index': index,
+                             'name': segment['name'],
+                             'status': segment['status'],
+                             'first_id': {table_name: self.__offset(index, table_name) + 1 for table_name in nb_lines},
+                             'nb_lines': nb_lines,
+                             'size': sum([getsize(path) for path in self.__files(index)])})
+        return segments
+
+    def print_architecture(self):
+        """
+        Print the content of the Database with Table(s) and their Field(s).
+        """
+
+        self.__active.print_architecture()
+
+    def get_architecture(self):
+        """
+        Get the content of the Database with Table(s) and their Field(s).
+        """
+
+        return self.__active.get_architecture()
+
+    def get_tables(self):
+        """
+        Get the names of created Tables in the Database.
+        """
+
+        return self.__active.get_tables()
+
+    def get_fields(self,
+                   table_name: str,
+                   only_names: bool = True):
+        """
+        Get the names of the Field(s) of a Tables of the Database.
+
+        :param table_name: Name of the Table.
+        :param only_names: If True, only the names of the Fields will be returned in a List, otherwise the Fields
+                           themselves are returned in a Dict.
+        """
+
+        return self.__active.get_fields(table_name=table_name,
+                                        only_names=only_names)
+
+    def create_table(self,
+                     table_name: str,
+                     storing_table: bool = True,
+                     fields: Optional[Union[FieldType, List[FieldType]]] = None):
+        """
+        Add a new Table to the Database with customizable Fields.
+
+        :param table_name: Name of the Table to add.
+        :param storing_table: If True, the Table will be a StoringTable, otherwise an ExchangeTable.
+        :param fields: Field or list of Fields to add to the Table.
+        """
+
+        self.__active.create_table(table_name=table_name,
+                                   storing_table=storing_table,
+                                   fields=fields)
+        return self
+
+    def create_fields(self,
+                      table_name: str,
+                      fields: Union[FieldType, List[FieldType]]):
+        """
+        Add new Fields to a Table.
+
+        :param table_name: Name of the Table on which to add the new Fields.
+        :param fields: Field or list of Fields to add to the Table.
+        """
+
+        self.__active.create_fields(table_name=table_name,
+                                    fields=fields)
+
+    def create_index(self,
+                     table_name: str,
+                     fields: Union[str, List[str]],
+                     unique: bool = False):
+        """
+        Create an index on Field(s) of a Table. The index is created in the active segment and copied in the next
+        segments.
+
+        :param table_name: Name of the Table.
+        :param fields: Name(s) of the indexed Field(s).
+        :param unique: If True, the lines of a segment must have different values for these Fields.
+        """
+
+        self.__active.create_index(table_name=table_name,
+                                   fields=fields,
+                                   unique=unique)
+
+    def get_indexes(self,
+                    table_name: str) -> List[Tuple[List[str], bool]]:
+        """
+        Get the indexes of a Table in the active segment, as the names of the indexed Fields and the unique option of
+        each index.
+
+        :param table_name: Name of the Table.
+        """
+
+        return self.__active.get_indexes(table_name=table_name)
+
+    @property
+    def in_step(self) -> bool:
+        """
+        Check if a step (transaction) is in progress.
+        """
+
+        return self.__active.in_step
+
+    def begin_step(self):
+        """
+        Begin a step: all the queries until the end of the step are committed at once (a single transaction).
+        """
+
+        self.__active.begin_step()
+
+    def end_step(self,
+                 rollback: bool = False):
+        """
+        End a step: commit all the queries of the step.
+
+        :param rollback: If True, the queries of the step are cancelled instead of committed.
+        """
+
+        self.__active.end_step(rollback=rollback)
+        self.__active_lines = self.__count_lines()
+        self.__check_rollover()
+
+    @contextmanager
+    def transaction(self) -> Iterator['SegmentedDatabase']:
+        """
+        Context manager of a step: all the queries in the context are committed at once, or cancelled if an error is
+        raised. If a step is already in progress, the queries are part of this step.
+        """
+
+        if self.in_step:
+            yield self
+            return
+        self.begin_step()
+        try:
+            yield self
+        except BaseException:
+            self.end_step(rollback=True)
+            raise
+        self.end_step()
+
+    def add_data(self,
+                 table_name: str,
+                 data: Dict[str, Any]) -> int:
+        """
+        Execute a line insert query in the active segment. Return the global index of the new line in the Table.
+
+        :param table_name: Name of the Table.
+        :param data: New line of the Table.
+        """
+
+        table_name = Database.make_name(table_name)
+        line_id = self.__active.add_data(table_name=table_name,
+                                         data=data) + self.__offset(len(self.__segments) - 1, table_name)
+        self.__active_lines += 0 if table_name in self.__exchange_tables() else 1
+        self.__check_rollover()
+        return line_id
+
+    def add_batch(self,
+                  table_name: str,
+                  batch: Dict[str, List[Any]]) -> List[int]:
+        """
+        Execute a batch insert query in the active segment. Return the global indices of the new lines in the Table.
+
+        :param table_name: Name of the Table.
+        :param batch: New lines of the Table.
+        """
+
+        table_name = Database.make_name(table_name)
+        offset = self.__offset(len(self.__segments) - 1, table_name)
+        lines_id = [line_id + offset for line_id in self.__active.add_batch(table_name=table_name,
+                                                                            batch=batch)]
+        self.__active_lines += 0 if table_name in self.__exchange_tables() else len(lines_id)
+        self.__check_rollover()
+        return lines_id
+
+    def update(self,
+               table_name: str,
+               data: Dict[str, Any],
+               line_id: int = -1):
+        """
+        Update a line of a Table. Only the lines of the active segment can be updated.
+
+        :param table_name: Name of the Table on which to perform the query.
+        :param data: Updated data of the line.
+        :param line_id: Global index of the line to update.
+        """
+
+        table_name = Database.make_name(table_name)
+        index, local_id = self.__route(table_name, [self.__global_id(table_name, line_id)])[0]
+        if index != len(self.__segments) - 1:
+            raise ValueError(f"The line {line_id} of the Table {table_name} belongs to the closed segment {index}, "
+                             f"only the lines of the active segment can be updated.")
+        self.__active.update(table_name=table_name,
+                             data=data,
+                             line_id=local_id[0])
+
+    def nb_lines(self,
+                 table_name: str) -> int:
+        """
+        Return the number of lines ever added to a Table (the lines of the dropped segments included).
+
+        :param table_name: Name of the Table.
+        """
+
+        table_name = Database.make_name(table_name)
+        return self.__offset(len(self.__segments) - 1, table_name) + self.__active.nb_lines(table_name=table_name)
+
+    def get_line(self,
+                 table_name: str,
+                 fields: Optional[Union[str, List[str]]] = None,
+                 line_id: int = -1) -> Dict[str, Any]:
+        """
+        Get a line of a Table.
+
+        :param table_name: Name of the Table on which to perform the query.
+        :param fields: Name(s) of the Field(s) to request.
+        :param line_id: Global index of the line to get.
+        """
+
+        table_name = Database.make_name(table_name)
+        line_id = self.__global_id(table_name, line_id)
+        index, local_id = self.__route(table_name, [line_id])[0]
+        line = self.__segment(index).get_line(table_name=table_name,
+                                              fields=fields,
+                                              line_id=local_id[0])
+        line['id'] = line_id
+        return line
+
+    def get_lines(self,
+                  table_name: str,
+                  fields: Optional[Union[str, List[str]]] = None,
+                  lines_id: Optional[List[int]] = None,
+                  lines_range: Optional[List[int]] = None,
+                  batched: bool = False,
+                  lazy: bool = False,
+                  stacked: bool = False,
+                  dtype: Optional[DataType] = None,
+                  out: Optional[Dict[str, ndarray]] = None,
+                  where: Optional[Condition] = None,
+                  order_by: Optional[Union[str, List[str]]] = None,
+                  limit: Optional[int] = None) -> Union[Dict[str, List[Any]], List[Dict[str, Any]]]:
+        """
+        Get a set of lines of a Table, stitched from the segments that contain them.
+
+        :param table_name: Name of the Table on which to perform the query.
+        :param fields: Name(s) of the Field(s) to select.
+        :param lines_id: Global indices of the lines to get. If not specified, 'lines_range' value will be used.
+        :param lines_range: Range of global indices of the lines to get. If not specified, all the available lines
+                            will be selected.
+        :param batched: If True, data is returned as one batch per field. Otherwise, data is returned as list of lines.
+        :param lazy: If True (and not batched), arrays are decoded on first access only.
+        :param stacked: If True, data is returned as one array of shape (nb_lines, ...) per field.
+        :param dtype: Data type of the stacked arrays, either a single data type for the array Fields or a data type
+                      per Field name.
+        :param out: Preallocated arrays in which the fields are stacked, per Field name. The first dimension of these
+                    arrays must be at least the number of lines, the stacked arrays are views on their first lines.
+        :param where: Condition on the lines to select, either a Where condition or the values of Fields (a list of
+                      values is a set of accepted values).
+        :param order_by: Name(s) of the Field(s) to sort the lines (descending order with the '-' prefix). By default,
+                         lines are sorted by global index.
+        :param limit: Maximum number of lines to select.
+        """
+
+        table_name = Database.make_name(table_name)
+        if limit is not None and limit < 0:
+            raise ValueError(f"The maximum number of lines must be positive, not {limit}.")
+
+        # Define the indices of lines to select (all the lines of the available segments by default)
+        if lines_id is None:
+            if lines_range is not None and len(lines_range) != 2:
+                raise ValueError("The range of lines must contains the first and the last line indices.")
+            if lines_range is None:
+                lines_id = [line_id for index, segment in enumerate(self.__segments)
+                            if segment['status'] in ('active', 'closed') and
+                            (index == len(self.__segments) - 1 or table_name not in self.__exchange_tables())
+                            for line_id in range(self.__offset(index, table_name) + 1,
+                                                 self.__offset(index, table_name) +
+                                                 self.__segment_lines(index).get(table_name, 0) + 1)]
+            else:
+                _slice = [self.__global_id(table_name, line_id) for line_id in lines_range]
+                lines_id = list(range(_slice[0], max(_slice[0], _slice[1]) + 1))
+
+        # The Fields of the ordering are required to sort the lines of several segments together
+        order_by = None if order_by is None else [order_by] if type(order_by) == str else list(order_by)
+        added_fields = []
+        if order_by is not None and fields is not None:
+            fields = [fields] if type(fields) == str else list(fields)
+            added_fields = [name.lstrip('-') for name in order_by if name.lstrip('-') not in fields]
+            fields += added_fields
+
+        # Query each segment with its local indices (the lines are stacked in the preallocated arrays one segment
+        # after the other if they do not have to be sorted again)
+        queries, nb_selected = [], 0
+        for index, local_ids in self.__route(table_name, sorted(lines_id)):
+            if limit is not None and order_by is None and nb_selected >= limit:
+                break
+            offset = self.__offset(index, table_name)
+            query = self.__segment(index).get_lines(table_name=table_name,
+                                                    fields=fields,
+                                                    lines_id=local_ids,
+                                                    batched=batched,
+                                                    lazy=lazy,
+                                                    stacked=stacked,
+                                                    dtype=dtype,
+                                                    out=None if out is None or order_by is not None else
+                                                    {name: array[nb_selected:] for name, array in out.items()},
+                                                    where=where,
+                                                    order_by=order_by,
+                                                    limit=None if limit is None else
+                                                    limit if order_by is not None else limit - nb_selected)
+            if batched or stacked:
+                query['id'] = query['id'] + offset if isinstance(query['id'], ndarray) else \
+                    [line_id + offset for line_id in query['id']]
+                nb_selected += len(query['id'])
+            else:
+                for line in query:
+                    line['id'] += offset
+                nb_selected += len(query)
+            queries.append(query)
+
+        # Stitch the lines of the segments
+        if not (batched or stacked):
+            lines = [line for query in queries for line in query]
+        elif len(queries) == 0:
+            return {}
+        else:
+            lines = self.__stitch(queries)
+            if out is not None and order_by is None:
+                lines.update({name: array[:nb_selected] for name, array in out.items() if name in lines})
+
+        # Sort the lines of the segments together (stable sorts from the last Field to the first one)
+        if order_by is None:
+            return lines
+        columns = {name.lstrip('-'): [line[name.lstrip('-')] for line in lines] if type(lines) == list else
+                   lines[name.lstrip('-')] for name in order_by + ['id']}
+        permutation = sorted(range(len(columns['id'])), key=lambda i: columns['id'][i])
+        for name in reversed(order_by):
+            column = columns[name.lstrip('-')]
+            permutation.sort(key=lambda i: (column[i] is not None, column[i]), reverse=name.startswith('-'))
+        lines = self.__take(lines, permutation[:limit])
+        for line in lines if type(lines) == list else [lines]:
+            for name in added_fields:
+                line.pop(name)
+        if out is not None and type(lines) == dict:
+            for name, array in out.items():
+                if name in lines:
+                    array[:len(lines[name])] = lines[name]
+                    lines[name] = array[:len(lines[name])]
+        return lines
+
+    @classmethod
+    def __stitch(cls,
+                 values: List[Any]) -> Any:
+
+        # Batches of the segments (the lines referenced by ForeignKey Fields are batches as well)
+        if isinstance(values[0], ndarray):
+            return concatenate(values)
+        if isinstance(values[0], dict):
+            return {key: cls.__stitch([value[key] for value in values]) for key in values[0].keys()}
+        return [value for batch in values for value in batch]
+
+    @classmethod
+    def __take(cls,
+               values: Any,
+               permutation: List[int]) -> Any:
+
+        # Reorder the lines (or the batches) with a permutation of their positions
+        if isinstance(values, ndarray):
+            return values[permutation]
+        if isinstance(values, dict):
+            return {key: cls.__take(value, permutation) for key, value in values.items()}
+        return [values[i] for i in permutation]
+
+    def archive_segment(self,
+                        index: int,
+                        compression_level: int = 6):
+        """
+        Compress the files of a closed segment. The lines of an archived segment cannot be read until it is restored.
+
+        :param index: Index of the segment.
+        :param compression_level: Compression level (gzip) from 1 to 9.
+        """
+
+        self.__check_segment(index, 'closed')
+        self.__close_reader(index)
+        for path in self.__files(index):
+            with open(path, 'rb') as source, gzip.open(f'{path}.gz', 'wb', compresslevel=compression_level) as target:
+                copyfileobj(source, target)
+            remove(path)
+        self.__segments[index]['status'] = 'archived'
+        self.__save_manifest()
+
+    def restore_segment(self,
+                        index: int):
+        """
+        Decompress the files of an archived segment.
+
+        :param index: Index of the segment.
+        """
+
+        self.__check_segment(index, 'archived')
+        for path in self.__files(index):
+            with gzip.open(path, 'rb') as source, open(path[:-len('.gz')], 'wb') as target:
+                copyfileobj(source, target)
+            remove(path)
+        self.__segments[index]['status'] = 'closed'
+        self.__save_manifest()
+
+    def drop_segment(self,
+                     index: int):
+        """
+        Remove the files of a closed (or archived) segment. The global indices of the other lines are not modified.
+
+        :param index: Index of the segment.
+        """
+
+        if self.__segments[index]['status'] not in ('closed', 'archived'):
+            raise ValueError(f"Only closed or archived segments can be dropped, the segment {index} is "
+                             f"{self.__segments[index]['status']}.")
+        self.__close_reader(index)
+        self.__remove_files(index)
+        self.__segments[index]['status'] = 'dropped'
+        self.__save_manifest()
+
+    def rollover(self):
+        """
+        Close the active segment and start a new one with the same Tables and Fields.
+        """
+
+        if self.in_step:
+            raise ValueError("A step is in progress, end it before closing the active segment.")
+
+        # Close the active segment
+        self.__segments[-1]['nb_lines'] = self.__segment_lines(len(self.__segments) - 1)
+        self.__segments[-1]['status'] = 'closed'
+        previous = join(self.__database_dir, f"{self.__segments[-1]['name']}.db")
+        exchange_tables = [table.get_name() for table in self.__active.get_tables(only_names=False).values()
+                           if issubclass(table, ExchangeTable)]
+        self.__active.close()
+
+        # Copy the schema of the previous segment (and the current lines of the ExchangeTables)
+        self.__segments.append({'name': self.__segment_name(len(self.__segments)), 'status': 'active',
+                                'nb_lines': {}})
+        segment_path = join(self.__database_dir, f"{self.__segments[-1]['name']}.db")
+        for path in [segment_path] + [f'{segment_path}{suffix}' for suffix in ('-wal', '-shm')]:
+            if exists(path):
+                remove(path)
+        database = SqliteDatabase(segment_path,
+                                  pragmas=list(PROFILES[self.__profile or 'safe'].items()))
+        database.execute_sql('ATTACH DATABASE ? AS previous', (previous,))
+        for table_name, sql in database.execute_sql("SELECT name, sql FROM previous.sqlite_master WHERE sql IS NOT "
+                                                    "NULL AND name NOT LIKE 'sqlite_%'").fetchall():
+            database.execute_sql(sql)
+            if table_name == '_ssd_schema' or table_name in exchange_tables:
+                database.execute_sql(f'INSERT INTO main."{table_name}" SELECT * FROM previous."{table_name}"')
+        database.execute_sql('DETACH DATABASE previous')
+        database.close()
+
+        # Load the new segment
+        self.__active = Database(database_dir=self.__database_dir,
+                                 database_name=self.__segments[-1]['name']).load(profile=self.__profile)
+        self.__active_lines = 0
+        self.__save_manifest()
+
+    @property
+    def memory_size(self):
+        """
+        Return the size in bytes of the files of all the segments.
+        """
+
+        self.__active.flush()
+        return sum([getsize(path) for index in range(len(self.__segments)) for path in self.__files(index)])
+
+    def close(self,
+              erase_file: bool = False):
+        """
+        Close the segmented Database.
+
+        :param erase_file: If True, the files of all the segments will be erased.
+        """
+
+        for index in list(self.__readers.keys()):
+            self.__close_reader(index)
+        self.__active.close()
+        if erase_file:
+            for index in range(len(self.__segments)):
+                self.__remove_files(index)
+            remove(self.__manifest_path())
+
+    def __check_rollover(self):
+
+        # The empty pages of the Tables are not enough to close a segment
+        if self.in_step or self.__active_lines == 0:
+            return
+        if (self.max_lines is not None and self.__active_lines >= self.max_lines) or \
+                (self.max_bytes is not None and self.__active.memory_size >= self.max_bytes):
+            self.rollover()
+
+    def __segment_lines(self,
+                        index: int) -> Dict[str, int]:
+
+        if index == len(self.__segments) - 1:
+            return {table_name: self.__active.nb_lines(table_name) for table_name in self.__active.get_tables()}
+        return self.__segments[index]['nb_lines']
+
+    def __offset(self,
+                 index: int,
+                 table_name: str) -> int:
+
+        # Global index of the line before the first line of a Table in a segment (the lines of the ExchangeTables are
+        # copied in the new segments, their indices do not change)
+        if table_name in self.__exchange_tables():
+            return 0
+        return sum([segment['nb_lines'].get(table_name, 0) for segment in self.__segments[:index]])
+
+    def __exchange_tables(self) -> List[str]:
+
+        return [table_name for table_name, table in self.__active.get_tables(only_names=False).items()
+                if issubclass(table, ExchangeTable)]
+
+    def __count_lines(self) -> int:
+
+        # The copied lines of the ExchangeTables do not fill the active segment
+        exchange_tables = self.__exchange_tables()
+        return sum([self.__active.nb_lines(table_name) for table_name in self.__active.get_tables()
+                    if table_name not in exchange_tables])
+
+    def __global_id(self,
+                    table_name: str,
+                    line_id: int) -> int:
+
+        nb_lines = self.nb_lines(table_name)
+        if line_id < 0:
+            line_id += nb_lines + 1
+        elif line_id > nb_lines:
+            line_id = nb_lines
+        return line_id
+
+    def __route(self,
+                table_name: str,
+                lines_id: List[int]) -> List[Tuple[int, List[int]]]:
+
+        # Group the sorted global indices by segment, converted to the local indices of the segments (the lines of the
+        # ExchangeTables are read in the active segment)
+        routes: List[Tuple[int, List[int]]] = []
+        index = len(self.__segments) - 1 if table_name in self.__exchange_tables() else 0
+        offset, nb_lines = 0, self.__segment_lines(index).get(table_name, 0)
+        for line_id in lines_id:
+            while line_id > offset + nb_lines and index < len(self.__segments) - 1:
+                index += 1
+                offset += nb_lines
+                nb_lines = self.__segment_lines(index).get(table_name, 0)
+            if not offset < line_id <= offset + nb_lines:
+                raise ValueError(f"The line {line_id} does not exist in the Table {table_name}.")
+            if self.__segments[index]['status'] not in ('active', 'closed'):
+                raise ValueError(f"The line {line_id} of the Table {table_name} belongs to the segment {index} which "
+                                 f"is {self.__segments[index]['status']}.")
+            if len(routes) == 0 or routes[-1][0] != index:
+                routes.append((index, []))
+            routes[-1][1].append(line_id - offset)
+        return routes
+
+    def __segment(self,
+                  index: int) -> Database:
+
+        # Closed segments are opened with a read-only connection on first access
+        if index == len(self.__segments) - 1:
+            return self.__active
+        if index not in self.__readers:
+            self.__readers[index] = Database(database_dir=self.__database_dir,
+                                             database_name=self.__segments[index]['name']).load(read_only=True)
+        return self.__readers[index]
+
+    def __close_reader(self,
+                       index: int):
+
+        if index in self.__readers:
+            self.__readers.pop(index).close()
+
+    def __check_segment(self,
+                        index: int,
+                        status: str):
+
+        if self.__segments[index]['status'] != status:
+            raise ValueError(f"The segment {index} must be {status}, not {self.__segments[index]['status']}.")
+
+    def __files(self,
+                index: int) -> List[str]:
+
+        path = join(self.__database_dir, self.__segments[index]['name'])
+        suffix = '.gz' if self.__segments[index]['status'] == 'archived' else ''
+        return [f'{path}.{extension}{suffix}' for extension in ('db', 'arena')
+                if exists(f'{path}.{extension}{suffix}')]
+
+    def __remove_files(self,
+                       index: int):
+
+        path = join(self.__database_dir, f"{self.__segments[index]['name']}.db")
+        for file in self.__files(index) + [f'{path}-wal', f'{path}-shm']:
+            if exists(file):
+                remove(file)
+
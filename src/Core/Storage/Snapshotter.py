@@ -0,0 +1,47 @@
+from typing import Callable, Optional
+from threading import Thread, Event
+
+
+class Snapshotter:
+
+    def __init__(self,
+                 snapshot: Callable[[], str],
+                 period: float = 10.):
+        """
+        Background thread which periodically saves a snapshot of a Database.
+
+        :param snapshot: Function that saves a snapshot of the Database.
+        :param period: Delay in seconds between two snapshots.
+        """
+
+        if period <= 0:
+            raise ValueError(f"The period of the snapshots must be positive, not {period}.")
+
+        self.snapshot: Callable[[], str] = snapshot
+        self.period: float = period
+
+        # Synchronization with the background thread
+        self.__stop = Event()
+        self.__error: Optional[Exception] = None
+        self.__thread = Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    def close(self):
+        """
+        Stop the background thread.
+        """
+
+        self.__stop.set()
+        self.__thread.join()
+        if self.__error is not None:
+            error, self.__error = self.__error, None
+            raise ValueError(f"The snapshot of the Database could not be saved: {error}")
+
+    def __run(self):
+
+        while not self.__stop.wait(timeout=self.period):
+            try:
+                self.snapshot()
+            except Exception as error:
+                self.__error = error
+                break
@@ -0,0 +1,173 @@
+from typing import Union, List, Dict, Any
+
+
+class StorageEngine:
+
+    def __init__(self,
+                 database_dir: str,
+                 database_name: str):
+        """
+        The StorageEngine is the common API of the storage backends other than SQLite. An EngineDatabase forwards the
+        core methods of the Database (Tables and Fields creation, lines insertion, update and selection) to its engine.
+
+        :param database_dir: Directory which contains the Database files.
+        :param database_name: Name of the Database.
+        """
+
+        self.database_dir: str = database_dir
+        self.database_name: str = database_name
+
+    def new(self,
+            remove_existing: bool = False) -> None:
+        """
+        Create new Database files.
+
+        :param remove_existing: If True, existing Database files will be overwritten.
+        """
+
+        raise NotImplementedError
+
+    def load(self) -> None:
+        """
+        Load existing Database files.
+        """
+
+        raise NotImplementedError
+
+    def get_architecture(self) -> Dict[str, List[str]]:
+        """
+        Get the content of the Database with Table(s) and their Field(s).
+        """
+
+        raise NotImplementedError
+
+    def get_tables(self) -> List[str]:
+        """
+        Get the names of created Tables in the Database.
+        """
+
+        raise NotImplementedError
+
+    def get_fields(self,
+                   table_name: str) -> List[str]:
+        """
+        Get the names of the Field(s) of a Table.
+
+        :param table_name: Name of the Table.
+        """
+
+        raise NotImplementedError
+
+    def create_table(self,
+                     table_name: str,
+                     storing_table: bool,
+                     fields: List[tuple]) -> None:
+        """
+        Add a new Table to the Database.
+
+        :param table_name: Name of the Table.
+        :param storing_table: Specify whether the Table must be a storing or an exchange Table.
+        :param fields: Name, type and optional default value of each Field.
+        """
+
+        raise NotImplementedError
+
+    def create_fields(self,
+                      table_name: str,
+                      fields: List[tuple]) -> None:
+        """
+        Add new Fields to a Table.
+
+        :param table_name: Name of the Table.
+        :param fields: Name, type and optional default value of each Field.
+        """
+
+        raise NotImplementedError
+
+    def add_data(self,
+                 table_name: str,
+                 data: Dict[str, Any]) -> int:
+        """
+        Add a line to a Table. Return the index of the new line.
+
+        :param table_name: Name of the Table.
+        :param data: New line of the Table.
+        """
+
+        raise NotImplementedError
+
+    def add_batch(self,
+                  table_name: str,
+                  batch: Dict[str, List[Any]]) -> List[int]:
+        """
+        Add a batch of lines to a Table. Return the indices of the new lines.
+
+        :param table_name: Name of the Table.
+        :param batch: New lines of the Table.
+        """
+
+        raise NotImplementedError
+
+    def update(self,
+               table_name: str,
+               data: Dict[str, Any],
+               line_id: int) -> None:
+        """
+        Update a line of a Table.
+
+        :param table_name: Name of the Table.
+        :param data: Updated data of the line.
+        :param line_id: Index of the line (positive).
+        """
+
+        raise NotImplementedError
+
+    def get_lines(self,
+                  table_name: str,
+                  fields: List[str],
+                  lines_id: List[int],
+                  batched: bool) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Get a set of lines of a Table.
+
+        :param table_name: Name of the Table.
+        :param fields: Names of the Fields to select.
+        :param lines_id: Indices of the lines (positive, sorted).
+        :param batched: If True, data is returned as one batch per field. Otherwise, data is returned as list of lines.
+        """
+
+        raise NotImplementedError
+
+    def nb_lines(self,
+                 table_name: str) -> int:
+        """
+        Get the number of lines of a Table.
+
+        :param table_name: Name of the Table.
+        """
+
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """
+        Write the pending lines in the Database files.
+        """
+
+        raise NotImplementedError
+
+    def memory_size(self) -> int:
+        """
+        Get the size of the Database files in bytes.
+        """
+
+        raise NotImplementedError
+
+    def close(self,
+              erase_file: bool = False) -> None:
+        """
+        Close the Database.
+
+        :param erase_file: If True, the Database files will be erased.
+        """
+
+        raise NotImplementedError
@@ -0,0 +1,202 @@
+from typing import Dict, List, Tuple, Type, Any, Iterable, Union
+
+from SSD.Core.Storage.AdaptiveTable import AdaptiveTable
+from SSD.Core.Storage.ExtendedFields import NumpyField
+
+OPERATORS: Dict[str, str] = {'eq': '=', 'ne': '!=', 'lt': '<', 'le': '<=', 'gt': '>', 'ge': '>='}
+
+
+class Where:
+
+    def __init__(self,
+                 field_name: str):
+        """
+        Condition on the lines of a Table, compiled to a parameterized SQL expression when the lines are selected.
+        A condition is built from the name of a Field with the comparison operators (==, !=, <, <=, >, >=) or with the
+        'isin', 'between' and 'is_null' methods, and conditions are combined with the &, | and ~ operators.
+
+        :param field_name: Name of the Field.
+        """
+
+        self.field_name: str = field_name
+        self.node: Tuple = ('field', field_name)
+
+    @classmethod
+    def from_node(cls,
+                  node: Tuple) -> 'Where':
+
+        condition = cls.__new__(cls)
+        condition.field_name, condition.node = None, node
+        return condition
+
+    @classmethod
+    def from_dict(cls,
+                  conditions: Dict[str, Any]) -> 'Where':
+        """
+        Build the conjunction of the conditions on several Fields, given as equal values (or lists of values).
+
+        :param conditions: Value or list of values of each Field.
+        """
+
+        if len(conditions) == 0:
+            raise ValueError("At least one condition must be defined.")
+        where = None
+        for field_name, value in conditions.items():
+            condition = cls(field_name).isin(value) if isinstance(value, (list, tuple, set)) else \
+                cls(field_name) == value
+            where = condition if where is None else where & condition
+        return where
+
+    def __compare(self,
+                  operator: str,
+                  value: Any) -> 'Where':
+
+        if self.node[0] != 'field':
+            raise ValueError("Comparison operators can only be applied to Fields, not to conditions.")
+        if value is None and operator in ('eq', 'ne'):
+            return self.is_null(operator == 'eq')
+        return Where.from_node(('compare', self.field_name, operator, value))
+
+    def __eq__(self, value: Any) -> 'Where':
+        return self.__compare('eq', value)
+
+    def __ne__(self, value: Any) -> 'Where':
+        return self.__compare('ne', value)
+
+    def __lt__(self, value: Any) -> 'Where':
+        return self.__compare('lt', value)
+
+    def __le__(self, value: Any) -> 'Where':
+        return self.__compare('le', value)
+
+    def __gt__(self, value: Any) -> 'Where':
+        return self.__compare('gt', value)
+
+    def __ge__(self, value: Any) -> 'Where':
+        return self.__compare('ge', value)
+
+    # Conditions are not hashable since the comparison operators are overloaded
+    __hash__ = None
+
+    def isin(self,
+             values: Iterable[Any]) -> 'Where':
+        """
+        Condition on the Field value being in a set of values.
+
+        :param values: Accepted values.
+        """
+
+        if self.node[0] != 'field':
+            raise ValueError("The 'isin' condition can only be applied to Fields, not to conditions.")
+        return Where.from_node(('in', self.field_name, list(values)))
+
+    def between(self,
+                low: Any,
+                high: Any) -> 'Where':
+        """
+        Condition on the Field value being between two values (included).
+
+        :param low: Lowest accepted value.
+        :param high: Highest accepted value.
+        """
+
+        if self.node[0] != 'field':
+            raise ValueError("The 'between' condition can only be applied to Fields, not to conditions.")
+        return Where.from_node(('between', self.field_name, low, high))
+
+    def is_null(self,
+                is_null: bool = True) -> 'Where':
+        """
+        Condition on the Field value being undefined (or defined).
+
+        :param is_null: If False, the Field value must be defined.
+        """
+
+        if self.node[0] != 'field':
+            raise ValueError("The 'is_null' condition can only be applied to Fields, not to conditions.")
+        return Where.from_node(('null', self.field_name, is_null))
+
+    def __and__(self, other: 'Where') -> 'Where':
+        return Where.from_node(('and', self.__check(), other.__check()))
+
+    def __or__(self, other: 'Where') -> 'Where':
+        return Where.from_node(('or', self.__check(), other.__check()))
+
+    def __invert__(self) -> 'Where':
+        return Where.from_node(('not', self.__check()))
+
+    def __check(self) -> Tuple:
+
+        if self.node[0] == 'field':
+            raise ValueError(f"The Field '{self.field_name}' must be compared to a value to define a condition.")
+        return self.node
+
+    def __repr__(self):
+
+        return f'<Where {self.node}>'
+
+    def compile(self,
+                table: Type[AdaptiveTable],
+                alias: str) -> Tuple[str, List[Any]]:
+        """
+        Compile the condition to a parameterized SQL expression on the columns of a Table. Return the expression and its
+        parameters.
+
+        :param table: Table of the Fields.
+        :param alias: Alias of the Table in the query.
+        """
+
+        return self.__compile(self.__check(), table, alias)
+
+    @classmethod
+    def __compile(cls,
+                  node: Tuple,
+                  table: Type[AdaptiveTable],
+                  alias: str) -> Tuple[str, List[Any]]:
+
+        # Combination of conditions
+        if node[0] in ('and', 'or'):
+            left, left_params = cls.__compile(node[1], table, alias)
+            right, right_params = cls.__compile(node[2], table, alias)
+            return f'({left} {node[0].upper()} {right})', left_params + right_params
+        if node[0] == 'not':
+            expression, params = cls.__compile(node[1], table, alias)
+            return f'(NOT {expression})', params
+
+        # Condition on a Field, values are converted as they are stored
+        field_name = node[1]
+        if field_name not in (fields := table.fields(only_names=False)):
+            raise ValueError(f"Unknown Field with name '{field_name}' for Table '{table._meta.name}'")
+        if isinstance(field := fields[field_name], NumpyField) and node[0] != 'null':
+            raise ValueError(f"The array Field '{field_name}' of Table '{table._meta.name}' can only be used in an "
+                             f"'is_null' condition.")
+        column = f'{alias}."{field.column_name}"'
+        if node[0] == 'compare':
+            return f'{column} {OPERATORS[node[2]]} ?', [field.db_value(node[3])]
+        if node[0] == 'in':
+            return f'{column} IN ({", ".join(["?"] * len(node[2]))})', [field.db_value(value) for value in node[2]]
+        if node[0] == 'between':
+            return f'{column} BETWEEN ? AND ?', [field.db_value(node[2]), field.db_value(node[3])]
+        return f'{column} IS {"" if node[2] else "NOT "}NULL', []
+
+
+def order_clause(table: Type[AdaptiveTable],
+                 alias: str,
+                 order_by: Union[str, List[str]]) -> str:
+    """
+    Compile the ordering of the lines of a Table to a SQL ORDER BY clause, Field names with the '-' prefix are sorted
+    in descending order.
+
+    :param table: Table of the Fields.
+    :param alias: Alias of the Table in the query.
+    :param order_by: Name(s) of the Field(s) to sort.
+    """
+
+    terms = []
+    for field_name in [order_by] if type(order_by) == str else order_by:
+        descending = field_name.startswith('-')
+        field_name = field_name[1:] if descending else field_name
+        if field_name not in (fields := table.fields(only_names=False)):
+            raise ValueError(f"Unknown Field with name '{field_name}' for Table '{table._meta.name}'")
+        terms.append(f'{alias}."{fields[field_name].column_name}"{" DESC" if descending else ""}')
+    return ', '.join(terms + [f'{alias}."id"'])
@@ -0,0 +1,181 @@
+from typing import Dict, List, Tuple, Any, Optional
+from threading import Thread, Lock, Event
+from time import time
+from peewee import fn
+from playhouse.migrate import SqliteDatabase
+from numpy import ndarray, array
+
+from SSD.Core.Storage.QueryPlan import QueryPlan
+
+
+class WriteBuffer:
+
+    def __init__(self,
+                 database: SqliteDatabase,
+                 max_lines: int = 256,
+                 max_bytes: int = 2 ** 24,
+                 max_delay: float = 1.):
+        """
+        Write-behind buffer of the lines added to StoringTables. Lines are written by a background thread in a single
+        transaction when one of the thresholds is reached.
+
+        :param database: Database in which lines are written.
+        :param max_lines: Maximum number of buffered lines.
+        :param max_bytes: Maximum size of the buffered arrays in bytes.
+        :param max_delay: Maximum delay in seconds before writing a buffered line.
+        """
+
+        if max_lines < 1 or max_bytes < 1 or max_delay <= 0:
+            raise ValueError(f"The thresholds of the write-behind buffer must be positive, not (max_lines={max_lines}, "
+                             f"max_bytes={max_bytes}, max_delay={max_delay}).")
+
+        self.database: SqliteDatabase = database
+        self.max_lines: int = max_lines
+        self.max_bytes: int = max_bytes
+        self.max_delay: float = max_delay
+
+        # Buffered lines with the plan of their Table and their predicted index, next index of each Table
+        self.__lines: List[Tuple[QueryPlan, List[Any], int]] = []
+        self.__nb_bytes: int = 0
+        self.__first_time: float = 0.
+        self.__next_id: Dict[str, int] = {}
+
+        # Synchronization with the background thread
+        self.__lock = Lock()
+        self.__flush_lock = Lock()
+        self.__wake_up = Event()
+        self.__closed: bool = False
+        self.hold: bool = False
+        self.__error: Optional[Exception] = None
+        self.__thread = Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    def __len__(self):
+
+        return len(self.__lines)
+
+    def add(self,
+            plan: QueryPlan,
+            fields_values: List[Any]) -> int:
+        """
+        Buffer a new line of a StoringTable. Return the index that the line will have in the Table.
+
+        :param plan: Compiled queries of the StoringTable for the Fields of the line.
+        :param fields_values: Values of the Fields of the line.
+        """
+
+        self.__check_error()
+        # Arrays are copied since they might be modified in place before being written
+        fields_values = [array(value) if isinstance(value, ndarray) else value for value in fields_values]
+
+        with self.__lock:
+            table, table_name = plan.table, plan.table.get_name()
+            if table_name not in self.__next_id:
+                self.__next_id[table_name] = (table.select(fn.MAX(table.id)).scalar() or 0) + 1
+            line_id = self.__next_id[table_name]
+            self.__next_id[table_name] += 1
+            if len(self.__lines) == 0:
+                self.__first_time = time()
+            self.__lines.append((plan, fields_values, line_id))
+            self.__nb_bytes += sum([value.nbytes for value in fields_values if isinstance(value, ndarray)])
+            if len(self.__lines) >= self.max_lines or self.__nb_bytes >= self.max_bytes:
+                self.__wake_up.set()
+        return line_id
+
+    def forget(self,
+               table_name: str):
+        """
+        Forget the next index of a Table (when lines were written without the buffer).
+
+        :param table_name: Name of the Table.
+        """
+
+        with self.__lock:
+            self.__next_id.pop(table_name, None)
+
+    def discard(self):
+        """
+        Remove the buffered lines without writing them.
+        """
+
+        with self.__lock:
+            self.__lines, self.__nb_bytes, self.__next_id = [], 0, {}
+
+    def flush(self):
+        """
+        Write the buffered lines in a single transaction. If the transaction fails, the lines are kept in the buffer
+        (use 'discard' to remove them) with new indices, since their predicted indices might have been taken by another
+        connection.
+        """
+
+        with self.__flush_lock:
+            with self.__lock:
+                lines = list(self.__lines)
+            if len(lines) > 0:
+                try:
+                    with self.database.atomic():
+                        for plan, fields_values, line_id in lines:
+                            plan.insert_line(fields_values=fields_values,
+                                             line_id=line_id)
+                except Exception:
+                    with self.__lock:
+                        self.__reindex()
+                    raise
+                # Lines are only removed from the buffer once they are committed
+                with self.__lock:
+                    self.__lines = self.__lines[len(lines):]
+                    self.__nb_bytes = sum([value.nbytes for _, fields_values, _ in self.__lines
+                                           for value in fields_values if isinstance(value, ndarray)])
+        self.__check_error()
+
+    def close(self):
+        """
+        Write the buffered lines and stop the background thread.
+        """
+
+        self.__closed = True
+        self.__wake_up.set()
+        self.__thread.join()
+        self.flush()
+
+    def __reindex(self):
+
+        # The indices of the buffered lines are predicted again from the Tables, in the order of the lines
+        self.__next_id, indices, lines = {}, {}, []
+        for plan, fields_values, line_id in self.__lines:
+            table, table_name = plan.table, plan.table.get_name()
+            if table_name not in self.__next_id:
+                self.__next_id[table_name] = (table.select(fn.MAX(table.id)).scalar() or 0) + 1
+            indices[(table._meta.name, line_id)] = self.__next_id[table_name]
+            self.__next_id[table_name] += 1
+            lines.append((plan, fields_values, indices[(table._meta.name, line_id)]))
+
+        # The ForeignKeys to the buffered lines follow their new indices (ForeignKeys refer to the name of the Tables)
+        for plan, fields_values, _ in lines:
+            for idx, fk_table_name in plan.fk_positions.items():
+                if (fk_table_name, fields_values[idx]) in indices:
+                    fields_values[idx] = indices[(fk_table_name, fields_values[idx])]
+        self.__lines = lines
+
+    def __run(self):
+
+        while not self.__closed:
+            delay = self.max_delay if len(self.__lines) == 0 else self.__first_time + self.max_delay - time()
+            self.__wake_up.wait(timeout=max(delay, 0.))
+            self.__wake_up.clear()
+            # Lines are not written by the background thread while a transaction is in progress
+            if not self.hold and len(self.__lines) > 0 and (len(self.__lines) >= self.max_lines or
+                                                            self.__nb_bytes >= self.max_bytes or
+                                                            time() - self.__first_time >= self.max_delay):
+                try:
+                    self.flush()
+                except Exception as error:
+                    self.__error = error
+        # The connection of the background thread is specific to this thread
+        self.database.close()
+
+    def __check_error(self):
+
+        if self.__error is not None:
+            error, self.__error = self.__error, None
+            raise ValueError(f"The buffered lines could not be written in the Database: {error}")
@@ -1,3 +1,14 @@
 from .AdaptiveTable import AdaptiveTable
 from .Database import Database
+from .EngineDatabase import EngineDatabase
+from .AsyncDatabase import AsyncDatabase
+from .DatabaseServer import DatabaseServer
+from .DatabaseClient import DatabaseClient
+from .PendingIndex import PendingIndex
+from .SegmentedDatabase import SegmentedDatabase
+from .StorageEngine import StorageEngine
+from .ColumnarEngine import ColumnarEngine
+from .ExtendedFields import ArraySpec
+from .Where import Where
+from .Sampler import Sampler
 from .utils import merge, rename_tables, rename_fields, remove_table, remove_field, export
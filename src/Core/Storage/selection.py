@@ -0,0 +1,93 @@
+from typing import Union, List, Dict, Optional, Any, Callable
+from numpy import ndarray, array, empty
+
+DataType = Union[str, type, Dict[str, Union[str, type]]]
+
+
+def line_index(line_id: int,
+               nb_line: int) -> int:
+    """
+    Get the index of a line of a Table. Negative indices start from the end of the Table, indices are bounded by the
+    number of lines.
+
+    :param line_id: Index of the line.
+    :param nb_line: Number of lines of the Table.
+    """
+
+    if line_id < 0:
+        return line_id + nb_line + 1
+    return min(line_id, nb_line)
+
+
+def lines_range(lines_range: Optional[List[int]],
+                nb_line: int) -> range:
+    """
+    Get the indices of a range of lines of a Table (all the lines by default).
+
+    :param lines_range: First and last indices of the lines (negative indices start from the end of the Table).
+    :param nb_line: Number of lines of the Table.
+    """
+
+    if lines_range is not None and len(lines_range) != 2:
+        raise ValueError("The range of lines must contains the first and the last line indices.")
+    first_line_id = lines_range[0] if lines_range is not None else 1
+    last_line_id = lines_range[1] if lines_range is not None else nb_line
+    _slice = [first_line_id, last_line_id]
+    for i, idx in enumerate(_slice):
+        if idx < 0:
+            _slice[i] += nb_line + 1
+        elif idx > nb_line:
+            _slice[i] = nb_line
+    _slice[1] = _slice[0] + 1 if _slice[1] < _slice[0] else _slice[1] + 1
+    return range(*_slice)
+
+
+def stack_values(field_name: str,
+                 values: List[Any],
+                 dtype: Optional[DataType],
+                 out: Optional[Dict[str, ndarray]],
+                 decode: Optional[Callable[[bytes], ndarray]] = None) -> ndarray:
+    """
+    Stack the values of a Field in a single array of shape (nb_lines, ...).
+
+    :param field_name: Name of the Field.
+    :param values: Values of the Field in each line.
+    :param dtype: Data type of the stacked arrays, either a single data type for the array Fields or a data type per
+                  Field name.
+    :param out: Preallocated arrays in which the fields are stacked, per Field name.
+    :param decode: Decoding function of the raw encoded arrays.
+    """
+
+    # A single data type only applies to the array Fields
+    is_array = len(values) > 0 and (decode is not None or any([isinstance(value, ndarray) for value in values]))
+    decode = (lambda value: value) if decode is None else decode
+    dtype = dtype.get(field_name) if isinstance(dtype, dict) else dtype if is_array else None
+    first = decode(values[0]) if len(values) > 0 else None
+    if is_array and not isinstance(first, ndarray):
+        raise ValueError(f"The arrays of the Field '{field_name}' can not be stacked, they must be defined in each "
+                         f"line.")
+    shape = (len(values), *first.shape) if is_array else (len(values),)
+
+    # Define the stacked array
+    if out is not None and field_name in out:
+        if out[field_name].shape[0] < shape[0] or (len(values) > 0 and out[field_name].shape[1:] != shape[1:]):
+            raise ValueError(f"The preallocated array of the Field '{field_name}' has the shape "
+                             f"{out[field_name].shape}, it can not contain the stacked arrays of shape {shape}.")
+        stacked = out[field_name][:shape[0]]
+    elif not is_array:
+        return array(values, dtype=dtype)
+    else:
+        stacked = empty(shape, dtype=first.dtype if dtype is None else dtype)
+    if not is_array:
+        stacked[...] = values
+        return stacked
+
+    # Decode the arrays in the stacked array (with the data type conversion)
+    stacked[0] = first
+    for i, value in enumerate(values[1:]):
+        value = decode(value)
+        if not isinstance(value, ndarray) or value.shape != shape[1:]:
+            raise ValueError(f"The arrays of the Field '{field_name}' can not be stacked, they must be defined in "
+                             f"each line with the same shape.")
+        stacked[i + 1] = value
+    return stacked
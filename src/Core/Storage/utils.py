@@ -31,6 +31,7 @@ def merge(database_names: List[str],
                 if field_name != 'id':
                     field_type = type(None) if field.__class__ not in list(table_type.values()) else \
                         list(table_type.keys())[list(table_type.values()).index(field.__class__)]
+                    field_type = field_type if getattr(field, 'spec', None) is None else field.spec
                     merged_database.create_fields(table_name=table,
                                                   fields=(field_name, field_type))
 
@@ -3,6 +3,7 @@ from numpy import array, ndarray, tile
 import Sofa
 
 from SSD.Core.Storage.Database import Database
+from SSD.Core.Storage.ExtendedFields import ArraySpec
 from SSD.Core.Rendering.UserAPI import UserAPI as _UserAPI
 from SSD.SOFA.utils import error_message
 
@@ -18,6 +19,8 @@ class UserAPI(Sofa.Core.Controller, _UserAPI):
                  non_storing: bool = False,
                  exit_on_window_close: bool = True,
                  idx_instance: int = 0,
+                 array_spec: Optional[ArraySpec] = None,
+                 in_memory: bool = False,
                  *args, **kwargs):
         """
         The UserAPI is a Factory used to easily create and update visual objects in the Visualizer.
@@ -31,6 +34,9 @@ class UserAPI(Sofa.Core.Controller, _UserAPI):
         :param non_storing: If True, the Database will not be stored.
         :param exit_on_window_close: If True, program will be killed if the Visualizer is closed.
         :param idx_instance: If several Factories must be created, specify the index of the Factory.
+        :param array_spec: Storage options of the floating point arrays of the visual objects (positions, vectors and
+                           scalar fields).
+        :param in_memory: If True, the Database is kept in memory (used if 'database' is not defined).
         """
 
         Sofa.Core.Controller.__init__(self, *args, **kwargs)
@@ -41,7 +47,9 @@ class UserAPI(Sofa.Core.Controller, _UserAPI):
                           remove_existing=remove_existing,
                           non_storing=non_storing,
                           exit_on_window_close=exit_on_window_close,
-                          idx_instance=idx_instance)
+                          idx_instance=idx_instance,
+                          array_spec=array_spec,
+                          in_memory=in_memory)
 
         # Add the Factory controller to the scene graph
         self.root: Sofa.Core.Node = root